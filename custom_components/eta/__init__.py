@@ -1,11 +1,24 @@
 import logging
 from homeassistant import config_entries, core
+from homeassistant.const import CONF_HOST, CONF_MODEL, CONF_NAME, CONF_PORT, EVENT_HOMEASSISTANT_STOP
 
-from .const import DOMAIN
+from .api import EtaAPIFactory, unit_key
+from .const import CONF_PROGRAMS, DOMAIN
+from .coordinator import EtaDataUpdateCoordinator, EtaErrorCoordinator, entry_varsets, metadata_store
 
 _LOGGER = logging.getLogger(__name__)
 
-PLATFORMS = ["sensor"]
+PLATFORMS = ["sensor", "binary_sensor", "number", "select", "calendar"]
+# changing any of these needs a reload, everything else is applied live
+RELOAD_KEYS = (CONF_HOST, CONF_PORT, CONF_NAME, CONF_MODEL)
+
+
+def _needs_reload(hass_data, data) -> bool:
+    """Whether ``data`` changes anything the running entry cannot apply live."""
+    if any(hass_data.get(key) != data.get(key) for key in RELOAD_KEYS):
+        return True
+    # the programs decide which calendars exist; entries from the config flow have no programs key
+    return (hass_data.get(CONF_PROGRAMS) or []) != (data.get(CONF_PROGRAMS) or [])
 
 
 async def async_setup_entry(
@@ -14,6 +27,27 @@ async def async_setup_entry(
     """Set up ETA Device from a ConfigEntry."""
     hass.data.setdefault(DOMAIN, {})
     hass_data = dict(entry.data)
+
+    # One coordinator per entry polls all selected sensors over a dedicated session
+    eta_api = EtaAPIFactory.acquire(entry.entry_id, entry.data[CONF_HOST], entry.data[CONF_PORT])
+    coordinator = EtaDataUpdateCoordinator(hass, entry, eta_api)
+    try:
+        await coordinator.async_config_entry_first_refresh()
+    except Exception:
+        await EtaAPIFactory.release(entry.entry_id, entry.data[CONF_HOST], entry.data[CONF_PORT])
+        raise
+    hass_data["coordinator"] = coordinator
+
+    async def _async_release_api(_event):
+        # entries are not unloaded on shutdown, the last release closes the dedicated session
+        await EtaAPIFactory.release(entry.entry_id, entry.data[CONF_HOST], entry.data[CONF_PORT])
+
+    entry.async_on_unload(hass.bus.async_listen(EVENT_HOMEASSISTANT_STOP, _async_release_api))
+    # faults are read on their own schedule, a failed first read does not fail the setup
+    error_coordinator = EtaErrorCoordinator(hass, entry, eta_api)
+    await error_coordinator.async_refresh()
+    hass_data["error_coordinator"] = error_coordinator
+
     unsub_options_update_listener = entry.add_update_listener(options_update_listener)
     hass_data["unsub_options_update_listener"] = unsub_options_update_listener
     hass.data[DOMAIN][entry.entry_id] = hass_data
@@ -35,14 +69,49 @@ async def async_unload_entry(hass: core.HomeAssistant, entry: config_entries.Con
             unsub = hass_data.get("unsub_options_update_listener")
             if unsub:
                 unsub()
+            # the sets are registered again on the next setup
+            await hass_data["coordinator"].async_delete_varsets()
+        await EtaAPIFactory.release(entry.entry_id, entry.data[CONF_HOST], entry.data[CONF_PORT])
     else:
         _LOGGER.warning("Failed to unload ETA entry: %s", entry.entry_id)
 
     return unload_ok
 
 
+async def async_remove_entry(hass: core.HomeAssistant, entry: config_entries.ConfigEntry) -> None:
+    """Drop the cached menu and the variable sets of a removed ETA entry."""
+    unit = unit_key(entry.data[CONF_HOST], entry.data[CONF_PORT])
+    # the cache belongs to the unit, other entries of the same unit keep using it
+    if not any(
+        unit_key(other.data[CONF_HOST], other.data[CONF_PORT]) == unit
+        for other in hass.config_entries.async_entries(DOMAIN)
+        if other.entry_id != entry.entry_id
+    ):
+        await metadata_store(hass, entry.data[CONF_HOST], entry.data[CONF_PORT]).async_remove()
+    # sets left by earlier sessions, in the background as the unit may be unreachable
+    hass.async_create_background_task(_async_delete_varsets(entry), f"{DOMAIN} delete variable sets")
+
+
+async def _async_delete_varsets(entry: config_entries.ConfigEntry):
+    owner = f"remove_{entry.entry_id}"
+    eta_api = EtaAPIFactory.acquire(owner, entry.data[CONF_HOST], entry.data[CONF_PORT])
+    try:
+        for name in entry_varsets(entry):
+            await eta_api.delete_varset(name)
+    except Exception as e:
+        _LOGGER.debug("Failed to delete ETA variable sets of %s: %s", entry.entry_id, e)
+    finally:
+        await EtaAPIFactory.release(owner, entry.data[CONF_HOST], entry.data[CONF_PORT])
+
+
 async def options_update_listener(hass, config_entry):
     """Handle options update."""
+    hass_data = hass.data[DOMAIN].get(config_entry.entry_id)
+    if hass_data and not _needs_reload(hass_data, config_entry.data):
+        # only selection or poll intervals changed, keep the running entry
+        await hass_data["coordinator"].async_update_selection()
+        hass_data.update(config_entry.data)
+        return
     try:
         await hass.config_entries.async_reload(config_entry.entry_id)
     except config_entries.OperationNotAllowed:
@@ -1,12 +1,65 @@
-from enum import Enum
+from enum import Enum, IntEnum
 
+import bisect
+import collections
+import hashlib
+import heapq
+import html
+import itertools
+import logging
+import math
+import operator
+import random
+import re
+import sys
+import time
 import xmltodict
+import aiohttp
 import asyncio
-from typing import Sequence
+from array import array
+from typing import NamedTuple, Sequence
+from xml.etree import ElementTree
 from homeassistant.helpers.selector import SelectOptionDict
+from yarl import URL
+
+from .const import (
+    CIRCUIT_BACKOFF_MAX,
+    CIRCUIT_BACKOFF_MIN,
+    CIRCUIT_FAILURE_THRESHOLD,
+    DNS_CACHE_TTL,
+    KEEPALIVE_TIMEOUT,
+    LATENCY_SAMPLES,
+    MAX_PARALLEL_REQUESTS,
+    MENU_CHUNK_SIZE,
+    REQUEST_TIMEOUT,
+    VALUE_CACHE_TTL,
+    WRITE_COALESCE_DELAY,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class EtaVarSetError(Exception):
+    """The controller rejected a variable set request."""
+
+
+class EtaVarSetUnsupportedError(EtaVarSetError):
+    """The controller does not offer variable sets at all."""
+
+
+class EtaUnavailableError(Exception):
+    """The ETA unit is considered offline, requests are not sent."""
+
+
+class EtaWriteError(Exception):
+    """The unit rejected a write or did not take over the value."""
+
+
 class SensorType(Enum):
     NUMERIC = "numeric"
     TEXT = "text"
+    # one time window of a weekly program
+    TIMESLOT = "timeslot"
 
 
 FLOAT_SENSOR_UNITS = [
@@ -33,27 +86,246 @@ FLOAT_SENSOR_UNITS = [
 ]
 
 
+class EtaValue(NamedTuple):
+    """One <value> of /user/var or <variable> of /user/vars, undecoded."""
+
+    uri: str
+    str_value: str
+    unit: str
+    scale_factor: str
+    dec_places: str
+    raw: str
+
+
+# attribute order as sent by the unit, for <value> and <variable> alike
+_VALUE_RE = re.compile(
+    r'<(?:value|variable) uri="([^"]*)" strValue="([^"]*)" unit="([^"]*)"'
+    r' decPlaces="([^"]*)" scaleFactor="([^"]*)"[^>]*>([^<]*)<'
+)
+# any attribute order, used if the fast pattern does not cover a response
+_TAG_RE = re.compile(r"<(value|variable)\s([^>]*)>([^<]*)<")
+_ATTRIBUTE_RE = re.compile(r'([\w:]+)="([^"]*)"')
+
+
+def _unescape(text):
+    return html.unescape(text) if "&" in text else text
+
+
+def _decode_fast(text) -> list[EtaValue]:
+    values = []
+    for uri, str_value, unit, dec_places, scale_factor, raw in _VALUE_RE.findall(text):
+        values.append(EtaValue(uri, _unescape(str_value), _unescape(unit), scale_factor, dec_places, raw.strip()))
+    return values
+
+
+def _decode_generic(text) -> list[EtaValue]:
+    values = []
+    for _, attributes, raw in _TAG_RE.findall(text):
+        a = dict(_ATTRIBUTE_RE.findall(attributes))
+        values.append(EtaValue(
+            a.get("uri", ""),
+            _unescape(a.get("strValue", "")),
+            _unescape(a.get("unit", "")),
+            a.get("scaleFactor", ""),
+            a.get("decPlaces", ""),
+            raw.strip(),
+        ))
+    return values
+
+
+def decode_values(text: str) -> list[EtaValue]:
+    """Decode all values of a /user/var or /user/vars response."""
+    values = _decode_fast(text)
+    if len(values) != text.count("<value ") + text.count("<variable "):
+        values = _decode_generic(text)
+    return values
+
+
+def decode_value(text: str) -> EtaValue:
+    """Decode a /user/var response."""
+    values = decode_values(text)
+    if not values:
+        raise ValueError(f"No value in ETA response: {text[:200]}")
+    return values[0]
+
+
+class EtaError(NamedTuple):
+    """One active fault of /user/errors."""
+
+    # uri and name of the function block reporting it, e.g. /112/10021 "Kessel"
+    fub: str
+    fub_name: str
+    msg: str
+    priority: str
+    time: str
+    text: str
+
+    @property
+    def key(self) -> str:
+        """Stable id of the fault, the same for as long as it is active."""
+        return hashlib.sha1(f"{self.fub}\0{self.msg}\0{self.time}".encode()).hexdigest()[:16]
+
+
+class EtaErrorDiff(NamedTuple):
+    raised: list[EtaError]
+    cleared: list[EtaError]
+
+
+def decode_errors(text: str) -> tuple[dict[str, str], list[EtaError]]:
+    """Decode a /user/errors response into its function blocks (uri -> name) and faults."""
+    root = ElementTree.fromstring(text)
+    fubs = {}
+    errors = []
+    for fub in root.iterfind(".//{*}fub"):
+        uri = fub.get("uri", "")
+        fubs[uri] = fub.get("name", "")
+        for error in fub.iterfind("{*}error"):
+            errors.append(EtaError(
+                uri,
+                fubs[uri],
+                error.get("msg", ""),
+                error.get("priority", ""),
+                error.get("time", ""),
+                (error.text or "").strip(),
+            ))
+    return fubs, errors
+
+
+class EtaErrorFeed:
+    """Active faults of an ETA unit as seen by one consumer.
+
+    The body of /user/errors only changes with the faults, so a response
+    with the digest of the previous one is not parsed at all. Otherwise the
+    faults are compared by key to tell raised from cleared ones.
+    """
+
+    def __init__(self):
+        self._digest: bytes | None = None
+        self._fubs: dict[str, str] = {}
+        self._errors: dict[str, EtaError] = {}
+
+    @property
+    def fubs(self) -> dict[str, str]:
+        return self._fubs
+
+    @property
+    def errors(self) -> dict[str, EtaError]:
+        return self._errors
+
+    def update(self, text: str) -> EtaErrorDiff | None:
+        """Take over a /user/errors response, return the changes or None."""
+        digest = hashlib.sha1(text.encode()).digest()
+        if digest == self._digest:
+            return None
+        fubs, errors = decode_errors(text)
+        self._digest = digest
+        current = {error.key: error for error in errors}
+        diff = EtaErrorDiff(
+            [error for key, error in current.items() if key not in self._errors],
+            [error for key, error in self._errors.items() if key not in current],
+        )
+        self._fubs = fubs
+        self._errors = current
+        return diff if any(diff) else None
+
+
+class EtaWriteInfo(NamedTuple):
+    """How to write a variable, from its varinfo; limits are in display units."""
+
+    scale_factor: int
+    dec_places: int
+    minimum: float | None = None
+    maximum: float | None = None
+
+
+def _write_info(variable: dict) -> EtaWriteInfo:
+    """Write info of a varinfo <variable>, with <min>/<max> from its validValues."""
+    scale_factor = int(variable.get("@scaleFactor") or 1)
+    valid = variable.get("validValues")
+
+    def limit(key):
+        value = valid.get(key) if isinstance(valid, dict) else None
+        if isinstance(value, dict):
+            value = value.get("#text")
+        return int(value) / scale_factor if value else None
+
+    return EtaWriteInfo(scale_factor, int(variable.get("@decPlaces") or 0), limit("min"), limit("max"))
+
+
 class EtaSensorDesc:
+    # menus can have thousands of nodes, keep each one small
+    __slots__ = (
+        "_id",
+        "_name",
+        "_parent",
+        "_unit",
+        "_sensor_type",
+        "_states",
+        "_canonicalName",
+        "_initialized",
+        "_write",
+        "_scale",
+    )
+
     def __init__(self, id, name, parent, sensor_type=SensorType.NUMERIC):
         self._id = id
-        self._name = name
+        # names like "Eingang" repeat all over the menu
+        self._name = sys.intern(name)
         self._parent = parent
         self._unit = None
         self._sensor_type = sensor_type
         self._states = None  # for text sensors, possible states
         self._canonicalName = None
+        self._initialized = False  # varinfo has been applied
+        self._write = None  # EtaWriteInfo of writable variables
+        self._scale = None  # (scale factor, decimal places) of numeric variables
 
     def updateName(self, canonicalName):
         self._canonicalName = canonicalName
 
     def updateUnit(self, unit):
-        self._unit = unit
+        self._unit = sys.intern(unit)
         self._sensor_type = SensorType.NUMERIC
 
     def updateStates(self, states: dict):
         self._states = states
         self._sensor_type = SensorType.TEXT
 
+    def updateTimeslot(self, unit):
+        # unit of the value applied within the time window, if any
+        self._unit = sys.intern(unit) if unit else None
+        self._sensor_type = SensorType.TIMESLOT
+
+    def updateWritable(self, write: EtaWriteInfo | None):
+        self._write = write
+
+    def updateScale(self, scale_factor: int, dec_places: int):
+        self._scale = (scale_factor, dec_places)
+
+    def markInitialized(self):
+        self._initialized = True
+
+    def takeMetadata(self, other: "EtaSensorDesc"):
+        """Reuse the varinfo loaded for the same uri in an older menu."""
+        self._unit = other._unit
+        self._sensor_type = other._sensor_type
+        self._states = other._states
+        self._write = other._write
+        self._scale = other._scale
+        self._initialized = other._initialized
+
+    @property
+    def initialized(self):
+        return self._initialized
+
+    @property
+    def states(self):
+        return self._states
+
+    @property
+    def parent(self):
+        return self._parent
+
     @property
     def id(self):
         return self._id
@@ -69,63 +341,254 @@ class EtaSensorDesc:
     @property
     def sensor_type(self):
         return self._sensor_type
+
+    @property
+    def writable(self) -> bool:
+        return self._write is not None
+
+    @property
+    def write_info(self) -> EtaWriteInfo | None:
+        return self._write
+
+    @property
+    def scale(self) -> tuple[int, int] | None:
+        return self._scale
     
-    def getValue(self, data) -> float | str:
+    def getValue(self, data: EtaValue) -> float | str:
         match self._sensor_type:
             case SensorType.TEXT:
-                value = data["#text"]
-                return self._states.get(value, data["@strValue"])
+                return self._states.get(data.raw, data.str_value)
+            case SensorType.TIMESLOT:
+                # the window as the unit shows it, schedule.py decodes the raw value
+                return data.str_value
             case SensorType.NUMERIC:
-                unit = data["@unit"]
-                if unit in FLOAT_SENSOR_UNITS:
-                    scale_factor = int(data["@scaleFactor"])
-                    decimal_places = int(data["@decPlaces"])
-                    raw_value = float(data["#text"])
+                if data.unit in FLOAT_SENSOR_UNITS:
+                    scale_factor = int(data.scale_factor)
+                    decimal_places = int(data.dec_places)
+                    raw_value = float(data.raw)
                     value = raw_value / scale_factor
                     value = round(value, decimal_places)
                 else:
                     # use default text string representation for values that cannot be parsed properly
-                    value = data["@strValue"]
+                    value = data.str_value
                 return value
 
         return -1
 
+    def encodeValue(self, value: float | str) -> str:
+        """Raw value to write for ``value`` in display units, or a state of text sensors."""
+        write = self._write
+        if write is None:
+            raise ValueError(f"ETA variable {self._id} is not writable")
+        if self._sensor_type is SensorType.TEXT:
+            for raw, state in self._states.items():
+                if state == value:
+                    return raw
+            raise ValueError(f"{value} is not a state of ETA variable {self._id}")
+        value = round(float(value), write.dec_places)
+        if (write.minimum is not None and value < write.minimum) or (
+            write.maximum is not None and value > write.maximum
+        ):
+            raise ValueError(f"{value} is out of range for ETA variable {self._id}")
+        return str(round(value * write.scale_factor))
+
     def map(self, value):
         if self._states:
             return self._states.get(value, value)
         else:
             return value
 
-    def canonicalName(self) -> str:
+    def _label(self, labels: dict) -> str:
+        # canonical name without caching it, parents are memoized in labels
         if self._canonicalName:
             return self._canonicalName
-        else:
-            cn = ""
-            if self._parent:
-                cn = cn + self._parent.canonicalName() + " > "
+        if self._parent is None:
+            return self._name
+        parent = labels.get(self._parent)
+        if parent is None:
+            parent = labels[self._parent] = self._parent._label(labels)
+        return parent + " > " + self._name
+
+    def canonicalName(self) -> str:
+        if not self._canonicalName:
+            # computed on first use only, most menu nodes never need it
+            self._canonicalName = self._label({})
+        return self._canonicalName
+
+
+class EtaValueDecoder:
+    """Decode the values of a fixed list of sensors in one pass.
+
+    Scale factor and decimal places of the numeric sensors are taken from
+    their varinfo once and kept in flat arrays, so a poll only converts the
+    raw values: all at once if every value is present and reported in the
+    unit of its varinfo. Other values take ``EtaSensorDesc.getValue``.
+    """
+
+    def __init__(self, sensors: Sequence[EtaSensorDesc]):
+        self._sensors = list(sensors)
+        self._numeric: list[EtaSensorDesc] = []
+        self._other: list[EtaSensorDesc] = []
+        for sensor in self._sensors:
+            if sensor.sensor_type is SensorType.NUMERIC and sensor.unit and sensor.scale is not None:
+                self._numeric.append(sensor)
+            else:
+                self._other.append(sensor)
+        # varinfo still to come changes how these decode
+        self._uninitialized = [sensor for sensor in self._sensors if not sensor.initialized]
+        self._uris = [sensor.id for sensor in self._numeric]
+        self._units = [sensor.unit for sensor in self._numeric]
+        self._divisors = array("d", [sensor.scale[0] or 1 for sensor in self._numeric])
+        self._places = array("b", [sensor.scale[1] for sensor in self._numeric])
+
+    def matches(self, sensors: Sequence[EtaSensorDesc]) -> bool:
+        """Whether the decoder was built for ``sensors``, with their current metadata."""
+        return (
+            len(sensors) == len(self._sensors)
+            and all(map(operator.is_, sensors, self._sensors))
+            and not any(sensor.initialized for sensor in self._uninitialized)
+        )
+
+    def decode(self, values: dict[str, EtaValue]) -> dict[str, float | str]:
+        result = {}
+        present = [values.get(uri) for uri in self._uris]
+        try:
+            if None in present or [value.unit for value in present] != self._units:
+                raise ValueError
+            raws = map(float, [value.raw for value in present])
+            result.update(zip(self._uris, map(round, map(operator.truediv, raws, self._divisors), self._places)))
+        except ValueError:
+            # a missing or unusual value, decode one by one
+            self._decode_each(self._numeric, values, result)
+        self._decode_each(self._other, values, result)
+        return result
+
+    @staticmethod
+    def _decode_each(sensors: list[EtaSensorDesc], values: dict[str, EtaValue], result: dict):
+        for sensor in sensors:
+            value = values.get(sensor.id)
+            if value is None:
+                continue
+            try:
+                result[sensor.id] = sensor.getValue(value)
+            except Exception as e:
+                _LOGGER.warning("Failed to decode ETA sensor %s: %s", sensor.id, e)
+
+
+class SensorIndex:
+    """Search index over the canonical names of all menu nodes.
+
+    Labels are tokenized into their " > " path segments (the first one is the
+    fub), the words of each segment and the unit if known. A query matches if
+    every term is a prefix of one of the tokens, terms without any prefix
+    match fall back to a substring search on the label.
+    """
 
-            cn = cn + self._name
-            return cn
+    def __init__(self, sensors: dict[str, EtaSensorDesc]):
+        self._sensors: list[EtaSensorDesc] = []
+        self._labels: list[str] = []
+        self._folded: list[str] = []
+        postings: dict[str, list[int]] = {}
+        memo = {}
+        for position, sensor in enumerate(sensors.values()):
+            label = sensor._label(memo)
+            folded = label.casefold()
+            self._sensors.append(sensor)
+            self._labels.append(label)
+            self._folded.append(folded)
+            tokens = set()
+            for segment in folded.split(" > "):
+                tokens.add(segment)
+                tokens.update(segment.split())
+            if sensor.unit:
+                tokens.add(sensor.unit.casefold())
+            for token in tokens:
+                postings.setdefault(token, []).append(position)
+        self._tokens = sorted(postings)
+        self._postings = postings
+
+    def __len__(self):
+        return len(self._sensors)
+
+    def _prefix(self, term: str) -> set[int]:
+        positions = set()
+        i = bisect.bisect_left(self._tokens, term)
+        while i < len(self._tokens) and self._tokens[i].startswith(term):
+            positions.update(self._postings[self._tokens[i]])
+            i += 1
+        return positions
+
+    def _substring(self, term: str) -> set[int]:
+        return {position for position, label in enumerate(self._folded) if term in label}
+
+    def _hits(self, query: str) -> Sequence[int]:
+        positions = None
+        for term in query.replace(">", " ").casefold().split():
+            matches = self._prefix(term) or self._substring(term)
+            positions = matches if positions is None else positions & matches
+            if not positions:
+                break
+        return range(len(self._sensors)) if positions is None else sorted(positions)
+
+    def matching(self, query: str = "") -> list[EtaSensorDesc]:
+        """Sensors matching ``query`` whatever their type, e.g. to load their varinfo."""
+        return [self._sensors[position] for position in self._hits(query)]
+
+    def search(
+        self,
+        query: str = "",
+        sensor_type: SensorType | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> tuple[list[SelectOptionDict], int]:
+        """Return one page of matching options and the total number of matches.
+
+        ``sensor_type`` only matches sensors whose varinfo is known, see ``matching``.
+        """
+        hits = self._hits(query)
+        if sensor_type is not None:
+            hits = [
+                position
+                for position in hits
+                if self._sensors[position].initialized
+                and self._sensors[position].sensor_type == sensor_type
+            ]
+        end = None if limit is None else offset + limit
+        options = [
+            SelectOptionDict(value=self._sensors[position].id, label=self._labels[position])
+            for position in hits[offset:end]
+        ]
+        return options, len(hits)
 
 
 class SensorDict:
     def __init__(self) -> None:
         # id to sensor
         self._sensors: dict[str, EtaSensorDesc] = {}
-        self._label_to_id: dict[str, str] = {}
-        self._id_to_label: dict[str, str] = {}
+        # label to id, built on first lookup by name
+        self._label_to_id: dict[str, str] | None = None
+        self._index: SensorIndex | None = None
 
     def add(self, sensor: EtaSensorDesc):
         if not sensor.id in self._sensors:
             self._sensors[sensor.id] = sensor
-            self._id_to_label[sensor.id] = sensor.canonicalName()
-            self._label_to_id[sensor.canonicalName()] = sensor.id
+            self._label_to_id = None
+            self._index = None
 
     def update(self, sensor: EtaSensorDesc):
-        oldLabel = self._id_to_label[sensor.id]
-        self._id_to_label[sensor.id] = sensor.canonicalName()
-        self._label_to_id[sensor.canonicalName()] = sensor.id
-        self._label_to_id.pop(oldLabel)
+        self._label_to_id = None
+        self._index = None
+
+    def index(self) -> SensorIndex:
+        """Return the search index, built on first use."""
+        if self._index is None:
+            self._index = SensorIndex(self._sensors)
+        return self._index
+
+    def _labels(self) -> dict[str, str]:
+        """Return id -> canonical name for all sensors."""
+        memo = {}
+        return {id: sensor._label(memo) for id, sensor in self._sensors.items()}
 
     @property
     def sensors(self) -> dict[str, EtaSensorDesc]:
@@ -135,64 +598,749 @@ class SensorDict:
         return self._sensors[id]
 
     def byName(self, name: str) -> EtaSensorDesc:
+        if self._label_to_id is None:
+            self._label_to_id = {label: id for id, label in self._labels().items()}
         id = self._label_to_id[name]
         return self._sensors[id]
 
     def names(self) -> list[str]:
-        return list(self._label_to_id.keys())
+        return list(dict.fromkeys(self._labels().values()))
     
     def nameDict(self) -> list[dict[str, str]]:
-        options = [{"value": k, "label": v} for k, v in self._id_to_label.items()]
+        options = [{"value": k, "label": v} for k, v in self._labels().items()]
         return options
 
 
+class MenuDiff(NamedTuple):
+    """Uris added, removed and renamed between two menus."""
+    added: list[str]
+    removed: list[str]
+    renamed: list[str]
+
+
+def _menu_digests(sensors: SensorDict) -> tuple[dict[str, bytes], dict[str | None, list[str]]]:
+    """Hash every subtree of the menu, return digests and children by parent uri."""
+    children: dict[str | None, list[str]] = {}
+    for sensor in sensors.sensors.values():
+        children.setdefault(sensor.parent.id if sensor.parent else None, []).append(sensor.id)
+
+    digests: dict[str, bytes] = {}
+
+    def digest(uri):
+        if uri not in digests:
+            digests[uri] = b""  # guards against uris repeated below themselves
+            sensor = sensors.byId(uri)
+            h = hashlib.sha1(f"{sensor.id}\0{sensor.name}\0".encode())
+            for child in children.get(uri, ()):
+                h.update(digest(child))
+            digests[uri] = h.digest()
+        return digests[uri]
+
+    for uri in sensors.sensors:
+        digest(uri)
+    return digests, children
+
+
+def diff_menus(old: SensorDict, new: SensorDict) -> MenuDiff:
+    """Structural diff of two menus, descending only into changed subtrees."""
+    old_digests, old_children = _menu_digests(old)
+    new_digests, new_children = _menu_digests(new)
+    added, removed, renamed = [], [], []
+
+    def collect(uri, children, out):
+        out.append(uri)
+        for child in children.get(uri, ()):
+            collect(child, children, out)
+
+    def compare(old_ids, new_ids):
+        old_set, new_set = set(old_ids), set(new_ids)
+        for uri in old_ids:
+            if uri not in new_set:
+                collect(uri, old_children, removed)
+        for uri in new_ids:
+            if uri not in old_set:
+                collect(uri, new_children, added)
+            elif old_digests[uri] != new_digests[uri]:
+                if old.byId(uri).name != new.byId(uri).name:
+                    renamed.append(uri)
+                compare(old_children.get(uri, ()), new_children.get(uri, ()))
+
+    compare(old_children.get(None, ()), new_children.get(None, ()))
+    # nodes moved to another parent show up on both sides
+    moved = set(added) & set(removed)
+    return MenuDiff(
+        [uri for uri in added if uri not in moved],
+        [uri for uri in removed if uri not in moved],
+        renamed,
+    )
+
+
+class EtaMenuParser:
+    """Build a SensorDict from the /user/menu document while it is received.
+
+    Chunks are fed as they arrive and parsed SAX style: every fub and object
+    becomes an EtaSensorDesc on its start tag, no document tree is built.
+    """
+
+    def __init__(self):
+        self._parser = ElementTree.XMLParser(target=self)
+        self._hash = hashlib.sha1()
+        self._sensors = SensorDict()
+        # open fub/object elements, innermost last; None for other elements
+        self._stack: list[EtaSensorDesc | None] = []
+
+    def feed(self, data: bytes):
+        self._hash.update(data)
+        self._parser.feed(data)
+
+    def finish(self) -> SensorDict:
+        self._parser.close()
+        return self._sensors
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    # parser target interface
+    def start(self, tag, attrib):
+        # strip the namespace of the ETA schema
+        tag = tag.rpartition("}")[2]
+        if tag == "object":
+            parent = self._stack[-1] if self._stack else None
+        elif tag == "fub":
+            parent = None
+        else:
+            self._stack.append(None)
+            return
+        sensor = EtaSensorDesc(attrib["uri"], attrib["name"], parent)
+        self._sensors.add(sensor)
+        self._stack.append(sensor)
+
+    def end(self, tag):
+        self._stack.pop()
+
+
+class RequestPriority(IntEnum):
+    # lower value is served first
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+class EtaRequestScheduler:
+    """Limit the number of requests in flight against one ETA unit.
+
+    Waiting requests are served by priority, FIFO within the same priority.
+    """
+
+    def __init__(self, max_in_flight: int = MAX_PARALLEL_REQUESTS, timeout: float = REQUEST_TIMEOUT):
+        self._max_in_flight = max_in_flight
+        self._timeout = timeout
+        self._in_flight = 0
+        self._waiting: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._requests = 0
+        self._timeouts = 0
+        self._max_queue_depth = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def metrics(self) -> dict[str, float]:
+        return {
+            "requests": self._requests,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self._max_queue_depth,
+            "timeouts": self._timeouts,
+            "wait_time_avg": self._wait_total / self._requests if self._requests else 0.0,
+            "wait_time_max": self._wait_max,
+        }
+
+    async def _acquire(self, priority: RequestPriority):
+        if self._in_flight < self._max_in_flight and not self._waiting:
+            self._in_flight += 1
+            return
+        slot = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (priority, next(self._sequence), slot))
+        self._max_queue_depth = max(self._max_queue_depth, len(self._waiting))
+        try:
+            await slot
+        except asyncio.CancelledError:
+            if slot.done() and not slot.cancelled():
+                # the slot was already handed over, pass it on
+                self._release()
+            else:
+                self._waiting = [w for w in self._waiting if w[2] is not slot]
+                heapq.heapify(self._waiting)
+            raise
+
+    def _release(self):
+        # hand the slot directly to the next waiter, keeping in_flight unchanged
+        while self._waiting:
+            _, _, slot = heapq.heappop(self._waiting)
+            if not slot.done():
+                slot.set_result(None)
+                return
+        self._in_flight -= 1
+
+    async def run(self, request, priority: RequestPriority = RequestPriority.BACKGROUND):
+        """Run ``request`` (a coroutine function) once a slot is free."""
+        start = time.monotonic()
+        await self._acquire(priority)
+        wait = time.monotonic() - start
+        self._requests += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        try:
+            async with asyncio.timeout(self._timeout):
+                return await request()
+        except TimeoutError:
+            self._timeouts += 1
+            raise
+        finally:
+            self._release()
+
+
+class EtaRequestStats:
+    """Requests, errors and recent latencies per endpoint.
+
+    Endpoints are method and the first two path segments, e.g. "GET /user/var".
+    Errors are failed connections, timeouts and server errors.
+    The latest latency of every requested path is kept to find slow sensors.
+    """
+
+    def __init__(self, samples: int = LATENCY_SAMPLES):
+        self._samples = samples
+        # endpoint -> [requests, errors, latencies]
+        self._endpoints: dict[str, list] = {}
+        self._latest: dict[str, float] = {}
+
+    @staticmethod
+    def _percentile(ordered: list[float], q: float) -> float:
+        return ordered[max(math.ceil(q * len(ordered)) - 1, 0)]
+
+    def record(self, method: str, suffix: str, duration: float, failed: bool):
+        end = suffix.find("/", 6)
+        endpoint = f"{method.upper()} {suffix[:end] if end > 0 else suffix}"
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = [0, 0, collections.deque(maxlen=self._samples)]
+        stats[0] += 1
+        stats[1] += failed
+        stats[2].append(duration)
+        self._latest[suffix] = duration
+
+    @property
+    def totals(self) -> dict[str, float]:
+        requests = sum(stats[0] for stats in self._endpoints.values())
+        errors = sum(stats[1] for stats in self._endpoints.values())
+        return {"request_errors": errors, "error_rate": errors / requests if requests else 0.0}
+
+    @property
+    def endpoints(self) -> dict[str, dict[str, float]]:
+        """Requests, errors, error rate and latency p50/p95/max in seconds."""
+        metrics = {}
+        for endpoint, (requests, errors, latencies) in self._endpoints.items():
+            ordered = sorted(latencies)
+            metrics[endpoint] = {
+                "requests": requests,
+                "errors": errors,
+                "error_rate": errors / requests,
+                "latency_p50": self._percentile(ordered, 0.5),
+                "latency_p95": self._percentile(ordered, 0.95),
+                "latency_max": ordered[-1],
+            }
+        return metrics
+
+    def slowest(self, count: int = 10) -> dict[str, float]:
+        """The ``count`` paths with the highest latest latency."""
+        return dict(sorted(self._latest.items(), key=lambda item: item[1], reverse=True)[:count])
+
+
+# errors meaning the controller did not answer at all
+CONNECTION_ERRORS = (aiohttp.ClientError, OSError, TimeoutError)
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class EtaCircuitBreaker:
+    """Stop talking to an ETA unit that keeps failing.
+
+    After ``threshold`` consecutive connection failures the circuit opens and
+    requests fail immediately. Once the backoff has passed, a single probe is
+    let through: success closes the circuit, failure opens it again with
+    twice the backoff. Backoffs are jittered so several units do not retry in
+    lockstep.
+    """
+
+    def __init__(
+        self,
+        threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        backoff_min: float = CIRCUIT_BACKOFF_MIN,
+        backoff_max: float = CIRCUIT_BACKOFF_MAX,
+        clock=time.monotonic,
+    ):
+        self._threshold = threshold
+        self._backoff_min = backoff_min
+        self._backoff_max = backoff_max
+        self._clock = clock
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._trips = 0
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    @property
+    def metrics(self) -> dict[str, float | str]:
+        return {
+            "circuit": self._state.value,
+            "circuit_trips": self._trips,
+            "consecutive_failures": self._failures,
+            "retry_in": max(self._retry_at - self._clock(), 0.0) if self._state is CircuitState.OPEN else 0.0,
+        }
+
+    def acquire(self) -> bool:
+        """Raise if requests are blocked, return True for the probe request."""
+        if self._state is CircuitState.CLOSED:
+            return False
+        if self._state is CircuitState.OPEN and self._clock() >= self._retry_at:
+            self._state = CircuitState.HALF_OPEN
+            return True
+        raise EtaUnavailableError(f"ETA unit unreachable after {self._failures} failed requests")
+
+    def success(self):
+        if self._state is not CircuitState.CLOSED:
+            _LOGGER.info("ETA unit reachable again")
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._backoff = 0.0
+
+    def failure(self):
+        self._failures += 1
+        if self._state is CircuitState.HALF_OPEN:
+            self._open(min(self._backoff * 2, self._backoff_max))
+        elif self._state is CircuitState.CLOSED and self._failures >= self._threshold:
+            self._trips += 1
+            _LOGGER.warning(
+                "ETA unit unreachable after %d failed requests, pausing requests", self._failures
+            )
+            self._open(self._backoff_min)
+
+    def abort_probe(self):
+        """The probe ended without an answer either way, allow a new one."""
+        if self._state is CircuitState.HALF_OPEN:
+            self._state = CircuitState.OPEN
+            self._retry_at = self._clock()
+
+    def _open(self, backoff: float):
+        self._state = CircuitState.OPEN
+        self._backoff = backoff
+        # equal jitter: wait between half and the full backoff
+        self._retry_at = self._clock() + backoff / 2 + random.uniform(0, backoff / 2)
+
+
+class EtaWriteQueue:
+    """Send writes one at a time, the newest value of a variable wins.
+
+    A write waits ``delay`` seconds before it is sent. Writes to the same
+    variable arriving meanwhile replace its value, so dragging a slider ends
+    in one request, and all their callers get the outcome of the value sent.
+    """
+
+    def __init__(self, send, delay: float = WRITE_COALESCE_DELAY):
+        # coroutine function (sensor, raw) -> value read back
+        self._send = send
+        self._delay = delay
+        # uri -> [sensor, raw, future, send time], in order of the first write
+        self._pending: dict[str, list] = {}
+        self._worker: asyncio.Task | None = None
+        self._writes = 0
+        self._coalesced = 0
+
+    @property
+    def metrics(self) -> dict[str, float]:
+        return {"writes": self._writes, "coalesced_writes": self._coalesced, "pending_writes": len(self._pending)}
+
+    async def write(self, sensor: EtaSensorDesc, raw: str):
+        loop = asyncio.get_running_loop()
+        entry = self._pending.get(sensor.id)
+        if entry is None:
+            future = loop.create_future()
+            # retrieved here in case every caller was cancelled meanwhile
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            entry = self._pending[sensor.id] = [sensor, raw, future, loop.time() + self._delay]
+        else:
+            entry[1] = raw
+            self._coalesced += 1
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._run())
+        return await asyncio.shield(entry[2])
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            uri, entry = next(iter(self._pending.items()))
+            wait = entry[3] - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            del self._pending[uri]
+            sensor, raw, future, _ = entry
+            self._writes += 1
+            try:
+                result = await self._send(sensor, raw)
+            except asyncio.CancelledError:
+                # closed while sending, the entry is no longer pending for close() to cancel
+                future.cancel()
+                raise
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+        for _, _, future, _ in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+
+
+def unit_key(host, port) -> tuple[str, str]:
+    """Identify an ETA unit however its host and port were entered."""
+    return str(host).strip().lower(), str(port)
+
+
+def create_client_session(max_in_flight: int = MAX_PARALLEL_REQUESTS) -> aiohttp.ClientSession:
+    """Session for a single ETA unit keeping its few connections alive."""
+    connector = aiohttp.TCPConnector(
+        limit=max_in_flight,
+        limit_per_host=max_in_flight,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TTL,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
 class EtaAPI:
-    def __init__(self, session, host, port):
+    def __init__(self, session, host, port, max_in_flight: int = MAX_PARALLEL_REQUESTS):
+        # without a session the API opens and owns a dedicated one
         self._session = session
+        self._owns_session = session is None
+        self._max_in_flight = max_in_flight
         self._host = host
         self._port = port
+        self._base_uri = f"http://{host}:{port}"
+        # suffix -> parsed URL, polls request the same few URLs over and over
+        self._urls: dict[str, URL] = {}
+        self._scheduler = EtaRequestScheduler(max_in_flight)
+        self._breaker = EtaCircuitBreaker()
         self._initialized = False
         self._sensors = SensorDict()
+        self._menu_hash = None
+        # uri -> pending varinfo request
+        self._varinfo_tasks: dict[str, asyncio.Future] = {}
+        # variable set name -> uris registered on the controller
+        self._varsets: dict[str, set[str]] = {}
+        # variable set name -> decoder of its sensors
+        self._decoders: dict[str, EtaValueDecoder] = {}
+        self._varsets_supported = True
+        # suffix -> pending GET shared by concurrent callers
+        self._pending: dict[str, asyncio.Future] = {}
+        # uri -> (expiry, value) of recent /user/var reads
+        self._values: dict[str, tuple[float, EtaValue]] = {}
+        self._cache_stats = {"value_cache_hits": 0, "value_cache_misses": 0, "coalesced_requests": 0}
+        self._stats = EtaRequestStats()
+        self._writes = EtaWriteQueue(self._send_write)
 
     def _build_uri(self, suffix):
-        return "http://" + self._host + ":" + str(self._port) + suffix
+        return self._base_uri + suffix
+
+    def _url(self, suffix) -> URL:
+        url = self._urls.get(suffix)
+        if url is None:
+            url = self._urls[suffix] = URL(self._build_uri(suffix))
+        return url
+
+    def _client(self):
+        if self._session is None:
+            self._session = create_client_session(self._max_in_flight)
+        return self._session
+
+    async def close(self):
+        """Close the session if it is owned by this API."""
+        self._writes.close()
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def request_metrics(self) -> dict[str, float]:
+        return {
+            **self._scheduler.metrics,
+            **self._breaker.metrics,
+            **self._stats.totals,
+            **self._cache_stats,
+            **self._writes.metrics,
+        }
+
+    @property
+    def request_stats(self) -> EtaRequestStats:
+        return self._stats
+
+    @property
+    def available(self) -> bool:
+        return self._breaker.state is CircuitState.CLOSED
+
+    async def _run(self, request, priority: RequestPriority):
+        """Run ``request`` through scheduler and circuit breaker."""
+        probe = False
 
-    def _evaluate_xml_dict(self, xml_dict, parent):
-        if type(xml_dict) is list:
-            for child in xml_dict:
-                self._evaluate_xml_dict(child, parent)
+        async def guarded():
+            nonlocal probe
+            # checked once the slot is granted, so queued requests stop as well
+            probe = self._breaker.acquire()
+            return await request()
+
+        try:
+            result = await self._scheduler.run(guarded, priority)
+        except EtaUnavailableError:
+            raise
+        except CONNECTION_ERRORS:
+            self._breaker.failure()
+            raise
+        except asyncio.CancelledError:
+            if probe:
+                self._breaker.abort_probe()
+            raise
+        except Exception:
+            # the unit answered, just not the way we expected
+            self._breaker.success()
+            raise
+        self._breaker.success()
+        return result
+
+    async def _request(self, method: str, suffix, priority: RequestPriority, **kwargs):
+        async def request():
+            start = time.perf_counter()
+            failed = True
+            try:
+                data = await getattr(self._client(), method)(self._url(suffix), **kwargs)
+                # read the body while holding the slot
+                await data.text()
+                failed = data.status >= 500
+                return data
+            finally:
+                self._stats.record(method, suffix, time.perf_counter() - start, failed)
+
+        return await self._run(request, priority)
+
+    async def _stream_request(self, suffix, consume, priority: RequestPriority = RequestPriority.BACKGROUND):
+        """GET ``suffix`` and pass the body to ``consume`` chunk by chunk."""
+        async def request():
+            start = time.perf_counter()
+            failed = True
+            try:
+                data = await self._client().get(self._url(suffix))
+                async for chunk in data.content.iter_chunked(MENU_CHUNK_SIZE):
+                    consume(chunk)
+                failed = data.status >= 500
+            finally:
+                self._stats.record("get", suffix, time.perf_counter() - start, failed)
+
+        await self._run(request, priority)
+
+    async def _get_request(self, suffix, priority: RequestPriority = RequestPriority.BACKGROUND):
+        # concurrent GETs of the same suffix share one request, the body is
+        # read before the response is handed out so every caller can use it
+        task = self._pending.get(suffix)
+        if task is None:
+            task = asyncio.ensure_future(self._request("get", suffix, priority))
+            self._pending[suffix] = task
+            task.add_done_callback(lambda t: self._request_done(suffix, t))
         else:
-            if "object" in xml_dict:
-                child = xml_dict["object"]
-                id = xml_dict["@uri"]
-                s = EtaSensorDesc(id, xml_dict["@name"], parent)
-                # add parent to uri_dict and evaluate childs then
-                self._sensors.add(s)
-                self._evaluate_xml_dict(child, s)
-            elif "fub" in xml_dict:
-                fub = xml_dict["fub"]
-                id = xml_dict["@uri"]
-                s = EtaSensorDesc(id, xml_dict["@name"], None)
-                # add parent to uri_dict and evaluate childs then
-                self._sensors.add(s)
-                self._evaluate_xml_dict(fub, s)
-            else:
-                id = xml_dict["@uri"]
-                s = EtaSensorDesc(id, xml_dict["@name"], parent)
-                # add parent to uri_dict and evaluate childs then
-                self._sensors.add(s)
+            self._cache_stats["coalesced_requests"] += 1
+        return await asyncio.shield(task)
+
+    def _request_done(self, suffix, task: asyncio.Future):
+        self._pending.pop(suffix, None)
+        if not task.cancelled():
+            # retrieved here in case every caller was cancelled meanwhile
+            task.exception()
 
-    async def _get_request(self, suffix):
-        data = await self._session.get(self._build_uri(suffix))
-        return data
+    async def _put_request(self, suffix, priority: RequestPriority = RequestPriority.BACKGROUND):
+        return await self._request("put", suffix, priority)
+
+    async def _delete_request(self, suffix, priority: RequestPriority = RequestPriority.BACKGROUND):
+        return await self._request("delete", suffix, priority)
 
     async def get_data(self, sensor: EtaSensorDesc):
+        return sensor.getValue(await self._get_value(sensor))
+
+    async def _get_value(self, sensor: EtaSensorDesc) -> EtaValue:
+        now = time.monotonic()
+        cached = self._values.get(sensor.id)
+        if cached is not None and cached[0] > now:
+            self._cache_stats["value_cache_hits"] += 1
+            return cached[1]
+        self._cache_stats["value_cache_misses"] += 1
         data = await self._get_request("/user/var" + sensor.id)
         text = await data.text()
-        data = xmltodict.parse(text)["eta"]["value"]
-        return sensor.getValue(data)
+        value = decode_value(text)
+        self._values[sensor.id] = (time.monotonic() + VALUE_CACHE_TTL, value)
+        return value
+
+    async def write_value(self, sensor: EtaSensorDesc, value: float | str) -> float | str:
+        """Write ``value`` (display units, or a state of text sensors) and return the value read back.
+
+        Raises ValueError for values the variable cannot take and
+        EtaWriteError if the unit rejects the write or does not take it over.
+        """
+        return await self._writes.write(sensor, sensor.encodeValue(value))
+
+    async def _send_write(self, sensor: EtaSensorDesc, raw: str) -> float | str:
+        suffix = "/user/var" + sensor.id
+        response = await self._request("post", suffix, RequestPriority.INTERACTIVE, data={"value": raw})
+        text = await response.text()
+        if response.status >= 300 or "<success" not in text:
+            raise EtaWriteError(f"Writing {raw} to {sensor.id} failed: {text[:200]}")
+        # one targeted read, not shared with a GET that may have started before the write
+        self._values.pop(sensor.id, None)
+        response = await self._request("get", suffix, RequestPriority.INTERACTIVE)
+        value = decode_value(await response.text())
+        self._values[sensor.id] = (time.monotonic() + VALUE_CACHE_TTL, value)
+        if value.raw != raw:
+            raise EtaWriteError(f"{sensor.id} reads {value.raw} after writing {raw}")
+        return sensor.getValue(value)
 
-    async def initializeSensor(self, sensor: EtaSensorDesc):
+    async def get_all_data(self, sensors: Sequence[EtaSensorDesc], varset: str | None = None) -> dict[str, float | str]:
+        """Read all sensors, through the variable set ``varset`` if given."""
+        raw = await self.get_all_values(sensors, varset)
+        return self._decoder(sensors, varset).decode(raw)
+
+    def _decoder(self, sensors: Sequence[EtaSensorDesc], varset: str | None) -> EtaValueDecoder:
+        # a variable set always holds the same sensors, its decoder is kept
+        decoder = self._decoders.get(varset) if varset else None
+        if decoder is None or not decoder.matches(sensors):
+            decoder = EtaValueDecoder(sensors)
+            if varset:
+                self._decoders[varset] = decoder
+        return decoder
+
+    async def get_all_values(self, sensors: Sequence[EtaSensorDesc], varset: str | None = None) -> dict[str, EtaValue]:
+        """Like ``get_all_data``, but return the values undecoded."""
+        if varset and sensors and self._varsets_supported:
+            try:
+                return await self._read_varset(varset, sensors)
+            except EtaVarSetUnsupportedError as e:
+                _LOGGER.warning("ETA variable sets not supported, reading sensors one by one: %s", e)
+                self._varsets_supported = False
+            except EtaVarSetError as e:
+                # e.g. a busy controller answering 503, the set is used again next time
+                _LOGGER.warning("ETA variable set %s not usable, reading sensors one by one: %s", varset, e)
+                self._varsets.pop(varset, None)
+        return await self._get_single_values(sensors)
+
+    async def _read_varset(self, name: str, sensors: Sequence[EtaSensorDesc]) -> dict[str, EtaValue]:
+        uris = [sensor.id for sensor in sensors]
+        try:
+            await self._ensure_varset(name, uris)
+            return await self._get_varset_values(name, sensors)
+        except EtaVarSetUnsupportedError:
+            raise
+        except EtaVarSetError as e:
+            # the set is gone (e.g. controller reboot), recreate it once
+            _LOGGER.debug("Recreating ETA variable set %s: %s", name, e)
+            self._varsets.pop(name, None)
+            await self._ensure_varset(name, uris)
+            return await self._get_varset_values(name, sensors)
+
+    async def _get_single_values(self, sensors: Sequence[EtaSensorDesc]) -> dict[str, EtaValue]:
+        # one pass over all sensors, one request at a time to spare the controller
+        values = {}
+        for sensor in sensors:
+            try:
+                values[sensor.id] = await self._get_value(sensor)
+            except EtaUnavailableError:
+                raise
+            except Exception as e:
+                _LOGGER.warning("Failed to read ETA sensor %s: %s", sensor.id, e)
+        return values
+
+    async def _check_varset_response(self, response, action, creating: bool = False):
+        if creating and response.status in (404, 405):
+            text = await response.text()
+            raise EtaVarSetUnsupportedError(f"{action} failed with status {response.status}: {text}")
+        if response.status >= 300:
+            text = await response.text()
+            raise EtaVarSetError(f"{action} failed with status {response.status}: {text}")
+
+    async def _ensure_varset(self, name: str, uris: Sequence[str]):
+        """Create the variable set ``name`` or align it with ``uris``."""
+        registered = self._varsets.get(name)
+        if registered is None:
+            # start from a clean set, the controller may still know an old one
+            await self._delete_request(f"/user/vars/{name}")
+            response = await self._put_request(f"/user/vars/{name}")
+            await self._check_varset_response(response, f"Creating variable set {name}", creating=True)
+            registered = set()
+            self._varsets[name] = registered
+
+        for uri in [uri for uri in uris if uri not in registered]:
+            response = await self._put_request(f"/user/vars/{name}{uri}")
+            await self._check_varset_response(response, f"Adding {uri} to variable set {name}")
+            registered.add(uri)
+        for uri in registered - set(uris):
+            await self._delete_request(f"/user/vars/{name}{uri}")
+            registered.discard(uri)
+
+    async def _get_varset_values(self, name: str, sensors: Sequence[EtaSensorDesc]) -> dict[str, EtaValue]:
+        response = await self._get_request(f"/user/vars/{name}")
+        await self._check_varset_response(response, f"Reading variable set {name}")
+        text = await response.text()
+        if "<vars" not in text:
+            raise EtaVarSetError(f"Variable set {name} not found")
+
+        # the controller reports uris without the leading slash
+        by_uri = {sensor.id.strip("/"): sensor.id for sensor in sensors}
+        values = {}
+        for variable in decode_values(text):
+            uri = by_uri.get(variable.uri.removeprefix("/user/var").strip("/"))
+            if uri:
+                values[uri] = variable
+        return values
+
+    async def delete_varset(self, name: str):
+        self._varsets.pop(name, None)
+        self._decoders.pop(name, None)
+        await self._delete_request(f"/user/vars/{name}")
+
+    async def delete_varsets(self, prefix: str):
+        """Delete the variable sets registered through this API whose name starts with ``prefix``."""
+        for name in [name for name in self._varsets if name.startswith(prefix)]:
+            await self.delete_varset(name)
+
+    async def poll_errors(
+        self, feed: EtaErrorFeed, priority: RequestPriority = RequestPriority.BACKGROUND
+    ) -> EtaErrorDiff | None:
+        """Read the active faults into ``feed``, return what changed since its last read."""
+        response = await self._get_request("/user/errors", priority)
+        text = await response.text()
+        if response.status >= 300:
+            raise ValueError(f"Reading /user/errors failed with status {response.status}: {text[:200]}")
+        return feed.update(text)
+
+    async def _load_varinfo(self, sensor: EtaSensorDesc) -> bool:
         try:
             data = await self._get_request("/user/varinfo" + sensor.id)
             text = await data.text()
@@ -216,40 +1364,170 @@ class EtaAPI:
                         unit = varInfo["variable"]["@unit"]
                         if unit in FLOAT_SENSOR_UNITS:
                             sensor.updateUnit(unit)
-                    case "TIMESLOT":
-                        pass
+                            sensor.updateScale(
+                                int(varInfo["variable"].get("@scaleFactor") or 1),
+                                int(varInfo["variable"].get("@decPlaces") or 0),
+                            )
+                    case "TIMESLOT" | "TIMESLOTPLUSTEMPERATURE":
+                        unit = varInfo["variable"]["@unit"]
+                        sensor.updateTimeslot(unit if unit in FLOAT_SENSOR_UNITS else None)
                     case _:
-                        print(f"Unknown ETA Sensor Type: {type}")
+                        _LOGGER.warning("Unknown ETA Sensor Type: %s", type)
+                if varInfo["variable"].get("@isWritable") == "1" and type in ("TEXT", "DEFAULT"):
+                    sensor.updateWritable(_write_info(varInfo["variable"]))
+                sensor.markInitialized()
+            return sensor.initialized
         except Exception as e:
-            print(f"Failed to update sensor definition {sensor.id}: {e}")
+            _LOGGER.warning("Failed to update sensor definition %s: %s", sensor.id, e)
+            return False
 
-    async def _get_raw_sensor_dict(self):
-        data = await self._get_request("/user/menu/")
-        text = await data.text()
-        data = xmltodict.parse(text)
-        raw_dict = data["eta"]["menu"]["fub"]
-        return raw_dict
+    async def initializeSensor(self, sensor: EtaSensorDesc) -> bool:
+        # concurrent calls for the same uri share one varinfo request
+        task = self._varinfo_tasks.get(sensor.id)
+        if task is None:
+            task = asyncio.ensure_future(self._load_varinfo(sensor))
+            self._varinfo_tasks[sensor.id] = task
+            task.add_done_callback(lambda _: self._varinfo_tasks.pop(sensor.id, None))
+        return await asyncio.shield(task)
+
+    async def initializeSensors(self, sensors: Sequence[EtaSensorDesc]) -> dict[str, float]:
+        """Load varinfo of all uninitialized sensors in parallel.
+
+        Parallelism is bounded by the request scheduler. Returns a summary
+        with the number of requested and failed sensors and the duration.
+        """
+        start = time.monotonic()
+        pending = [sensor for sensor in sensors if not sensor.initialized]
+        results = await asyncio.gather(*(self.initializeSensor(sensor) for sensor in pending))
+        summary = {
+            "requested": len(pending),
+            "failed": results.count(False),
+            "duration": time.monotonic() - start,
+        }
+        _LOGGER.debug(
+            "Loaded varinfo of %d ETA sensors in %.2fs, %d failed",
+            summary["requested"], summary["duration"], summary["failed"],
+        )
+        return summary
+
+    async def _read_menu(self, priority: RequestPriority) -> tuple[SensorDict, str]:
+        parser = EtaMenuParser()
+        await self._stream_request("/user/menu/", parser.feed, priority)
+        return parser.finish(), parser.hexdigest()
 
-    async def _initialize(self):
+    async def _initialize(self, priority: RequestPriority):
         if not self._initialized:
-            raw_dict = await self._get_raw_sensor_dict()
-            self._evaluate_xml_dict(raw_dict, None)
+            self._sensors, self._menu_hash = await self._read_menu(priority)
             self._initialized = True
 
+    @property
+    def initialized(self) -> bool:
+        return self._initialized
+
+    def export_cache(self) -> dict:
+        """Serialize the menu tree and loaded varinfo for persistent storage."""
+        menu = []
+        varinfo = {}
+        for sensor in self._sensors.sensors.values():
+            parent = sensor.parent.id if sensor.parent else None
+            menu.append([sensor.id, sensor.name, parent])
+            if sensor.initialized:
+                varinfo[sensor.id] = {
+                    "type": sensor.sensor_type.value,
+                    "unit": sensor.unit,
+                    "states": sensor.states,
+                    "write": sensor.write_info,
+                    "scale": sensor.scale,
+                }
+        return {"menu_hash": self._menu_hash, "menu": menu, "varinfo": varinfo}
+
+    def import_cache(self, data: dict):
+        """Restore the state written by ``export_cache`` without any request."""
+        sensors = SensorDict()
+        for id, name, parent in data["menu"]:
+            parent = sensors.sensors.get(parent) if parent else None
+            sensors.add(EtaSensorDesc(id, name, parent))
+        for id, info in data["varinfo"].items():
+            sensor = sensors.sensors.get(id)
+            if sensor is None:
+                continue
+            if info["type"] == SensorType.TIMESLOT.value:
+                sensor.updateTimeslot(info["unit"])
+            elif info["states"] is not None:
+                sensor.updateStates(info["states"])
+            elif info["unit"] is not None:
+                sensor.updateUnit(info["unit"])
+            if info.get("write"):
+                sensor.updateWritable(EtaWriteInfo(*info["write"]))
+            if info.get("scale"):
+                sensor.updateScale(*info["scale"])
+            sensor.markInitialized()
+        self._sensors = sensors
+        self._menu_hash = data["menu_hash"]
+        self._initialized = True
 
-    async def get_sensors(self) -> SensorDict:
-        await self._initialize()
+    async def revalidate(self, priority: RequestPriority = RequestPriority.BACKGROUND) -> MenuDiff | None:
+        """Re-read the menu and take it over if it has changed.
+
+        Varinfo of uris present in both menus is carried over, only added
+        sensors need to be initialized again. Returns the structural diff,
+        or None if nothing changed.
+        """
+        sensors, menu_hash = await self._read_menu(priority)
+        if menu_hash == self._menu_hash:
+            return None
+        diff = diff_menus(self._sensors, sensors)
+        for uri, sensor in sensors.sensors.items():
+            old = self._sensors.sensors.get(uri)
+            if old is not None and old.initialized:
+                sensor.takeMetadata(old)
+        self._sensors = sensors
+        self._menu_hash = menu_hash
+        return diff if any(diff) else None
+
+    async def get_sensors(
+        self, priority: RequestPriority = RequestPriority.BACKGROUND, refresh: bool = False
+    ) -> SensorDict:
+        """Return the menu tree, re-reading it from the unit if ``refresh`` is set."""
+        if refresh and self._initialized:
+            await self.revalidate(priority)
+        await self._initialize(priority)
         return self._sensors
 
 
 class EtaAPIFactory:
-    """Factory to manage and cache EtaAPI instances."""
+    """Share one EtaAPI per ETA unit between the entries and flows using it.
 
-    _instances = {}
+    Every user acquires the instance under its own owner id (config entry or
+    flow id) and releases it when done. The last release closes the session
+    and drops the instance, so a removed or re-added unit starts clean.
+    """
+
+    _instances: dict[tuple[str, str], EtaAPI] = {}
+    _owners: dict[tuple[str, str], set[str]] = {}
 
     @staticmethod
-    def get_instance(session, host, port) -> EtaAPI:
-        key = (host, port)
+    def _key(host, port) -> tuple[str, str]:
+        return unit_key(host, port)
+
+    @staticmethod
+    def acquire(owner: str, host, port, session=None) -> EtaAPI:
+        """Return the API of ``host``, with a dedicated session if ``session`` is None."""
+        key = EtaAPIFactory._key(host, port)
         if key not in EtaAPIFactory._instances:
             EtaAPIFactory._instances[key] = EtaAPI(session, host, port)
+            EtaAPIFactory._owners[key] = set()
+        EtaAPIFactory._owners[key].add(owner)
         return EtaAPIFactory._instances[key]
+
+    @staticmethod
+    async def release(owner: str, host, port):
+        """Give up the reference of ``owner``, closing the API if it was the last."""
+        key = EtaAPIFactory._key(host, port)
+        owners = EtaAPIFactory._owners.get(key)
+        if owners is None:
+            return
+        owners.discard(owner)
+        if not owners:
+            del EtaAPIFactory._owners[key]
+            await EtaAPIFactory._instances.pop(key).close()
@@ -0,0 +1,73 @@
+"""
+Platform for the faults reported by the ETA unit.
+"""
+
+from __future__ import annotations
+
+from homeassistant import config_entries
+from homeassistant.components.binary_sensor import BinarySensorDeviceClass, BinarySensorEntity
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .const import DOMAIN
+from .coordinator import EtaErrorCoordinator
+from .entity import eta_device_info
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: config_entries.ConfigEntry,
+    async_add_entities,
+):
+    """Set up a problem sensor for the unit and for each of its function blocks."""
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]["error_coordinator"]
+    device_info = eta_device_info(config_entry.data)
+    entities = [EtaErrorSensor(coordinator, device_info, config_entry)]
+    entities.extend(
+        EtaErrorSensor(coordinator, device_info, config_entry, fub, name)
+        for fub, name in coordinator.fubs.items()
+    )
+    async_add_entities(entities)
+
+
+class EtaErrorSensor(CoordinatorEntity[EtaErrorCoordinator], BinarySensorEntity):
+    """On while the unit, or one function block of it, reports a fault."""
+
+    _attr_device_class = BinarySensorDeviceClass.PROBLEM
+
+    def __init__(
+        self,
+        coordinator: EtaErrorCoordinator,
+        device_info,
+        config_entry: config_entries.ConfigEntry,
+        fub: str | None = None,
+        fub_name: str | None = None,
+    ):
+        super().__init__(coordinator)
+        self._fub = fub
+        if fub is None:
+            self._attr_name = f"{device_info['name']} Errors"
+            self._attr_unique_id = f"eta_{config_entry.entry_id}_errors"
+        else:
+            self._attr_name = f"{device_info['name']} {fub_name} Errors"
+            self._attr_unique_id = f"eta_{config_entry.entry_id}_errors_{fub}"
+        self._attr_device_info = device_info
+
+    def _errors(self):
+        return [
+            error for error in (self.coordinator.data or {}).values()
+            if self._fub is None or error.fub == self._fub
+        ]
+
+    @property
+    def is_on(self) -> bool:
+        return bool(self._errors())
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            "errors": [
+                {"fub": error.fub_name, "msg": error.msg, "priority": error.priority, "time": error.time, "text": error.text}
+                for error in self._errors()
+            ]
+        }
@@ -0,0 +1,79 @@
+"""
+Platform for the weekly programs of the ETA unit, e.g. heating times.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from homeassistant import config_entries
+from homeassistant.components.calendar import CalendarEntity, CalendarEvent
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+from .const import DOMAIN
+from .coordinator import EtaDataUpdateCoordinator
+from .entity import EtaEntity, eta_device_info
+from .schedule import EtaSchedule, EtaTimeSlot
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: config_entries.ConfigEntry,
+    async_add_entities,
+):
+    """Set up a calendar for every weekly program selected in the options."""
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]["coordinator"]
+    device_info = eta_device_info(config_entry.data)
+    async_add_entities(
+        EtaScheduleCalendar(program, coordinator, device_info, config_entry)
+        for program in coordinator.programs.values()
+    )
+
+
+class EtaScheduleCalendar(EtaEntity, CalendarEntity):
+    """The time windows of one weekly program as recurring events.
+
+    The coordinator reads the program and publishes it under its root uri.
+    """
+
+    def __init__(
+        self,
+        program: EtaSchedule,
+        coordinator: EtaDataUpdateCoordinator,
+        device_info,
+        config_entry: config_entries.ConfigEntry,
+    ):
+        self._program = program
+        super().__init__(program.root, coordinator, device_info)
+        self._attr_name = f"{device_info['name']} {program.root.canonicalName()}"
+        self._attr_unique_id = f"eta_{config_entry.entry_id}_schedule_{program.root.id}"
+
+    def _event(self, start: datetime, end: datetime, slot: EtaTimeSlot) -> CalendarEvent:
+        summary = self._sensor.name
+        if slot.value is not None:
+            summary = f"{summary} {slot.value:g} {self._program.unit or ''}".rstrip()
+        return CalendarEvent(start=start, end=end, summary=summary)
+
+    @property
+    def event(self) -> CalendarEvent | None:
+        """The current or next time window."""
+        schedule = self._value
+        if schedule is None:
+            return None
+        now = dt_util.now()
+        for occurrence in schedule.occurrences(now, now + timedelta(days=8)):
+            return self._event(*occurrence)
+        return None
+
+    @property
+    def extra_state_attributes(self):
+        schedule = self._value
+        return {"schedule": schedule.as_dict()} if schedule else None
+
+    async def async_get_events(self, hass: HomeAssistant, start_date: datetime, end_date: datetime) -> list[CalendarEvent]:
+        schedule = self._value
+        if schedule is None:
+            return []
+        start = dt_util.as_local(start_date)
+        return [self._event(*occurrence) for occurrence in schedule.occurrences(start, end_date)]
@@ -3,19 +3,169 @@ Config flow for ETA Device integration.
 """
 
 import voluptuous as vol
-from copy import deepcopy
 from homeassistant import config_entries
 from homeassistant.core import callback
 from homeassistant.const import CONF_HOST, CONF_PORT, CONF_NAME, CONF_MODEL
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers import selector
-from .const import CHOOSEN_ENTITIES, DOMAIN, FLOAT_DICT
-from .api import EtaAPI, EtaAPIFactory
+from .const import (
+    CHOOSEN_ENTITIES,
+    ADAPTIVE_BASE_INTERVAL,
+    ADAPTIVE_MAX_LEVEL,
+    CONF_DEADBANDS,
+    CONF_PAGE,
+    CONF_POLL_INTERVALS,
+    CONF_PROGRAMS,
+    CONF_SEARCH,
+    CONF_SENSOR_TYPE,
+    DOMAIN,
+    SENSOR_PAGE_SIZE,
+    SENSOR_TYPE_LOAD_LIMIT,
+)
+from .api import EtaAPI, EtaAPIFactory, RequestPriority, SensorDict, SensorType
+from .coordinator import metadata_store
+from .schedule import discover_schedules
 from homeassistant.helpers.entity_registry import (
     async_entries_for_config_entry,
     async_get,
 )
 
+SENSOR_TYPE_ALL = "all"
+SENSOR_TYPE_FILTERS = [SENSOR_TYPE_ALL, *(sensor_type.value for sensor_type in SensorType)]
+
+
+def _sensor_filter(user_input, previous: tuple[str, str, int] | None = None) -> tuple[str, str, int]:
+    search = user_input.get(CONF_SEARCH, "")
+    sensor_type = user_input.get(CONF_SENSOR_TYPE, SENSOR_TYPE_ALL)
+    # the page of the previous matches means nothing for other ones
+    if previous is not None and (search, sensor_type) != previous[:2]:
+        return search, sensor_type, 1
+    return search, sensor_type, user_input.get(CONF_PAGE, 1)
+
+
+def _clamp_page(sensor_dict: SensorDict, sensor_filter: tuple[str, str, int]) -> tuple[str, str, int]:
+    """Move the filter to the last page of its matches if it is beyond."""
+    search, sensor_type, page = sensor_filter
+    _, total = sensor_dict.index().search(search, None if sensor_type == SENSOR_TYPE_ALL else SensorType(sensor_type))
+    pages = max((total + SENSOR_PAGE_SIZE - 1) // SENSOR_PAGE_SIZE, 1)
+    return search, sensor_type, min(page, pages)
+
+
+async def _load_sensor_types(hass, eta_api: EtaAPI, sensor_dict: SensorDict, sensor_filter) -> dict[str, str]:
+    """Load the varinfo the type filter needs for the sensors matching the search.
+
+    Returns form errors if too many sensors match to load them.
+    """
+    search, sensor_type, _ = sensor_filter
+    if sensor_type == SENSOR_TYPE_ALL:
+        return {}
+    pending = [sensor for sensor in sensor_dict.index().matching(search) if not sensor.initialized]
+    if len(pending) > SENSOR_TYPE_LOAD_LIMIT:
+        return {CONF_SEARCH: "too_many_to_filter"}
+    if pending:
+        await eta_api.initializeSensors(pending)
+        # kept for the setup of the entry and later flows
+        await metadata_store(hass, eta_api._host, eta_api._port).async_save(eta_api.export_cache())
+    return {}
+
+
+def _select_sensors_form(sensor_dict: SensorDict, selected: list[str], sensor_filter: tuple[str, str, int]):
+    """Build schema and description placeholders for one page of sensors.
+
+    Only the sensors matching the search are offered, plus the current
+    selection so it survives changing the filter.
+    """
+    search, sensor_type, page = sensor_filter
+    options, total = sensor_dict.index().search(
+        search,
+        None if sensor_type == SENSOR_TYPE_ALL else SensorType(sensor_type),
+        offset=(page - 1) * SENSOR_PAGE_SIZE,
+        limit=SENSOR_PAGE_SIZE,
+    )
+    shown = {option["value"] for option in options}
+    current = [
+        selector.SelectOptionDict(value=id, label=sensor_dict.byId(id).canonicalName())
+        for id in selected
+        if id in sensor_dict.sensors and id not in shown
+    ]
+    schema = vol.Schema(
+        {
+            vol.Optional(CONF_SEARCH, default=search): str,
+            vol.Optional(CONF_SENSOR_TYPE, default=sensor_type): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=SENSOR_TYPE_FILTERS,
+                    translation_key=CONF_SENSOR_TYPE,
+                )
+            ),
+            vol.Optional(CONF_PAGE, default=page): vol.All(vol.Coerce(int), vol.Range(min=1)),
+            vol.Optional(CHOOSEN_ENTITIES, default=selected): selector.SelectSelector(
+                selector.SelectSelectorConfig(
+                    options=current + options,
+                    mode=selector.SelectSelectorMode.DROPDOWN,
+                    multiple=True,
+                )
+            ),
+        }
+    )
+    pages = max((total + SENSOR_PAGE_SIZE - 1) // SENSOR_PAGE_SIZE, 1)
+    placeholders = {"total": str(total), "page": str(page), "pages": str(pages)}
+    return schema, placeholders
+
+
+def _poll_intervals_schema(sensor_dict: SensorDict, selected: list[str], intervals: dict[str, int]):
+    """One interval field per selected sensor, keyed by its label; 0 polls adaptively."""
+    labels = {}
+    for id in selected:
+        if id in sensor_dict.sensors:
+            labels[sensor_dict.byId(id).canonicalName()] = id
+    ceiling = ADAPTIVE_BASE_INTERVAL * 2 ** ADAPTIVE_MAX_LEVEL
+    schema = vol.Schema(
+        {
+            vol.Optional(label, default=intervals.get(id, 0)): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=ceiling)
+            )
+            for label, id in labels.items()
+        }
+    )
+    return schema, labels
+
+
+def _programs_schema(sensor_dict: SensorDict, programs: list[str]):
+    """Multi select of the weekly programs in the menu, empty if there are none."""
+    options = [
+        selector.SelectOptionDict(value=root, label=sensor_dict.byId(root).canonicalName())
+        for root in discover_schedules(sensor_dict)
+    ]
+    if not options:
+        return vol.Schema({})
+    return vol.Schema(
+        {
+            vol.Optional(CONF_PROGRAMS, default=[root for root in programs if root in sensor_dict.sensors]): (
+                selector.SelectSelector(
+                    selector.SelectSelectorConfig(
+                        options=options,
+                        mode=selector.SelectSelectorMode.DROPDOWN,
+                        multiple=True,
+                    )
+                )
+            ),
+        }
+    )
+
+
+def _deadbands_schema(sensor_dict: SensorDict, selected: list[str], deadbands: dict[str, float]):
+    """One deadband field per unit of the selected numeric sensors; 0 writes every change."""
+    units = sorted(
+        {sensor_dict.byId(id).unit for id in selected if id in sensor_dict.sensors} - {None}
+    )
+    return vol.Schema(
+        {
+            vol.Optional(unit, default=deadbands.get(unit, 0)): vol.All(
+                vol.Coerce(float), vol.Range(min=0)
+            )
+            for unit in units
+        }
+    )
+
 
 class EtaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for ETA Device."""
@@ -26,6 +176,8 @@ class EtaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self):
         """Initialize."""
         self._errors = {}
+        self._selected = []
+        self._filter = _sensor_filter({})
 
     async def async_step_user(self, user_input=None):
         if user_input is not None:
@@ -40,42 +192,48 @@ class EtaConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_select_sensors(self, user_input=None):
         # Use instance variables set in async_step_user
-        session = async_get_clientsession(self.hass)
-        eta_api = EtaAPIFactory.get_instance(session, self._host, self._port)
-        sensor_dict = await eta_api.get_sensors()
+        eta_api = EtaAPIFactory.acquire(self.flow_id, self._host, self._port)
+        sensor_dict = await eta_api.get_sensors(RequestPriority.INTERACTIVE)
 
         if user_input is not None:
             # Save selected sensors (as URIs or labels as needed)
-            selected_sensors = user_input[CHOOSEN_ENTITIES]
-            #selected_sensors = [sensor_dict.byName(label).id for label in selected_labels]
-            # Save config entry
-            return self.async_create_entry(
-                title=f"ETA Device ({self._host})",
-                data={
-                    CONF_HOST: self._host,
-                    CONF_PORT: self._port,
-                    CONF_NAME: self._name,
-                    CONF_MODEL: self._model,
-                    CHOOSEN_ENTITIES: selected_sensors,
-                },
-            )
+            selected_sensors = user_input.get(CHOOSEN_ENTITIES, [])
+            sensor_filter = _sensor_filter(user_input, self._filter)
+            if sensor_filter == self._filter:
+                # Save config entry
+                return self.async_create_entry(
+                    title=f"ETA Device ({self._host})",
+                    data={
+                        CONF_HOST: self._host,
+                        CONF_PORT: self._port,
+                        CONF_NAME: self._name,
+                        CONF_MODEL: self._model,
+                        CHOOSEN_ENTITIES: selected_sensors,
+                    },
+                )
+            # the filter has changed, show the matching sensors
+            self._selected = selected_sensors
+            self._filter = sensor_filter
 
+        errors = await _load_sensor_types(self.hass, eta_api, sensor_dict, self._filter)
+        if errors:
+            # show the matches of the search, unfiltered
+            self._filter = (self._filter[0], SENSOR_TYPE_ALL, self._filter[2])
+        self._filter = _clamp_page(sensor_dict, self._filter)
+        schema, placeholders = _select_sensors_form(sensor_dict, self._selected, self._filter)
         return self.async_show_form(
             step_id="select_sensors",
-            data_schema=vol.Schema(
-                {
-                    vol.Optional(CHOOSEN_ENTITIES): selector.SelectSelector(
-                        selector.SelectSelectorConfig(
-                            options=sensor_dict.nameDict(),
-                            mode=selector.SelectSelectorMode.DROPDOWN,
-                            multiple=True,
-                        )
-                    )
-                }
-            ),
-            errors=self._errors,
+            data_schema=schema,
+            description_placeholders=placeholders,
+            errors=errors,
         )
 
+    @callback
+    def async_remove(self):
+        """Release the API once the flow is finished or aborted."""
+        if hasattr(self, "_host"):
+            self.hass.async_create_task(EtaAPIFactory.release(self.flow_id, self._host, self._port))
+
     async def _show_host_port_config(self, user_input=None):
         # Always return a form if no user_input
         return self.async_show_form(
@@ -106,67 +264,134 @@ class EtaOptionsFlowHandler(config_entries.OptionsFlow):
         self._config_entry = config_entry  # ✅ store privately, not as .config_entry
         self._data = dict(config_entry.data)
         self._errors = {}
+        self._selected = None
+        self._filter = _sensor_filter({})
 
     async def async_step_init(self, user_input=None):
         """Manage the options."""
         # Save host/port and move to sensor selection
         self._host = self._config_entry.data.get(CONF_HOST, "")
         self._port = self._config_entry.data.get(CONF_PORT, 8080)
+        # pick up sensors added on the unit since the entry was set up
+        eta_api = EtaAPIFactory.acquire(self.flow_id, self._host, self._port)
+        coordinator = self.hass.data.get(DOMAIN, {}).get(self._config_entry.entry_id, {}).get("coordinator")
+        if coordinator is not None:
+            await coordinator.async_check_menu(RequestPriority.INTERACTIVE)
+        else:
+            await eta_api.get_sensors(RequestPriority.INTERACTIVE, refresh=True)
         return await self.async_step_select_sensors()
 
     async def async_step_select_sensors(self, user_input=None):
         """Select sensors to configure."""
-        session = async_get_clientsession(self.hass)
-        eta_api = EtaAPIFactory.get_instance(session, self._host, self._port)
-        sensor_dict = await eta_api.get_sensors()
+        eta_api = EtaAPIFactory.acquire(self.flow_id, self._host, self._port)
+        sensor_dict = await eta_api.get_sensors(RequestPriority.INTERACTIVE)
         # Get current selection from options or fallback to data
-        current = self._config_entry.options.get(
-            CHOOSEN_ENTITIES,
-            self._config_entry.data.get(CHOOSEN_ENTITIES, [])
+        if self._selected is None:
+            self._selected = self._config_entry.options.get(
+                CHOOSEN_ENTITIES,
+                self._config_entry.data.get(CHOOSEN_ENTITIES, [])
+            )
+
+        if user_input is not None and _sensor_filter(user_input, self._filter) != self._filter:
+            # the filter has changed, show the matching sensors
+            self._selected = user_input.get(CHOOSEN_ENTITIES, [])
+            self._filter = _sensor_filter(user_input, self._filter)
+        elif user_input is not None:
+            self._selected = user_input.get(CHOOSEN_ENTITIES, [])
+            return await self.async_step_programs()
+
+        errors = await _load_sensor_types(self.hass, eta_api, sensor_dict, self._filter)
+        if errors:
+            # show the matches of the search, unfiltered
+            self._filter = (self._filter[0], SENSOR_TYPE_ALL, self._filter[2])
+        self._filter = _clamp_page(sensor_dict, self._filter)
+        schema, placeholders = _select_sensors_form(sensor_dict, self._selected, self._filter)
+        return self.async_show_form(
+            step_id="select_sensors",
+            data_schema=schema,
+            description_placeholders=placeholders,
+            errors=errors,
+        )
+
+    async def async_step_programs(self, user_input=None):
+        """Select the weekly programs shown as calendar."""
+        eta_api = EtaAPIFactory.acquire(self.flow_id, self._host, self._port)
+        sensor_dict = await eta_api.get_sensors(RequestPriority.INTERACTIVE)
+        schema = _programs_schema(sensor_dict, self._data.get(CONF_PROGRAMS, []))
+
+        if user_input is not None or not schema.schema:
+            self._programs = (user_input or {}).get(CONF_PROGRAMS, [])
+            return await self.async_step_polling()
+
+        return self.async_show_form(
+            step_id="programs",
+            data_schema=schema,
+            errors=self._errors,
         )
-        
+
+    async def async_step_polling(self, user_input=None):
+        """Set a fixed poll interval in seconds per sensor."""
+        eta_api = EtaAPIFactory.acquire(self.flow_id, self._host, self._port)
+        sensor_dict = await eta_api.get_sensors(RequestPriority.INTERACTIVE)
+        intervals = self._data.get(CONF_POLL_INTERVALS, {})
+        schema, labels = _poll_intervals_schema(sensor_dict, self._selected, intervals)
+
         if user_input is not None:
-            selected = user_input[CHOOSEN_ENTITIES]
+            self._intervals = {labels[label]: seconds for label, seconds in user_input.items() if seconds}
+            return await self.async_step_deadbands()
+
+        return self.async_show_form(
+            step_id="polling",
+            data_schema=schema,
+            errors=self._errors,
+        )
+
+    async def async_step_deadbands(self, user_input=None):
+        """Set per unit how much a value has to change to be written."""
+        eta_api = EtaAPIFactory.acquire(self.flow_id, self._host, self._port)
+        sensor_dict = await eta_api.get_sensors(RequestPriority.INTERACTIVE)
+        schema = _deadbands_schema(sensor_dict, self._selected, self._data.get(CONF_DEADBANDS, {}))
+
+        if user_input is not None or not schema.schema:
+            selected = self._selected
             entity_registry = async_get(self.hass)
             entries = async_entries_for_config_entry(entity_registry, self._config_entry.entry_id)
+            # variable entities are eta_<host>_<port>_<uri>[_<platform>]
+            prefix = f"eta_{self._host}_{self._port}_"
             for e in entries:
-                rid = e.unique_id.split("_")[3]            
+                if not e.unique_id.startswith(prefix):
+                    continue
+                rid = e.unique_id[len(prefix):].split("_")[0]
                 if rid not in selected:
                     # Unregister from HA
                     entity_registry.async_remove(e.entity_id)
+            # calendars are eta_<entry_id>_schedule_<root>
+            prefix = f"eta_{self._config_entry.entry_id}_schedule_"
+            for e in entries:
+                if e.unique_id.startswith(prefix) and e.unique_id[len(prefix):] not in self._programs:
+                    entity_registry.async_remove(e.entity_id)
 
             data = {CHOOSEN_ENTITIES: selected,
+                    CONF_POLL_INTERVALS: self._intervals,
+                    CONF_DEADBANDS: {unit: deadband for unit, deadband in (user_input or {}).items() if deadband},
+                    CONF_PROGRAMS: self._programs,
                     CONF_NAME: self._data[CONF_NAME],
                     CONF_MODEL: self._data[CONF_MODEL],
                     CONF_HOST: self._data[CONF_HOST],
                     CONF_PORT: self._data[CONF_PORT]}
-            self.hass.config_entries.async_update_entry(self.config_entry, data=data)
-            self.hass.async_create_task(
-                self.hass.config_entries.async_reload(self.config_entry.entry_id)
-            )
-                                    
+            # the update listener adds the new sensors to the running entry
+            self.hass.config_entries.async_update_entry(self._config_entry, data=data)
             return self.async_create_entry(title="", data={})
 
         return self.async_show_form(
-            step_id="select_sensors",
-            data_schema=vol.Schema(
-                {
-                    vol.Optional(CHOOSEN_ENTITIES, default=current): selector.SelectSelector(
-                        selector.SelectSelectorConfig(
-                            options=sensor_dict.nameDict(),                            
-                            mode=selector.SelectSelectorMode.DROPDOWN,
-                            multiple=True,
-                        )
-                    )
-                }
-            ),
+            step_id="deadbands",
+            data_schema=schema,
             errors=self._errors,
         )
 
-        
-    async def _update_options(self):
-        """Update config entry options."""
-        return self.async_create_entry(
-            title=self._config_entry.data.get(CONF_HOST), data=self.options
-        )
+    @callback
+    def async_remove(self):
+        """Release the API once the flow is finished or aborted."""
+        if hasattr(self, "_host"):
+            self.hass.async_create_task(EtaAPIFactory.release(self.flow_id, self._host, self._port))
 
@@ -7,6 +7,23 @@ CONF_ENABLED = "enabled"
 
 FLOAT_DICT = "FLOAT_DICT"
 CHOOSEN_ENTITIES = "choosen_entities"
+# sensor picker filter
+CONF_SEARCH = "search"
+CONF_SENSOR_TYPE = "sensor_type"
+CONF_PAGE = "page"
+SENSOR_PAGE_SIZE = 200
+# filtering by type loads the varinfo of at most this many matching sensors
+SENSOR_TYPE_LOAD_LIMIT = 500
+# uri -> fixed poll interval in seconds, sensors without entry poll adaptively
+CONF_POLL_INTERVALS = "poll_intervals"
+# unit -> changes smaller than this are not written as new state
+CONF_DEADBANDS = "deadbands"
+# roots of the weekly programs shown as calendar
+CONF_PROGRAMS = "programs"
+
+# fired for every fault raised on or cleared by the unit
+EVENT_ERROR_RAISED = f"{DOMAIN}_error"
+EVENT_ERROR_CLEARED = f"{DOMAIN}_error_cleared"
 
 
 BINARY_SENSOR = "binary_sensor"
@@ -15,10 +32,44 @@ SENSOR = "sensor"
 PLATFORMS = [BINARY_SENSOR, SENSOR]
 # URLS
 USER_MENU_SUFFIX = "/user/menu"
+# the menu is parsed while it is received in chunks of this size
+MENU_CHUNK_SIZE = 16384
+
+# seconds a value read from /user/var is served from memory
+VALUE_CACHE_TTL = 5
+# seconds a write waits for newer values of the same variable, e.g. from a slider
+WRITE_COALESCE_DELAY = 0.5
+
+# Persistent cache of menu and varinfo
+STORAGE_VERSION = 1
 
 # Defaults
 DEFAULT_NAME = DOMAIN
 REQUEST_TIMEOUT = 60
+# the embedded web server of the ETA unit copes badly with parallel requests
+MAX_PARALLEL_REQUESTS = 2
+# idle connections outlive the poll tick so every poll reuses them
+KEEPALIVE_TIMEOUT = 75
+DNS_CACHE_TTL = 300
+# consecutive connection failures until requests are short-circuited, then
+# one probe request after a backoff doubling from MIN up to MAX seconds
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_BACKOFF_MIN = 30
+CIRCUIT_BACKOFF_MAX = 1800
+# latencies kept per endpoint for the percentiles in diagnostics
+LATENCY_SAMPLES = 256
+
+# Adaptive polling: sensors are read every BASE_INTERVAL * 2**level seconds
+ADAPTIVE_BASE_INTERVAL = 30
+ADAPTIVE_DEFAULT_LEVEL = 1
+ADAPTIVE_MAX_LEVEL = 6
+# relative changes below SMALL keep the interval, from LARGE on it drops to the base
+ADAPTIVE_SMALL_CHANGE = 0.01
+ADAPTIVE_LARGE_CHANGE = 0.1
+# seconds between reads of the fault list, independent of the sensor polls
+ERROR_POLL_INTERVAL = 60
+# seconds between reads of the selected weekly programs, they are rarely changed
+PROGRAM_POLL_INTERVAL = 900
 
 STARTUP_MESSAGE = f"""
 -------------------------------------------------------------------
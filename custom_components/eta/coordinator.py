@@ -0,0 +1,598 @@
+"""
+Data update coordinator for the ETA integration.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from datetime import datetime, timedelta
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers import issue_registry as ir
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant import config_entries
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from .api import (
+    EtaAPI,
+    EtaError,
+    EtaErrorFeed,
+    EtaSensorDesc,
+    MenuDiff,
+    RequestPriority,
+    SensorDict,
+    diff_menus,
+    unit_key,
+)
+from .const import (
+    ADAPTIVE_BASE_INTERVAL,
+    ADAPTIVE_DEFAULT_LEVEL,
+    ADAPTIVE_LARGE_CHANGE,
+    ADAPTIVE_MAX_LEVEL,
+    ADAPTIVE_SMALL_CHANGE,
+    CHOOSEN_ENTITIES,
+    CONF_DEADBANDS,
+    CONF_POLL_INTERVALS,
+    CONF_PROGRAMS,
+    DOMAIN,
+    ERROR_POLL_INTERVAL,
+    EVENT_ERROR_CLEARED,
+    EVENT_ERROR_RAISED,
+    PROGRAM_POLL_INTERVAL,
+    STORAGE_VERSION,
+)
+from .schedule import EtaSchedule, EtaWeeklySchedule, discover_schedules
+
+_LOGGER = logging.getLogger(__name__)
+SCAN_INTERVAL = timedelta(seconds=ADAPTIVE_BASE_INTERVAL)
+# firmware updates or added modules change the menu, look for it now and then
+MENU_CHECK_INTERVAL = timedelta(hours=6)
+HOUR = timedelta(hours=1)
+PROGRAM_TICKS = max(PROGRAM_POLL_INTERVAL // ADAPTIVE_BASE_INTERVAL, 1)
+# sent with the list of sensors added to an entry, formatted with the entry id
+SIGNAL_SENSORS_ADDED = f"{DOMAIN}_sensors_added_{{}}"
+# sent after every poll, changed values or not, formatted with the entry id
+SIGNAL_POLLED = f"{DOMAIN}_polled_{{}}"
+
+
+def fixed_intervals(config_entry: config_entries.ConfigEntry) -> dict[str, int]:
+    """Fixed poll intervals of ``config_entry`` in ticks, uri -> ticks."""
+    return {
+        uri: max(round(seconds / ADAPTIVE_BASE_INTERVAL), 1)
+        for uri, seconds in config_entry.data.get(CONF_POLL_INTERVALS, {}).items()
+        if seconds
+    }
+
+
+def entry_varsets(config_entry: config_entries.ConfigEntry) -> list[str]:
+    """Names of all variable sets the coordinator of ``config_entry`` may register."""
+    ticks = {2 ** level for level in range(ADAPTIVE_MAX_LEVEL + 1)}
+    ticks.update(fixed_intervals(config_entry).values())
+    names = [f"ha_{config_entry.entry_id}_{interval}" for interval in sorted(ticks)]
+    names.extend(program_varset(config_entry, root) for root in config_entry.data.get(CONF_PROGRAMS, []))
+    return names
+
+
+def program_varset(config_entry: config_entries.ConfigEntry, root: str) -> str:
+    """Name of the variable set the weekly program at ``root`` is read through."""
+    return f"ha_{config_entry.entry_id}_{root.strip('/').replace('/', '_')}"
+
+
+def metadata_store(hass: HomeAssistant, host, port) -> Store:
+    """Return the store caching menu and varinfo of one ETA unit."""
+    host, port = unit_key(host, port)
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{host}_{port}")
+
+
+class AdaptivePollSchedule:
+    """Poll interval of every sensor, in coordinator ticks.
+
+    Adaptive sensors poll every 2**level ticks. An unchanged value backs the
+    sensor off by one level up to ADAPTIVE_MAX_LEVEL, a small change keeps
+    the level, a larger one tightens it and a large one drops it to 0.
+    Sensors with a fixed interval are never adapted.
+    """
+
+    def __init__(self, fixed: dict[str, int] | None = None):
+        self._fixed = dict(fixed or {})
+        self._levels: dict[str, int] = {}
+        self._last: dict[str, float | str] = {}
+
+    def update_fixed(self, fixed: dict[str, int]):
+        """Replace the fixed intervals, sensors no longer fixed adapt from their last value."""
+        self._fixed = dict(fixed)
+
+    def ticks(self, uri: str) -> int:
+        if uri in self._fixed:
+            return self._fixed[uri]
+        return 2 ** self._levels.get(uri, ADAPTIVE_DEFAULT_LEVEL)
+
+    def due(self, sensors: list[EtaSensorDesc], tick: int) -> dict[int, list[EtaSensorDesc]]:
+        """Group the sensors due at ``tick`` by their interval."""
+        groups: dict[int, list[EtaSensorDesc]] = {}
+        for sensor in sensors:
+            ticks = self.ticks(sensor.id)
+            if tick % ticks == 0:
+                groups.setdefault(ticks, []).append(sensor)
+        return groups
+
+    def observe(self, uri: str, value: float | str):
+        last = self._last.get(uri)
+        self._last[uri] = value
+        if last is None or uri in self._fixed:
+            return
+        level = self._levels.get(uri, ADAPTIVE_DEFAULT_LEVEL)
+        if value == last:
+            level = min(level + 1, ADAPTIVE_MAX_LEVEL)
+        elif isinstance(value, float) and isinstance(last, float):
+            change = abs(value - last) / max(abs(last), 1.0)
+            if change >= ADAPTIVE_LARGE_CHANGE:
+                level = 0
+            elif change >= ADAPTIVE_SMALL_CHANGE:
+                level = max(level - 1, 0)
+        else:
+            # text states have no magnitude, every change counts
+            level = max(level - 1, 0)
+        self._levels[uri] = level
+
+    def intervals(self) -> dict[str, int]:
+        """Current interval in seconds of every observed or fixed sensor."""
+        uris = self._last.keys() | self._fixed.keys()
+        return {uri: self.ticks(uri) * ADAPTIVE_BASE_INTERVAL for uri in uris}
+
+
+class ChangeFilter:
+    """Pick the polled values that differ from the published ones.
+
+    Values are compared decoded, i.e. scaled and rounded to the decimal
+    places the unit reports. With a deadband for its unit, a numeric value
+    closer than the deadband to the published one is held back; it is
+    compared to the published value, so slow drifts still come through.
+    """
+
+    def __init__(self, deadbands: dict[str, float] | None = None):
+        self._deadbands = dict(deadbands or {})
+
+    def update_deadbands(self, deadbands: dict[str, float]):
+        self._deadbands = dict(deadbands)
+
+    def changes(
+        self, sensors: list[EtaSensorDesc], published: dict[str, float | str], values: dict[str, float | str]
+    ) -> dict[str, float | str]:
+        changes = {}
+        for sensor in sensors:
+            uri = sensor.id
+            if uri not in values:
+                continue
+            value = values[uri]
+            if uri in published:
+                last = published[uri]
+                if value == last:
+                    continue
+                deadband = self._deadbands.get(sensor.unit)
+                if (
+                    deadband
+                    and isinstance(value, (int, float))
+                    and isinstance(last, (int, float))
+                    and abs(value - last) < deadband
+                ):
+                    continue
+            changes[uri] = value
+        return changes
+
+
+class EtaDataUpdateCoordinator(DataUpdateCoordinator[dict[str, float | str | EtaWeeklySchedule]]):
+    """Poll the selected ETA variables of one config entry.
+
+    Every tick reads the sensors that are due, one batch per poll interval.
+    Only changed values are published, listeners are not called for a poll
+    without changes and ``changed`` tells entities whether their value did.
+    The selected weekly programs are read every PROGRAM_TICKS ticks and
+    published under their root uri.
+    """
+
+    def __init__(self, hass: HomeAssistant, config_entry: config_entries.ConfigEntry, eta_api: EtaAPI):
+        super().__init__(
+            hass,
+            _LOGGER,
+            config_entry=config_entry,
+            name=f"{DOMAIN} {eta_api._host}:{eta_api._port}",
+            update_interval=SCAN_INTERVAL,
+            always_update=False,
+        )
+        self._eta_api = eta_api
+        self._sensors: list[EtaSensorDesc] = []
+        # menu tree the sensors were resolved against; the API is shared by
+        # all entries of the unit, any of them may load a newer tree
+        self._menu: SensorDict | None = None
+        # root uri -> selected weekly program
+        self._programs: dict[str, EtaSchedule] = {}
+        # variable set on the controller holding all sensors of this entry
+        self._varset = f"ha_{config_entry.entry_id}"
+        self._store = metadata_store(hass, eta_api._host, eta_api._port)
+        self._schedule = AdaptivePollSchedule(fixed_intervals(self.config_entry))
+        self._filter = ChangeFilter(self.config_entry.data.get(CONF_DEADBANDS, {}))
+        # uris whose published value changed with the last update
+        self._changed: set[str] = set()
+        # uri -> time of the last read, and of the read before for sensors
+        # read again after at least one whole hour without a read
+        self._read_at: dict[str, datetime] = {}
+        self._gaps: dict[str, datetime] = {}
+        self._tick = 0
+        # intervals in ticks whose variable set exists on the unit
+        self._varset_ticks: set[int] = set()
+        self._poll_stats = {
+            "polls": 0,
+            "poll_failures": 0,
+            "poll_duration": 0.0,
+            "poll_duration_max": 0.0,
+            "polled_sensors": 0,
+            "changed_sensors": 0,
+        }
+
+    @staticmethod
+    def _select(sensors_dict, uris) -> tuple[list[EtaSensorDesc], list[str]]:
+        """Resolve ``uris`` in the menu, return the sensors and the missing uris."""
+        sensors = []
+        missing = []
+        for uri in uris:
+            if uri in sensors_dict.sensors:
+                sensors.append(sensors_dict.byId(uri))
+            else:
+                _LOGGER.warning("Selected ETA sensor %s is not part of the menu", uri)
+                missing.append(uri)
+        return sensors, missing
+
+    def _update_removed_issue(self, removed: list[str]):
+        """Raise a repair issue while selected sensors are missing from the menu."""
+        issue_id = f"removed_sensors_{self.config_entry.entry_id}"
+        if not removed:
+            ir.async_delete_issue(self.hass, DOMAIN, issue_id)
+            return
+        ir.async_create_issue(
+            self.hass,
+            DOMAIN,
+            issue_id,
+            is_fixable=False,
+            severity=ir.IssueSeverity.WARNING,
+            translation_key="removed_sensors",
+            translation_placeholders={"entry": self.config_entry.title, "sensors": ", ".join(removed)},
+        )
+
+    def _select_programs(self, sensors_dict, keep: bool = True) -> list[EtaSensorDesc]:
+        """Resolve the selected weekly programs, return their variables lacking metadata.
+
+        Programs already read are kept unless ``keep`` is false, e.g. after
+        the menu changed.
+        """
+        selected = self.config_entry.data.get(CONF_PROGRAMS, [])
+        found = discover_schedules(sensors_dict) if selected else {}
+        programs = {}
+        for root in selected:
+            if keep and root in self._programs:
+                programs[root] = self._programs[root]
+            elif root in found:
+                programs[root] = EtaSchedule(
+                    self._eta_api, sensors_dict.byId(root), found[root], program_varset(self.config_entry, root)
+                )
+            else:
+                _LOGGER.warning("Selected ETA program %s is not part of the menu", root)
+        self._programs = programs
+        return [
+            sensors_dict.byId(uri)
+            for program in programs.values()
+            for uri in program.variables
+            if uri in sensors_dict.sensors and not sensors_dict.byId(uri).initialized
+        ]
+
+    async def _refresh_programs(self, values: dict) -> None:
+        """Read the selected programs, the changed ones are published in ``values``."""
+        for root, program in self._programs.items():
+            try:
+                changed = await program.refresh()
+            except Exception as e:
+                _LOGGER.debug("Failed to read ETA program %s: %s", root, e)
+                continue
+            if changed or root not in values:
+                values[root] = program.schedule
+                self._changed.add(root)
+
+    async def _initialize_sensors(self, sensors: list[EtaSensorDesc]):
+        summary = await self._eta_api.initializeSensors(sensors)
+        if summary["failed"]:
+            _LOGGER.warning(
+                "Metadata of %d of %d ETA sensors could not be loaded",
+                summary["failed"], summary["requested"],
+            )
+        await self._store.async_save(self._eta_api.export_cache())
+
+    @property
+    def eta_api(self) -> EtaAPI:
+        return self._eta_api
+
+    @property
+    def sensors(self) -> list[EtaSensorDesc]:
+        return self._sensors
+
+    @property
+    def programs(self) -> dict[str, EtaSchedule]:
+        """Selected weekly programs, root uri -> program."""
+        return self._programs
+
+    @property
+    def varset(self) -> str:
+        """Name of the variable set of this entry, others of the entry use it as prefix."""
+        return self._varset
+
+    @property
+    def schedule(self) -> AdaptivePollSchedule:
+        return self._schedule
+
+    @property
+    def changed(self) -> set[str]:
+        return self._changed
+
+    @property
+    def gaps(self) -> dict[str, datetime]:
+        """Sensors read by the last poll after a whole hour or more without a read, uri -> previous read."""
+        return self._gaps
+
+    @property
+    def poll_metrics(self) -> dict[str, float]:
+        """Count, failures and duration in seconds of the poll cycles."""
+        return dict(self._poll_stats)
+
+    async def _async_setup(self):
+        """Resolve the selected sensors and load their metadata once.
+
+        Menu and varinfo come from the persistent cache if available and are
+        revalidated in the background afterwards.
+        """
+        from_cache = False
+        if not self._eta_api.initialized:
+            cached = await self._store.async_load()
+            if cached:
+                self._eta_api.import_cache(cached)
+                from_cache = True
+
+        try:
+            sensors_dict = await self._eta_api.get_sensors()
+        except Exception as e:
+            raise UpdateFailed(f"Failed to read ETA menu: {e}") from e
+
+        self._menu = sensors_dict
+        self._sensors, missing = self._select(sensors_dict, self.config_entry.data.get(CHOOSEN_ENTITIES, []))
+        self._update_removed_issue(missing)
+        # the varinfo of the programs is cached along with the one of the sensors
+        pending = self._select_programs(sensors_dict)
+        if not from_cache or pending or not all(sensor.initialized for sensor in self._sensors):
+            await self._initialize_sensors(self._sensors + pending)
+
+        if from_cache:
+            self.config_entry.async_create_background_task(
+                self.hass, self.async_check_menu(), f"{self.name} check menu"
+            )
+        self.config_entry.async_on_unload(
+            async_track_time_interval(self.hass, self._async_menu_timer, MENU_CHECK_INTERVAL)
+        )
+
+    async def async_update_selection(self) -> list[EtaSensorDesc]:
+        """Align the polled sensors with the entry without a reload.
+
+        Sensors kept keep their metadata, values and poll interval. Added
+        sensors are initialized and read once, then announced through
+        SIGNAL_SENSORS_ADDED so the platform can create their entities.
+        """
+        selected = set(self.config_entry.data.get(CHOOSEN_ENTITIES, []))
+        self._schedule.update_fixed(fixed_intervals(self.config_entry))
+        self._filter.update_deadbands(self.config_entry.data.get(CONF_DEADBANDS, {}))
+        await self._async_follow_menu()
+        current = {sensor.id for sensor in self._sensors}
+        sensors_dict = await self._eta_api.get_sensors()
+        self._sensors, missing = self._select(sensors_dict, self.config_entry.data.get(CHOOSEN_ENTITIES, []))
+        self._update_removed_issue(missing)
+        added = [sensor for sensor in self._sensors if sensor.id not in current]
+
+        # a changed program selection reloads the entry, the programs are kept
+        values = {
+            uri: value for uri, value in (self.data or {}).items() if uri in selected or uri in self._programs
+        }
+        if added:
+            if not all(sensor.initialized for sensor in added):
+                await self._initialize_sensors(added)
+            try:
+                values.update(await self._eta_api.get_all_data(added))
+            except Exception as e:
+                _LOGGER.warning("Failed to read added ETA sensors: %s", e)
+        self._changed = {sensor.id for sensor in added}
+        self.async_set_updated_data(values)
+        if added:
+            async_dispatcher_send(self.hass, SIGNAL_SENSORS_ADDED.format(self.config_entry.entry_id), added)
+        return added
+
+    async def async_write(self, sensor: EtaSensorDesc, value: float | str):
+        """Write ``value`` to the unit and publish the value read back."""
+        value = await self._eta_api.write_value(sensor, value)
+        self._changed = {sensor.id}
+        self.async_set_updated_data({**(self.data or {}), sensor.id: value})
+
+    async def async_delete_varsets(self):
+        """Remove the variable sets of this entry from the unit."""
+        try:
+            await self._eta_api.delete_varsets(f"{self._varset}_")
+        except Exception as e:
+            _LOGGER.debug("Failed to delete ETA variable sets of %s: %s", self.name, e)
+        self._varset_ticks = set()
+
+    async def _delete_unused_varsets(self):
+        in_use = {self._schedule.ticks(sensor.id) for sensor in self._sensors}
+        for ticks in self._varset_ticks - in_use:
+            try:
+                await self._eta_api.delete_varset(f"{self._varset}_{ticks}")
+            except Exception as e:
+                _LOGGER.debug("Failed to delete ETA variable set %s_%d: %s", self._varset, ticks, e)
+        self._varset_ticks &= in_use
+
+    async def _async_menu_timer(self, _now):
+        await self.async_check_menu()
+
+    async def async_check_menu(self, priority: RequestPriority = RequestPriority.BACKGROUND) -> MenuDiff | None:
+        """Re-read the menu and follow changes made on the unit.
+
+        Selected sensors gone from the menu are no longer polled and reported
+        as repair issue, metadata is only loaded for sensors that lack it.
+        """
+        try:
+            await self._eta_api.revalidate(priority)
+        except Exception as e:
+            _LOGGER.debug("Failed to check ETA menu: %s", e)
+            return None
+        return await self._async_follow_menu()
+
+    async def _async_follow_menu(self) -> MenuDiff | None:
+        """Publish the removals if the menu tree is not the one the sensors were resolved against."""
+        diff, gone = await self._resolve_menu()
+        if gone:
+            self._changed = gone
+            self.async_set_updated_data({uri: value for uri, value in (self.data or {}).items() if uri not in gone})
+        return diff
+
+    async def _resolve_menu(self) -> tuple[MenuDiff | None, set[str]]:
+        """Resolve sensors and programs in the current menu tree, return its diff and the uris gone.
+
+        Whichever entry revalidated the shared API, every coordinator diffs
+        the tree against the one it resolved its own sensors in.
+        """
+        sensors_dict = await self._eta_api.get_sensors()
+        if self._menu is None or sensors_dict is self._menu:
+            self._menu = sensors_dict
+            return None, set()
+        diff = diff_menus(self._menu, sensors_dict)
+        self._menu = sensors_dict
+        if any(diff):
+            _LOGGER.info(
+                "ETA menu of %s has changed: %d added, %d removed, %d renamed",
+                self.name, len(diff.added), len(diff.removed), len(diff.renamed),
+            )
+
+        removed = [sensor for sensor in self._sensors if sensor.id not in sensors_dict.sensors]
+        self._sensors = [sensors_dict.byId(sensor.id) for sensor in self._sensors if sensor.id in sensors_dict.sensors]
+        # every selected uri missing from the menu, including ones dropped by earlier checks
+        self._update_removed_issue(
+            [uri for uri in self.config_entry.data.get(CHOOSEN_ENTITIES, []) if uri not in sensors_dict.sensors]
+        )
+        # programs are resolved again, their variables may have moved
+        programs = set(self._programs)
+        pending = self._select_programs(sensors_dict, keep=False)
+        await self._initialize_sensors([sensor for sensor in self._sensors if not sensor.initialized] + pending)
+        gone = {sensor.id for sensor in removed} | (programs - self._programs.keys())
+        return (diff if any(diff) else None), gone
+
+    async def _async_update_data(self) -> dict[str, float | str | EtaWeeklySchedule]:
+        """Fetch the values of all sensors due in this tick."""
+        start = time.monotonic()
+        self._changed = set()
+        self._gaps = {}
+        stats = self._poll_stats
+        stats["polls"] += 1
+        try:
+            values = await self._poll()
+        except Exception:
+            stats["poll_failures"] += 1
+            raise
+        finally:
+            stats["poll_duration"] = time.monotonic() - start
+            stats["poll_duration_max"] = max(stats["poll_duration_max"], stats["poll_duration"])
+            # listeners only hear of changed values, statistics change with every poll
+            async_dispatcher_send(self.hass, SIGNAL_POLLED.format(self.config_entry.entry_id))
+        return values
+
+    async def _poll(self) -> dict[str, float | str | EtaWeeklySchedule]:
+        # another entry of the unit may have loaded a newer menu meanwhile
+        _, gone = await self._resolve_menu()
+        self._changed.update(gone)
+        tick = self._tick
+        groups = self._schedule.due(self._sensors, tick)
+        self._tick += 1
+        values = {uri: value for uri, value in (self.data or {}).items() if uri not in gone}
+        read = 0
+        for ticks, sensors in groups.items():
+            try:
+                # one variable set per interval, so each tick is one request per due group
+                batch = await self._eta_api.get_all_data(sensors, f"{self._varset}_{ticks}")
+            except Exception as e:
+                raise UpdateFailed(f"Failed to read ETA sensors: {e}") from e
+            now = dt_util.utcnow()
+            for uri, value in batch.items():
+                self._schedule.observe(uri, value)
+                previous = self._read_at.get(uri)
+                if previous is not None and now.replace(minute=0, second=0, microsecond=0) - previous >= HOUR:
+                    self._gaps[uri] = previous
+                self._read_at[uri] = now
+            changes = self._filter.changes(sensors, values, batch)
+            values.update(changes)
+            self._changed.update(changes)
+            read += len(batch)
+        if groups and not read:
+            raise UpdateFailed("No ETA sensor could be read")
+        if tick % PROGRAM_TICKS == 0:
+            await self._refresh_programs(values)
+        self._varset_ticks.update(groups)
+        # adapted intervals may leave a set without sensors
+        await self._delete_unused_varsets()
+        self._poll_stats["polled_sensors"] = read
+        self._poll_stats["changed_sensors"] = len(self._changed)
+        return values
+
+
+class EtaErrorCoordinator(DataUpdateCoordinator[dict[str, EtaError]]):
+    """Poll the active faults of the unit on their own schedule.
+
+    Data maps the key of every active fault to the fault. Listeners are only
+    called when the set of faults changes; raised and cleared faults are
+    fired as events, except for the ones found by the first read.
+    """
+
+    def __init__(self, hass: HomeAssistant, config_entry: config_entries.ConfigEntry, eta_api: EtaAPI):
+        super().__init__(
+            hass,
+            _LOGGER,
+            config_entry=config_entry,
+            name=f"{DOMAIN} {eta_api._host}:{eta_api._port} errors",
+            update_interval=timedelta(seconds=ERROR_POLL_INTERVAL),
+            always_update=False,
+        )
+        self._eta_api = eta_api
+        # kept per entry, entries sharing the unit each see every change
+        self._feed = EtaErrorFeed()
+
+    @property
+    def fubs(self) -> dict[str, str]:
+        """Function blocks reporting faults, uri -> name."""
+        return self._feed.fubs
+
+    def _fire(self, event_type: str, error: EtaError):
+        self.hass.bus.async_fire(
+            event_type,
+            {"entry_id": self.config_entry.entry_id, "key": error.key, **error._asdict()},
+        )
+
+    async def _async_update_data(self) -> dict[str, EtaError]:
+        try:
+            diff = await self._eta_api.poll_errors(self._feed)
+        except Exception as e:
+            raise UpdateFailed(f"Failed to read ETA errors: {e}") from e
+        if diff is None:
+            return self.data if self.data is not None else dict(self._feed.errors)
+        if self.data is not None:
+            for error in diff.raised:
+                _LOGGER.warning("ETA %s reports %s: %s", error.fub_name, error.priority, error.msg)
+                self._fire(EVENT_ERROR_RAISED, error)
+            for error in diff.cleared:
+                _LOGGER.info("ETA %s no longer reports %s", error.fub_name, error.msg)
+                self._fire(EVENT_ERROR_CLEARED, error)
+        return dict(self._feed.errors)
@@ -0,0 +1,58 @@
+"""
+Diagnostics of the ETA integration: request, cache and poll statistics.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant import config_entries
+from homeassistant.components.diagnostics import REDACTED, async_redact_data
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {CONF_HOST}
+# paths listed with their latency
+SLOWEST_COUNT = 20
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: config_entries.ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    eta_api = coordinator.eta_api
+    stats = eta_api.request_stats
+    sensors = coordinator.sensors
+    error_coordinator = hass.data[DOMAIN][entry.entry_id].get("error_coordinator")
+    return {
+        "entry": {
+            # the default title names the host
+            "title": REDACTED,
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": async_redact_data(dict(entry.options), TO_REDACT),
+        },
+        "controller": {
+            "available": eta_api.available,
+            "menu_size": len((await eta_api.get_sensors()).sensors) if eta_api.initialized else None,
+        },
+        "sensors": {
+            "selected": len(sensors),
+            "initialized": sum(sensor.initialized for sensor in sensors),
+            "with_value": len(coordinator.data or {}),
+        },
+        "requests": eta_api.request_metrics,
+        "endpoints": stats.endpoints,
+        "slowest_requests": stats.slowest(SLOWEST_COUNT),
+        "polling": {
+            **coordinator.poll_metrics,
+            "last_update_success": coordinator.last_update_success,
+            "intervals": coordinator.schedule.intervals(),
+        },
+        "errors": {
+            "active": len(error_coordinator.data or {}),
+            "last_update_success": error_coordinator.last_update_success,
+        } if error_coordinator else None,
+    }
@@ -0,0 +1,67 @@
+"""
+Base entity of the ETA integration.
+"""
+
+from __future__ import annotations
+
+from homeassistant.const import CONF_HOST, CONF_MODEL, CONF_NAME, CONF_PORT
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
+
+from .api import EtaSensorDesc
+from .const import DOMAIN
+from .coordinator import EtaDataUpdateCoordinator
+
+
+def eta_device_info(config) -> dict:
+    """Device info of the ETA unit of a config entry."""
+    return {
+        "identifiers": {(DOMAIN, f"{config[CONF_HOST]}:{config[CONF_PORT]}")},
+        "name": f"{config[CONF_NAME]}",
+        "manufacturer": "ETA Heiztechnik GmbH",
+        "model": f"{config[CONF_MODEL]}",
+        "configuration_url": f"http://{config[CONF_HOST]}:{config[CONF_PORT]}/user/menu/",
+    }
+
+
+class EtaEntity(CoordinatorEntity[EtaDataUpdateCoordinator]):
+    """Entity of one ETA variable, its state is only written when the value changes."""
+
+    def __init__(self, sensor: EtaSensorDesc, coordinator: EtaDataUpdateCoordinator, device_info):
+        super().__init__(coordinator)
+        self._sensor = sensor
+        self._eta_api = coordinator.eta_api
+        self._device_info = device_info
+        self._value = None
+        self._update_value()
+        # availability at the last state write
+        self._was_available = self.available
+
+    @property
+    def device_info(self):
+        return self._device_info
+
+    @property
+    def available(self) -> bool:
+        # sensors removed from the menu of the unit have no value anymore
+        return super().available and self._sensor.id in (self.coordinator.data or {})
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            "sensor_id": self._sensor.id
+        }
+
+    def _update_value(self):
+        self._value = (self.coordinator.data or {}).get(self._sensor.id)
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Take over the value fetched by the coordinator if it has changed."""
+        available = self.available
+        if self._sensor.id not in self.coordinator.changed and available == self._was_available:
+            # nothing to write, spares the state machine and the recorder
+            return
+        self._was_available = available
+        self._update_value()
+        super()._handle_coordinator_update()
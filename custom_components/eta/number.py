@@ -0,0 +1,65 @@
+"""
+Platform for writable numeric ETA variables, e.g. heating circuit setpoints.
+"""
+
+from __future__ import annotations
+
+from homeassistant import config_entries
+from homeassistant.components.number import NumberEntity
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from .api import CONNECTION_ERRORS, EtaSensorDesc, EtaUnavailableError, EtaWriteError, SensorType
+from .const import DOMAIN
+from .coordinator import SIGNAL_SENSORS_ADDED, EtaDataUpdateCoordinator
+from .entity import EtaEntity, eta_device_info
+
+
+def _writable_numbers(sensors: list[EtaSensorDesc]) -> list[EtaSensorDesc]:
+    return [s for s in sensors if s.writable and s.sensor_type is SensorType.NUMERIC and s.unit]
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: config_entries.ConfigEntry,
+    async_add_entities,
+):
+    """Set up a number entity for every selected writable numeric variable."""
+    device_info = eta_device_info(config_entry.data)
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]["coordinator"]
+
+    @callback
+    def async_add_numbers(sensor_descs: list[EtaSensorDesc]):
+        async_add_entities(EtaNumber(s, coordinator, device_info) for s in _writable_numbers(sensor_descs))
+
+    async_add_numbers(coordinator.sensors)
+    config_entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_SENSORS_ADDED.format(config_entry.entry_id), async_add_numbers)
+    )
+
+
+class EtaNumber(EtaEntity, NumberEntity):
+    """Writable numeric ETA variable."""
+
+    def __init__(self, sensor: EtaSensorDesc, coordinator: EtaDataUpdateCoordinator, device_info):
+        super().__init__(sensor, coordinator, device_info)
+        write = sensor.write_info
+        self._attr_name = f"{device_info['name']} {sensor.name}"
+        self._attr_unique_id = f"eta_{self._eta_api._host}_{self._eta_api._port}_{sensor.id}_number"
+        self._attr_native_unit_of_measurement = sensor.unit
+        self._attr_native_step = 10 ** -write.dec_places
+        if write.minimum is not None:
+            self._attr_native_min_value = write.minimum
+        if write.maximum is not None:
+            self._attr_native_max_value = write.maximum
+
+    @property
+    def native_value(self):
+        return self._value
+
+    async def async_set_native_value(self, value: float) -> None:
+        try:
+            await self.coordinator.async_write(self._sensor, value)
+        except (ValueError, EtaWriteError, EtaUnavailableError, *CONNECTION_ERRORS) as e:
+            raise HomeAssistantError(f"Failed to set {self.name} to {value}: {e}") from e
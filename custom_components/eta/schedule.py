@@ -0,0 +1,226 @@
+"""
+Weekly programs of the ETA unit, decoded from its TIMESLOT variables.
+
+A program is a menu node (e.g. "Heizzeiten" of a heating circuit) with one
+child per weekday, each holding its time windows ("Zeitfenster 1".."3") and
+the value applied outside of them.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from datetime import datetime, time, timedelta
+from typing import Iterator, NamedTuple
+
+from .api import EtaAPI, EtaSensorDesc, EtaValue, SensorDict, SensorType
+
+_LOGGER = logging.getLogger(__name__)
+
+WEEKDAYS = {
+    name: day
+    for day, names in enumerate(
+        (
+            ("montag", "monday"),
+            ("dienstag", "tuesday"),
+            ("mittwoch", "wednesday"),
+            ("donnerstag", "thursday"),
+            ("freitag", "friday"),
+            ("samstag", "saturday"),
+            ("sonntag", "sunday"),
+        )
+    )
+    for name in names
+}
+DAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+# begin and end of a window are sent in steps of this many minutes
+SLOT_MINUTES = 15
+# "06:00 - 22:00 20 °C", used if the raw value does not hold begin and end
+_WINDOW_RE = re.compile(r"(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})(?:\s+(-?\d+(?:[.,]\d+)?))?")
+
+
+class EtaTimeSlot(NamedTuple):
+    """One time window; start and end in minutes after midnight."""
+
+    start: int
+    end: int
+    value: float | None = None
+
+
+def decode_timeslot(value: EtaValue) -> EtaTimeSlot | None:
+    """Decode a TIMESLOT value, None for an unused (empty) window."""
+    parts = value.raw.split()
+    if len(parts) in (2, 3) and all(part.lstrip("-").isdigit() for part in parts):
+        start, end = int(parts[0]) * SLOT_MINUTES, int(parts[1]) * SLOT_MINUTES
+        slot_value = None
+        if len(parts) == 3:
+            slot_value = round(int(parts[2]) / int(value.scale_factor or 1), int(value.dec_places or 0))
+    else:
+        match = _WINDOW_RE.search(value.str_value)
+        if match is None:
+            raise ValueError(f"Not a time window: {value.str_value}")
+        start = int(match[1]) * 60 + int(match[2])
+        end = int(match[3]) * 60 + int(match[4])
+        slot_value = float(match[5].replace(",", ".")) if match[5] else None
+    if end <= start:
+        return None
+    return EtaTimeSlot(start, end, slot_value)
+
+
+def _clock(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class EtaWeeklySchedule:
+    """Time windows per weekday, Monday is 0, sorted by start."""
+
+    __slots__ = ("_days", "_outside")
+
+    def __init__(self, days: list[list[EtaTimeSlot]], outside: list[float | None] | None = None):
+        self._days = tuple(tuple(sorted(day)) for day in days)
+        # value applied outside of the windows, per weekday
+        self._outside = tuple(outside or [None] * 7)
+
+    def __eq__(self, other):
+        return isinstance(other, EtaWeeklySchedule) and (self._days, self._outside) == (other._days, other._outside)
+
+    def day(self, weekday: int) -> tuple[EtaTimeSlot, ...]:
+        return self._days[weekday]
+
+    def active(self, moment: datetime) -> EtaTimeSlot | None:
+        """The window ``moment`` falls into."""
+        minute = moment.hour * 60 + moment.minute
+        for slot in self._days[moment.weekday()]:
+            if slot.start <= minute < slot.end:
+                return slot
+        return None
+
+    def occurrences(self, start: datetime, end: datetime) -> Iterator[tuple[datetime, datetime, EtaTimeSlot]]:
+        """Windows overlapping ``start`` to ``end``, in the time zone of ``start``."""
+        day = datetime.combine(start.date(), time(), tzinfo=start.tzinfo)
+        while day < end:
+            for slot in self._days[day.weekday()]:
+                slot_start = day + timedelta(minutes=slot.start)
+                slot_end = day + timedelta(minutes=slot.end)
+                if slot_end > start and slot_start < end:
+                    yield slot_start, slot_end, slot
+            day += timedelta(days=1)
+
+    def as_dict(self) -> dict[str, dict]:
+        return {
+            DAY_NAMES[weekday]: {
+                "windows": [
+                    {"start": _clock(slot.start), "end": _clock(slot.end), "value": slot.value} for slot in slots
+                ],
+                "outside": self._outside[weekday],
+            }
+            for weekday, slots in enumerate(self._days)
+        }
+
+
+def discover_schedules(sensors: SensorDict) -> dict[str, dict[str, int]]:
+    """Weekly programs of the menu: uri of the program -> {uri below a weekday: weekday}.
+
+    Only the cached menu tree is used, which of the variables are time
+    windows is known once their varinfo is loaded.
+    """
+    schedules: dict[str, dict[str, int]] = {}
+    days: dict[str, int] = {}
+    for sensor in sensors.sensors.values():
+        weekday = WEEKDAYS.get(sensor.name.lower())
+        if weekday is not None and sensor.parent is not None:
+            days[sensor.id] = weekday
+            schedules.setdefault(sensor.parent.id, {})
+    for sensor in sensors.sensors.values():
+        if sensor.parent is not None and sensor.parent.id in days:
+            schedules[sensor.parent.parent.id][sensor.id] = days[sensor.parent.id]
+    return {uri: variables for uri, variables in schedules.items() if variables}
+
+
+class EtaSchedule:
+    """One weekly program, read in one batch through a variable set.
+
+    The controller offers no change notification, so every refresh reads
+    all variables of the program with a single request. Only windows whose
+    raw value changed are decoded again and the model is only rebuilt if
+    one did.
+    """
+
+    def __init__(self, eta_api: EtaAPI, root: EtaSensorDesc, variables: dict[str, int], varset: str):
+        self._eta_api = eta_api
+        self._root = root
+        self._variables = variables
+        self._varset = varset
+        self._sensors: list[EtaSensorDesc] | None = None
+        # uri -> (raw value, decoded window or outside value)
+        self._decoded: dict[str, tuple[str, EtaTimeSlot | float | None]] = {}
+        self._schedule: EtaWeeklySchedule | None = None
+
+    @property
+    def root(self) -> EtaSensorDesc:
+        return self._root
+
+    @property
+    def variables(self) -> dict[str, int]:
+        """Variables of the program, uri -> weekday."""
+        return self._variables
+
+    @property
+    def schedule(self) -> EtaWeeklySchedule | None:
+        return self._schedule
+
+    @property
+    def unit(self) -> str | None:
+        for sensor in self._sensors or []:
+            if sensor.sensor_type is SensorType.TIMESLOT and sensor.unit:
+                return sensor.unit
+        return None
+
+    async def _resolve(self) -> list[EtaSensorDesc]:
+        sensors_dict = await self._eta_api.get_sensors()
+        sensors = [sensors_dict.byId(uri) for uri in self._variables if uri in sensors_dict.sensors]
+        await self._eta_api.initializeSensors(sensors)
+        # the windows and the numeric value outside of them, nothing else of a day
+        return [
+            sensor
+            for sensor in sensors
+            if sensor.sensor_type is SensorType.TIMESLOT or (sensor.initialized and sensor.unit)
+        ]
+
+    async def refresh(self) -> bool:
+        """Re-read the program, return whether it has changed."""
+        if self._sensors is None:
+            self._sensors = await self._resolve()
+        values = await self._eta_api.get_all_values(self._sensors, self._varset)
+        changed = False
+        for sensor in self._sensors:
+            value = values.get(sensor.id)
+            if value is None or self._decoded.get(sensor.id, (None,))[0] == value.raw:
+                continue
+            try:
+                if sensor.sensor_type is SensorType.TIMESLOT:
+                    decoded = decode_timeslot(value)
+                else:
+                    decoded = sensor.getValue(value)
+            except Exception as e:
+                _LOGGER.warning("Failed to decode ETA time window %s: %s", sensor.id, e)
+                continue
+            self._decoded[sensor.id] = (value.raw, decoded)
+            changed = True
+        if changed or self._schedule is None:
+            self._schedule = self._build()
+        return changed
+
+    def _build(self) -> EtaWeeklySchedule:
+        days: list[list[EtaTimeSlot]] = [[] for _ in range(7)]
+        outside: list[float | None] = [None] * 7
+        for sensor in self._sensors:
+            if sensor.id not in self._decoded:
+                continue
+            decoded = self._decoded[sensor.id][1]
+            weekday = self._variables[sensor.id]
+            if isinstance(decoded, EtaTimeSlot):
+                days[weekday].append(decoded)
+            elif sensor.sensor_type is not SensorType.TIMESLOT:
+                outside[weekday] = decoded
+        return EtaWeeklySchedule(days, outside)
@@ -0,0 +1,59 @@
+"""
+Platform for writable ETA variables with a fixed set of states, e.g. operating modes.
+"""
+
+from __future__ import annotations
+
+from homeassistant import config_entries
+from homeassistant.components.select import SelectEntity
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from .api import CONNECTION_ERRORS, EtaSensorDesc, EtaUnavailableError, EtaWriteError, SensorType
+from .const import DOMAIN
+from .coordinator import SIGNAL_SENSORS_ADDED, EtaDataUpdateCoordinator
+from .entity import EtaEntity, eta_device_info
+
+
+def _writable_selects(sensors: list[EtaSensorDesc]) -> list[EtaSensorDesc]:
+    return [s for s in sensors if s.writable and s.sensor_type is SensorType.TEXT and s.states]
+
+
+async def async_setup_entry(
+    hass: HomeAssistant,
+    config_entry: config_entries.ConfigEntry,
+    async_add_entities,
+):
+    """Set up a select entity for every selected writable text variable."""
+    device_info = eta_device_info(config_entry.data)
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]["coordinator"]
+
+    @callback
+    def async_add_selects(sensor_descs: list[EtaSensorDesc]):
+        async_add_entities(EtaSelect(s, coordinator, device_info) for s in _writable_selects(sensor_descs))
+
+    async_add_selects(coordinator.sensors)
+    config_entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_SENSORS_ADDED.format(config_entry.entry_id), async_add_selects)
+    )
+
+
+class EtaSelect(EtaEntity, SelectEntity):
+    """Writable ETA variable with a fixed set of states."""
+
+    def __init__(self, sensor: EtaSensorDesc, coordinator: EtaDataUpdateCoordinator, device_info):
+        super().__init__(sensor, coordinator, device_info)
+        self._attr_name = f"{device_info['name']} {sensor.name}"
+        self._attr_unique_id = f"eta_{self._eta_api._host}_{self._eta_api._port}_{sensor.id}_select"
+        self._attr_options = list(sensor.states.values())
+
+    @property
+    def current_option(self) -> str | None:
+        return self._value if self._value in self._attr_options else None
+
+    async def async_select_option(self, option: str) -> None:
+        try:
+            await self.coordinator.async_write(self._sensor, option)
+        except (ValueError, EtaWriteError, EtaUnavailableError, *CONNECTION_ERRORS) as e:
+            raise HomeAssistantError(f"Failed to set {self.name} to {option}: {e}") from e
@@ -5,32 +5,116 @@ Platform for ETA sensor integration in Home Assistant
 from __future__ import annotations
 
 import logging
-from datetime import timedelta
+from collections.abc import Callable
+from dataclasses import dataclass
 
-from voluptuous import Switch
-
-from .api import EtaAPI, EtaAPIFactory, SensorDict
+from .coordinator import SIGNAL_POLLED, SIGNAL_SENSORS_ADDED, EtaDataUpdateCoordinator
+from .entity import EtaEntity, eta_device_info
+from .statistics import async_backfill_statistics
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorEntity,
+    SensorEntityDescription,
     SensorStateClass,
     ENTITY_ID_FORMAT,
 )
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant import config_entries
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import generate_entity_id
+from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from homeassistant.const import CONF_HOST, CONF_PORT, CONF_NAME, CONF_MODEL
-from .const import DOMAIN, CHOOSEN_ENTITIES, FLOAT_DICT
+from homeassistant.const import (
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfTime,
+)
+from .const import DOMAIN
 from .api import SensorType, EtaSensorDesc
 
-from homeassistant.helpers.device_registry import DeviceEntryType
-
 _LOGGER = logging.getLogger(__name__)
-SCAN_INTERVAL = timedelta(minutes=1)
+
+
+def _ratio(part, total) -> float:
+    return round(100 * part / total, 1) if total else 0.0
+
+
+def _latency(endpoint: str, key: str):
+    def value(coordinator: EtaDataUpdateCoordinator):
+        stats = coordinator.eta_api.request_stats.endpoints.get(endpoint)
+        return round(stats[key] * 1000, 1) if stats else None
+    return value
+
+
+@dataclass(frozen=True, kw_only=True)
+class EtaDiagnosticSensorDescription(SensorEntityDescription):
+    value_fn: Callable[[EtaDataUpdateCoordinator], float | None]
+    entity_category: EntityCategory | None = EntityCategory.DIAGNOSTIC
+    entity_registry_enabled_default: bool = False
+
+
+DIAGNOSTIC_SENSORS = (
+    EtaDiagnosticSensorDescription(
+        key="requests",
+        name="Requests",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda c: c.eta_api.request_metrics["requests"],
+    ),
+    EtaDiagnosticSensorDescription(
+        key="error_rate",
+        name="Request error rate",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda c: round(100 * c.eta_api.request_metrics["error_rate"], 1),
+    ),
+    EtaDiagnosticSensorDescription(
+        key="queue_depth",
+        name="Request queue depth",
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda c: c.eta_api.request_metrics["queue_depth"],
+    ),
+    EtaDiagnosticSensorDescription(
+        key="value_cache_hit_rate",
+        name="Value cache hit rate",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda c: _ratio(
+            c.eta_api.request_metrics["value_cache_hits"],
+            c.eta_api.request_metrics["value_cache_hits"] + c.eta_api.request_metrics["value_cache_misses"],
+        ),
+    ),
+    EtaDiagnosticSensorDescription(
+        key="coalesced_requests",
+        name="Coalesced requests",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        value_fn=lambda c: c.eta_api.request_metrics["coalesced_requests"],
+    ),
+    EtaDiagnosticSensorDescription(
+        key="poll_duration",
+        name="Poll duration",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        value_fn=lambda c: round(c.poll_metrics["poll_duration"], 3),
+    ),
+    *(
+        EtaDiagnosticSensorDescription(
+            key=f"{key}_latency_{quantile}",
+            name=f"{label} latency {quantile}",
+            device_class=SensorDeviceClass.DURATION,
+            native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+            state_class=SensorStateClass.MEASUREMENT,
+            value_fn=_latency(endpoint, f"latency_{quantile}"),
+        )
+        for key, label, endpoint in (
+            ("varset", "Variable set", "GET /user/vars"),
+            ("var", "Variable", "GET /user/var"),
+        )
+        for quantile in ("p50", "p95")
+    ),
+)
 
 
 async def async_setup_entry(
@@ -40,85 +124,97 @@ async def async_setup_entry(
 ):
     """Set up ETA Device and sensors from config entry."""
     config = config_entry.data
-    sensors = []
 
     # Device info for the ETA Device
-    device_info = {
-        "identifiers": {(DOMAIN, f"{config[CONF_HOST]}:{config[CONF_PORT]}")},
-        "name": f"{config[CONF_NAME]}",
-        "manufacturer": "ETA Heiztechnik GmbH",
-        "model": f"{config[CONF_MODEL]}",
-        #"entry_type": DeviceEntryType.SERVICE,
-        "configuration_url": f"http://{config[CONF_HOST]}:{config[CONF_PORT]}/user/menu/"
-    }
-
-    # Create a single EtaAPI instance to share
-    session = async_get_clientsession(hass)
-    eta_api = EtaAPIFactory.get_instance(session, config[CONF_HOST], config[CONF_PORT])
-    sensors_dict = await eta_api.get_sensors()
-
-    # Add sensors for each selected entity
-    for entity in config.get(CHOOSEN_ENTITIES, []):
-        s = sensors_dict.byId(entity)
-        sensors.append(
+    device_info = eta_device_info(config)
+
+    # All sensors share the coordinator of this config entry
+    coordinator = hass.data[DOMAIN][config_entry.entry_id]["coordinator"]
+
+    @callback
+    def async_add_sensors(sensor_descs: list[EtaSensorDesc]):
+        async_add_entities(
             EtaSensor(
                 name=s.name,
                 sensor=s,
-                eta_api=eta_api,
+                coordinator=coordinator,
                 device_info=device_info,
                 hass=hass
             )
+            for s in sensor_descs
         )
 
-    async_add_entities(sensors, update_before_add=True)
+    # Add sensors for each selected entity, and for the ones selected later on
+    async_add_sensors(coordinator.sensors)
+    config_entry.async_on_unload(
+        async_dispatcher_connect(hass, SIGNAL_SENSORS_ADDED.format(config_entry.entry_id), async_add_sensors)
+    )
+    # request and poll statistics, disabled unless enabled in the entity registry
+    async_add_entities(
+        EtaDiagnosticSensor(description, coordinator, device_info, config_entry)
+        for description in DIAGNOSTIC_SENSORS
+    )
 
 
-class EtaSensor(SensorEntity):
+class EtaSensor(EtaEntity, SensorEntity):
     """Representation of an ETA Sensor."""
 
-    def __init__(self, name, sensor: EtaSensorDesc, eta_api: EtaAPI, device_info, hass: HomeAssistant):
+    def __init__(self, name, sensor: EtaSensorDesc, coordinator: EtaDataUpdateCoordinator, device_info, hass: HomeAssistant):
         self._attr_name = f"{device_info["name"]} {name}"
         self.entity_id = generate_entity_id(ENTITY_ID_FORMAT, "eta_" + sensor.canonicalName().replace(" > ", "_"), hass=hass)
-        self._sensor = sensor
-        self._eta_api = eta_api
-        self._device_info = device_info
+        super().__init__(sensor, coordinator, device_info)
         self._attr_unique_id = f"eta_{self._eta_api._host}_{self._eta_api._port}_{sensor.id}"
-        self._value = None
-        self._initialized = False
-
-    @property
-    def device_info(self):
-        return self._device_info
+        if sensor.sensor_type is not SensorType.TIMESLOT:
+            # time windows are shown as text, the unit is the one of their value
+            self._attr_native_unit_of_measurement = sensor.unit
+            self._attr_device_class = self.determine_device_class(sensor.unit)
+            self._attr_state_class = self.determine_state_class(sensor.unit)
 
     @property
     def native_value(self):
         return self._sensor.map(self._value)
 
-    @property
-    def extra_state_attributes(self):
-        return {
-            "sensor_id": self._sensor.id
-        }    
-
-    async def initialize(self):
-        """Initialize sensor."""
-        if not self._initialized:
-            await self._eta_api.initializeSensor(self._sensor)
-            self._attr_native_unit_of_measurement = self._sensor.unit
-            self._attr_device_class = self.determine_device_class(self._sensor.unit)
-            
-            self._initialized = True
-    
-    async def async_update(self):
-        """Fetch new state data for the sensor."""
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        # hours without statistics while Home Assistant was down
+        self._backfill()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        if self._sensor.id in self.coordinator.gaps:
+            self._update_value()
+            self._backfill()
+        super()._handle_coordinator_update()
+
+    def _backfill(self):
+        """Fill the hourly statistics of a counter up to its current value."""
+        if (
+            self._attr_state_class not in (SensorStateClass.TOTAL, SensorStateClass.TOTAL_INCREASING)
+            or not isinstance(self._value, float)
+            or "recorder" not in self.hass.config.components
+        ):
+            return
+        self.hass.async_create_background_task(
+            async_backfill_statistics(
+                self.hass,
+                self.entity_id,
+                self._attr_native_unit_of_measurement,
+                self._value,
+                self._attr_state_class is SensorStateClass.TOTAL_INCREASING,
+            ),
+            f"{self.entity_id} backfill statistics",
+        )
+
+    def _update_value(self):
+        if not self.coordinator.data or self._sensor.id not in self.coordinator.data:
+            self._value = None
+            return
+        value = self.coordinator.data[self._sensor.id]
         try:
-            await self.initialize()
             match self._sensor.sensor_type:
-                case SensorType.TEXT:
-                    value = await self._eta_api.get_data(self._sensor)
+                case SensorType.TEXT | SensorType.TIMESLOT:
                     self._value = value
                 case SensorType.NUMERIC:
-                    value = await self._eta_api.get_data(self._sensor)
                     self._value = float(value)
         except Exception as e:
             _LOGGER.warning(f"Failed to update ETA sensor {self._attr_name}: {e}")
@@ -145,4 +241,51 @@ class EtaSensor(SensorEntity):
         if unit in unit_dict_eta:
             return unit_dict_eta[unit]
         else:
-            return None
\ No newline at end of file
+            return None
+
+    @staticmethod
+    def determine_state_class(unit):
+        if unit is None:
+            return None
+        # energy only ever grows; pellet weights are consumption counters as well as
+        # the stock in the store, which drops and is refilled
+        unit_dict_eta = {
+            "kWh": SensorStateClass.TOTAL_INCREASING,
+            "kg": SensorStateClass.TOTAL,
+        }
+        return unit_dict_eta.get(unit, SensorStateClass.MEASUREMENT)
+
+
+class EtaDiagnosticSensor(CoordinatorEntity[EtaDataUpdateCoordinator], SensorEntity):
+    """Request or poll statistic of the connection to an ETA unit."""
+
+    entity_description: EtaDiagnosticSensorDescription
+
+    def __init__(
+        self,
+        description: EtaDiagnosticSensorDescription,
+        coordinator: EtaDataUpdateCoordinator,
+        device_info,
+        config_entry: config_entries.ConfigEntry,
+    ):
+        super().__init__(coordinator)
+        self.entity_description = description
+        self._attr_name = f"{device_info['name']} {description.name}"
+        self._attr_unique_id = f"eta_{config_entry.entry_id}_{description.key}"
+        self._attr_device_info = device_info
+        self._entry_id = config_entry.entry_id
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(self.hass, SIGNAL_POLLED.format(self._entry_id), self.async_write_ha_state)
+        )
+
+    @property
+    def available(self) -> bool:
+        # statistics are meaningful while the unit is unreachable as well
+        return True
+
+    @property
+    def native_value(self):
+        return self.entity_description.value_fn(self.coordinator)
@@ -0,0 +1,81 @@
+"""
+Backfill of the hourly long-term statistics of ETA counters.
+
+While the unit is unreachable, or a counter is read less than once an hour,
+the recorder has no state for whole hours and books the entire increase on
+the hour the next value arrives in. The missing hours are filled in one
+batch instead, assuming the counter grew linearly in between.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util
+
+if TYPE_CHECKING:
+    from homeassistant.components.recorder.models import StatisticData
+
+_LOGGER = logging.getLogger(__name__)
+HOUR = timedelta(hours=1)
+
+
+def interpolate_hours(
+    last_end: datetime, last_state: float, last_sum: float, now: datetime, value: float
+) -> list[StatisticData]:
+    """Hourly rows from ``last_end`` up to the hour of ``now``, which is left to the recorder."""
+    current = now.replace(minute=0, second=0, microsecond=0)
+    span = (now - last_end).total_seconds()
+    rows = []
+    start = last_end
+    while start + HOUR <= current:
+        state = last_state + (value - last_state) * (start + HOUR - last_end).total_seconds() / span
+        rows.append({"start": start, "state": state, "sum": last_sum + state - last_state})
+        start += HOUR
+    return rows
+
+
+async def async_backfill_statistics(
+    hass: HomeAssistant,
+    entity_id: str,
+    unit: str | None,
+    value: float,
+    increasing: bool,
+    now: datetime | None = None,
+) -> int:
+    """Import rows for the hours after the last statistics of ``entity_id``, return their number.
+
+    Nothing is imported for counters without statistics yet, and for
+    increasing counters that were reset meanwhile.
+    """
+    # the recorder is an optional dependency, only needed once a counter is backfilled
+    from homeassistant.components.recorder import get_instance
+    from homeassistant.components.recorder.models import StatisticMetaData
+    from homeassistant.components.recorder.statistics import async_import_statistics, get_last_statistics
+
+    last = await get_instance(hass).async_add_executor_job(
+        get_last_statistics, hass, 1, entity_id, True, {"state", "sum"}
+    )
+    if not last.get(entity_id):
+        return 0
+    row = last[entity_id][0]
+    if row.get("state") is None or (increasing and value < row["state"]):
+        return 0
+    rows = interpolate_hours(
+        dt_util.utc_from_timestamp(row["end"]), row["state"], row.get("sum") or 0.0, now or dt_util.utcnow(), value
+    )
+    if rows:
+        _LOGGER.debug("Backfilling %d hours of statistics of %s", len(rows), entity_id)
+        metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=None,
+            source="recorder",
+            statistic_id=entity_id,
+            unit_of_measurement=unit,
+        )
+        async_import_statistics(hass, metadata, rows)
+    return len(rows)
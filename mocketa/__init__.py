@@ -0,0 +1 @@
+"""Mock ETA controller for development and load tests."""
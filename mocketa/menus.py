@@ -0,0 +1,50 @@
+"""Synthetic /user/menu documents of arbitrary size."""
+
+MENU_HEAD = """<?xml version="1.0" encoding="utf-8"?>
+<eta version="1.0" xmlns="http://www.eta.co.at/rest/v1">
+  <menu uri="/user/menu/">
+"""
+MENU_TAIL = """  </menu>
+</eta>
+"""
+
+
+def synthetic_menu(nodes: int, fubs: int = 10, fanout: int = 8) -> str:
+    """Return a menu with ``nodes`` fub/object elements and unique uris.
+
+    Nodes are spread over ``fubs`` function blocks; every object gets up to
+    ``fanout`` children, so the tree is a few levels deep like real menus.
+    """
+    lines = [MENU_HEAD]
+    per_fub = max(nodes // fubs, 1)
+    created = 0
+    for f in range(fubs):
+        if created >= nodes:
+            break
+        fub_id = 10000 + f
+        lines.append(f'    <fub uri="/40/{fub_id}" name="Modul {f}">\n')
+        created += 1
+        budget = nodes - created if f == fubs - 1 else min(per_fub - 1, nodes - created)
+        created += _objects(lines, fub_id, [0], budget, fanout, depth=3, indent=6)
+        lines.append("    </fub>\n")
+    lines.append(MENU_TAIL)
+    return "".join(lines)
+
+
+def _objects(lines, fub_id, counter, budget, fanout, depth, indent) -> int:
+    created = 0
+    pad = " " * indent
+    while created < budget:
+        n = counter[0]
+        counter[0] += 1
+        uri = f"/40/{fub_id}/0/{n // 1000}/{10000 + n % 1000}"
+        name = f"Wert {n}"
+        created += 1
+        children = min(fanout, budget - created) if depth > 1 else 0
+        if children:
+            lines.append(f'{pad}<object uri="{uri}" name="{name}">\n')
+            created += _objects(lines, fub_id, counter, children, fanout, depth - 1, indent + 2)
+            lines.append(f"{pad}</object>\n")
+        else:
+            lines.append(f'{pad}<object uri="{uri}" name="{name}"/>\n')
+    return created
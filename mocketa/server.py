@@ -1,27 +1,339 @@
-import http.server
-import socketserver
+"""
+Mock ETA controller for development and load tests.
+
+Serves the REST API of an ETA unit: /user/menu, /user/var, /user/varinfo,
+/user/errors and variable sets below /user/vars. Writable variables take POSTs to
+/user/var and keep the written value. Without further options the menu and
+the variables stored in this directory are served; with ``--nodes`` a
+synthetic menu of that size is generated. varinfo and var responses are
+synthesized for every uri without a stored file.
+
+Latency, a connection limit, errors, dropped connections and hanging
+requests can be injected to see how the integration copes with a slow or
+flaky unit:
+
+    python -m mocketa.server --nodes 5000 --latency 0.2 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import hashlib
+import math
 import os
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from aiohttp import web
+
+from .menus import synthetic_menu
 
 MOCK_DIR = os.path.dirname(os.path.abspath(__file__))
 PORT = 8124
+VARS_PREFIX = "/user/vars/"
+VARINFO_PREFIX = "/user/varinfo"
+VAR_PREFIX = "/user/var"
+MENU_PREFIX = "/user/menu"
+ERRORS_PATH = "/user/errors"
 
-class MockEtaRequestHandler(http.server.SimpleHTTPRequestHandler):
-    def translate_path(self, path):
-        # Serve files from the mocketa directory
-        rel_path = path.lstrip("/user/").rstrip("/") + ".xml"
-        return os.path.join(MOCK_DIR, rel_path)
+ETA_XML = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<eta version="1.0" xmlns="http://www.eta.co.at/rest/v1">{content}</eta>'
+)
+# units of synthesized numeric variables
+UNITS = ["°C", "%", "kg", "kW", "bar", "s", "W"]
+TEXT_STATES = ["Aus", "Bereit", "Heizen", "Laden", "Störung"]
+TEXT_OFFSET = 4000
 
-    def end_headers(self):
-        # Always serve as XML for .xml files
-        if self.path.endswith('.xml'):
-            self.send_header('Content-Type', 'application/xml')
-        super().end_headers()
 
-if __name__ == "__main__":
-    os.chdir(MOCK_DIR)
-    class ReusableTCPServer(socketserver.TCPServer):
-        allow_reuse_address = True
+@dataclass
+class MockEtaConfig:
+    # synthetic menu size, 0 serves menu.xml
+    nodes: int = 0
+    fubs: int = 10
+    fanout: int = 8
+    # seconds added to every response, plus a random share of jitter
+    latency: float = 0.0
+    jitter: float = 0.0
+    # requests handled at once, further ones wait; 0 for no limit
+    max_connections: int = 0
+    # share of requests answered with HTTP 500, closed without answer or hanging
+    error_rate: float = 0.0
+    drop_rate: float = 0.0
+    timeout_rate: float = 0.0
+    hang: float = 3600.0
+    varsets: bool = True
+    seed: int | None = None
+
+
+class MockEtaController:
+    """One simulated ETA unit, see the module docstring."""
+
+    def __init__(self, config: MockEtaConfig | None = None, directory: str = MOCK_DIR):
+        self.config = config or MockEtaConfig()
+        self._directory = directory
+        self._random = random.Random(self.config.seed)
+        self._menu: str | None = None
+        self._names: dict[str, str] | None = None
+        # variable set name -> registered uris
+        self.varsets: dict[str, list[str]] = {}
+        # uri -> raw value written through POST
+        self.written: dict[str, int] = {}
+        # function block uri -> active faults as (msg, priority, time, text)
+        self.errors: dict[str, list[tuple[str, str, str, str]]] = {}
+        # requests per endpoint and injected faults
+        self.stats: Counter = Counter()
+        self._active = 0
+        self._limit = asyncio.Semaphore(self.config.max_connections) if self.config.max_connections else None
+        self._runner: web.AppRunner | None = None
+        self.url: str | None = None
+
+    @property
+    def menu(self) -> str:
+        if self._menu is None:
+            if self.config.nodes:
+                self._menu = synthetic_menu(self.config.nodes, self.config.fubs, self.config.fanout)
+            else:
+                with open(os.path.join(self._directory, "menu.xml"), encoding="utf-8") as f:
+                    self._menu = f.read()
+        return self._menu
+
+    def _name(self, uri: str) -> str:
+        if self._names is None:
+            self._names = dict(re.findall(r'uri="([^"]+)"\s+name="([^"]*)"', self.menu))
+        return self._names.get(uri, uri.rsplit("/", 1)[-1])
+
+    def _stored(self, kind: str, uri: str) -> str | None:
+        # files in var/ and varinfo/ take precedence over synthesized answers
+        if self.config.nodes:
+            return None
+        path = os.path.join(self._directory, kind, uri.strip("/") + ".xml")
+        if not os.path.isfile(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+
+    @staticmethod
+    def _digest(uri: str) -> bytes:
+        return hashlib.sha1(uri.encode()).digest()
+
+    def writable(self, uri: str) -> bool:
+        """A quarter of the synthesized variables can be written."""
+        return self._digest(uri)[3] % 4 == 0
+
+    def varinfo(self, uri: str) -> str:
+        digest = self._digest(uri)
+        name = self._name(uri)
+        writable = int(self.writable(uri))
+        if digest[0] % 10 < 2:
+            states = "".join(
+                f'<value strValue="{state}">{TEXT_OFFSET + i}</value>' for i, state in enumerate(TEXT_STATES)
+            )
+            variable = (
+                f'<variable advTextOffset="{TEXT_OFFSET}" unit="" uri="{uri[1:]}" isWritable="{writable}" scaleFactor="1"'
+                f' name="{name}" fullName="{name}" decPlaces="0"><type>TEXT</type>'
+                f"<validValues>{states}</validValues></variable>"
+            )
+        else:
+            unit = UNITS[digest[1] % len(UNITS)]
+            limits = "<validValues><min>0</min><max>1500</max></validValues>" if writable else ""
+            variable = (
+                f'<variable advTextOffset="0" unit="{unit}" uri="{uri[1:]}" isWritable="{writable}" scaleFactor="10"'
+                f' name="{name}" fullName="{name}" decPlaces="1"><type>DEFAULT</type>{limits}</variable>'
+            )
+        return ETA_XML.format(content=f'<varInfo uri="{VARINFO_PREFIX}{uri}">{variable}</varInfo>')
 
-    with ReusableTCPServer(("0.0.0.0", PORT), MockEtaRequestHandler) as httpd:
-        print(f"Mock ETA server running at http://localhost:{PORT}/")
-        httpd.serve_forever()
+    def value(self, uri: str, tag: str = "value") -> str:
+        """A value changing over time; a third of the variables stay constant."""
+        stored = self._stored("var", uri)
+        written = self.written.get(uri)
+        if stored is not None:
+            match = re.search(r"<value\b(.*?)>(.*?)</value>", stored, re.S)
+            if match:
+                raw = match.group(2) if written is None else written
+                return f"<{tag}{match.group(1)}>{raw}</{tag}>"
+        digest = self._digest(uri)
+        period = 60 + int.from_bytes(digest[2:4], "big") % 3600
+        wave = math.sin(2 * math.pi * time.time() / period + digest[4])
+        if digest[0] % 10 < 2:
+            state = int((wave + 1) / 2 * (len(TEXT_STATES) - 1) + 0.5) if digest[5] % 3 else 0
+            if written is not None:
+                state = written - TEXT_OFFSET
+            attributes = f'strValue="{TEXT_STATES[state]}" unit="" decPlaces="0" scaleFactor="1" advTextOffset="{TEXT_OFFSET}"'
+            raw = TEXT_OFFSET + state
+        else:
+            amplitude = (digest[5] % 3 and digest[6] % 50) or 0
+            raw = int.from_bytes(digest[7:9], "big") % 1000 + round(amplitude * wave)
+            if written is not None:
+                raw = written
+            unit = UNITS[digest[1] % len(UNITS)]
+            str_value = f"{raw / 10:.1f}".replace(".", ",")
+            attributes = f'strValue="{str_value}" unit="{unit}" decPlaces="1" scaleFactor="10" advTextOffset="0"'
+        return f'<{tag} uri="{VAR_PREFIX}{uri}" {attributes}>{raw}</{tag}>'
+
+    def error_list(self) -> str:
+        fubs = []
+        for fub, errors in self.errors.items():
+            entries = "".join(
+                f'<error msg="{msg}" priority="{priority}" time="{time}">{text}</error>'
+                for msg, priority, time, text in errors
+            )
+            fubs.append(f'<fub uri="{fub}" name="{self._name(fub)}">{entries}</fub>')
+        return f'<errors uri="{ERRORS_PATH}">{"".join(fubs)}</errors>'
+
+    # request handling
+    @staticmethod
+    def _xml(content: str, status: int = 200) -> web.Response:
+        return web.Response(text=ETA_XML.format(content=content), status=status, content_type="application/xml")
+
+    @web.middleware
+    async def _inject_faults(self, request: web.Request, handler):
+        if self._limit is not None:
+            if self._limit.locked():
+                self.stats["queued"] += 1
+            await self._limit.acquire()
+        self._active += 1
+        self.stats["max_concurrent"] = max(self.stats["max_concurrent"], self._active)
+        try:
+            config = self.config
+            delay = config.latency + self._random.uniform(0, config.jitter)
+            if delay:
+                await asyncio.sleep(delay)
+            roll = self._random.random()
+            if roll < config.drop_rate:
+                self.stats["dropped"] += 1
+                request.transport.close()
+                return web.Response()
+            roll -= config.drop_rate
+            if roll < config.timeout_rate:
+                self.stats["hung"] += 1
+                await asyncio.sleep(config.hang)
+            elif roll - config.timeout_rate < config.error_rate:
+                self.stats["errors"] += 1
+                return self._xml("<error>Internal error</error>", status=500)
+            return await handler(request)
+        finally:
+            self._active -= 1
+            if self._limit is not None:
+                self._limit.release()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        path = request.path
+        if path.startswith(VARS_PREFIX):
+            self.stats["vars"] += 1
+            return self._handle_vars(request.method, path)
+        if request.method == "POST" and path.startswith(VAR_PREFIX) and not path.startswith(VARINFO_PREFIX):
+            self.stats["writes"] += 1
+            return await self._handle_write(request, path[len(VAR_PREFIX):])
+        if request.method != "GET":
+            return self._xml("<error>Not supported</error>", status=405)
+        if path.startswith(VARINFO_PREFIX):
+            self.stats["varinfo"] += 1
+            uri = path[len(VARINFO_PREFIX):]
+            stored = self._stored("varinfo", uri)
+            return web.Response(text=stored or self.varinfo(uri), content_type="application/xml")
+        if path.startswith(VAR_PREFIX):
+            self.stats["var"] += 1
+            return self._xml(self.value(path[len(VAR_PREFIX):]))
+        if path == ERRORS_PATH:
+            self.stats["errors_feed"] += 1
+            return self._xml(self.error_list())
+        if path.startswith(MENU_PREFIX):
+            self.stats["menu"] += 1
+            return web.Response(text=self.menu, content_type="application/xml")
+        return self._xml("<error>Not found</error>", status=404)
+
+    async def _handle_write(self, request: web.Request, uri: str) -> web.Response:
+        value = (await request.post()).get("value")
+        if self.config.nodes and not self.writable(uri):
+            return self._xml("<error>Variable is not writable</error>")
+        try:
+            self.written[uri] = int(value)
+        except (TypeError, ValueError):
+            return self._xml(f"<error>Invalid value {value}</error>")
+        return self._xml(f'<success uri="{VAR_PREFIX}{uri}"/>')
+
+    def _handle_vars(self, method: str, path: str) -> web.Response:
+        if not self.config.varsets:
+            return self._xml("<error>Not supported</error>", status=404)
+        name, _, uri = path[len(VARS_PREFIX):].rstrip("/").partition("/")
+        uri = "/" + uri if uri else None
+        if method == "PUT" and uri is None:
+            self.varsets[name] = []
+            return self._xml("<success/>", status=201)
+        if name not in self.varsets:
+            return self._xml(f"<error>Variable set {name} not found</error>", status=404)
+        if method == "GET":
+            variables = "".join(self.value(uri, "variable") for uri in self.varsets[name])
+            return self._xml(f'<vars uri="{VARS_PREFIX}{name}">{variables}</vars>')
+        if method == "PUT":
+            if uri not in self.varsets[name]:
+                self.varsets[name].append(uri)
+            return self._xml("<success/>", status=201)
+        if method == "DELETE":
+            if uri is None:
+                self.varsets.pop(name)
+            elif uri in self.varsets[name]:
+                self.varsets[name].remove(uri)
+            return self._xml("<success/>")
+        return self._xml("<error>Not supported</error>", status=405)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._inject_faults])
+        app.router.add_route("*", "/{path:.*}", self._handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve on ``host``, a free port if ``port`` is 0; returns the base url."""
+        self._runner = web.AppRunner(self.app(), handle_signals=False)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def serve(config: MockEtaConfig, host: str, port: int):
+    controller = MockEtaController(config)
+    url = await controller.start(host, port)
+    print(f"Mock ETA server running at {url}/")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await controller.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--nodes", type=int, default=0, help="size of a synthetic menu")
+    parser.add_argument("--fubs", type=int, default=10)
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random extra seconds per response")
+    parser.add_argument("--max-connections", type=int, default=0, help="requests handled at once")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--hang", type=float, default=3600.0, help="seconds a timed out request hangs")
+    parser.add_argument("--no-varsets", dest="varsets", action="store_false")
+    parser.add_argument("--seed", type=int)
+    args = vars(parser.parse_args())
+    host, port = args.pop("host"), args.pop("port")
+    try:
+        asyncio.run(serve(MockEtaConfig(**args), host, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
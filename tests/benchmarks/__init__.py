@@ -0,0 +1 @@
+"""Benchmarks for the ETA API layer."""
@@ -0,0 +1,25 @@
+"""Benchmarks, timed with pytest-benchmark.
+
+Benchmarks are skipped unless BENCHMARK is set, they take too long for
+every test run:
+
+    BENCHMARK=1 pytest -o asyncio_mode=auto tests/benchmarks
+
+Use pytest-benchmark's options to keep and compare results, e.g.
+``--benchmark-autosave`` and ``--benchmark-compare``. The correctness of
+the optimized paths against their references is tested in test_api.py.
+"""
+import os
+from pathlib import Path
+
+import pytest
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get("BENCHMARK"):
+        return
+    here = Path(__file__).parent
+    skip = pytest.mark.skip(reason="benchmarks only run with BENCHMARK set")
+    for item in items:
+        if here in item.path.parents:
+            item.add_marker(skip)
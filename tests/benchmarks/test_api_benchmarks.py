@@ -0,0 +1,136 @@
+"""Throughput of the API layer, recorded through the ``benchmark`` fixture."""
+import asyncio
+
+import pytest
+
+from custom_components.eta.api import (
+    EtaAPI,
+    EtaMenuParser,
+    EtaSensorDesc,
+    EtaValue,
+    EtaValueDecoder,
+    SensorDict,
+    decode_value,
+)
+from mocketa.menus import synthetic_menu
+from mocketa.server import MockEtaConfig, MockEtaController
+
+CHUNK_SIZE = 16384
+
+VALUE = """<?xml version="1.0" encoding="utf-8"?>
+<eta version="1.0" xmlns="http://www.eta.co.at/rest/v1">
+  <value uri="/user/var/40/10211/0/0/12015" strValue="21,5" unit="°C" decPlaces="1" scaleFactor="10" advTextOffset="0">215</value>
+</eta>"""
+TEXT_VALUE = """<?xml version="1.0" encoding="utf-8"?>
+<eta version="1.0" xmlns="http://www.eta.co.at/rest/v1">
+  <value uri="/user/var/40/10021/0/0/19402" strValue="Heizen" unit="" decPlaces="0" scaleFactor="1" advTextOffset="4000">4011</value>
+</eta>"""
+
+
+def _chunks(nodes: int) -> list[bytes]:
+    data = synthetic_menu(nodes).encode("utf-8")
+    return [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+
+
+def _parse(chunks: list[bytes]) -> SensorDict:
+    parser = EtaMenuParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.finish()
+
+
+@pytest.mark.parametrize("nodes", [1000, 10000])
+def test_menu_parsing(benchmark, nodes):
+    sensors = benchmark(_parse, _chunks(nodes))
+    assert len(sensors.sensors) == nodes
+
+
+@pytest.mark.parametrize("nodes", [1000, 10000])
+def test_sensor_dict_name_dict(benchmark, nodes):
+    descs = list(_parse(_chunks(nodes)).sensors.values())
+
+    def build():
+        # fresh descriptions, labels are cached on them
+        sensors = SensorDict()
+        copies = {}
+        for desc in descs:
+            parent = copies.get(desc.parent.id) if desc.parent else None
+            copies[desc.id] = copy = EtaSensorDesc(desc.id, desc.name, parent)
+            sensors.add(copy)
+        return sensors.nameDict()
+
+    assert len(benchmark(build)) == nodes
+
+
+@pytest.mark.parametrize("text", [VALUE, TEXT_VALUE], ids=["numeric", "text"])
+def test_get_value(benchmark, text):
+    sensor = EtaSensorDesc("/40/10211/0/0/12015", "Vorrat", None)
+    if text is VALUE:
+        sensor.updateUnit("°C")
+    else:
+        sensor.updateStates({"4011": "Heizen"})
+
+    value = benchmark(lambda: sensor.getValue(decode_value(text)))
+    assert value in (21.5, "Heizen")
+
+
+def _numeric_batch(size: int) -> tuple[list[EtaSensorDesc], dict[str, EtaValue]]:
+    sensors = []
+    values = {}
+    for i in range(size):
+        sensor = EtaSensorDesc(f"/40/10021/0/0/{12000 + i}", "Sensor", None)
+        sensor.updateUnit("°C")
+        sensor.updateScale(10, 1)
+        sensor.markInitialized()
+        sensors.append(sensor)
+        values[sensor.id] = EtaValue(sensor.id, f"{i / 10}", "°C", "10", "1", str(i))
+    return sensors, values
+
+
+@pytest.mark.parametrize("size", [100, 500])
+@pytest.mark.parametrize("path", ["per-sensor", "batch"])
+def test_decode_batch(benchmark, path, size):
+    sensors, values = _numeric_batch(size)
+    decoder = EtaValueDecoder(sensors)
+    expected = {sensor.id: sensor.getValue(values[sensor.id]) for sensor in sensors}
+
+    if path == "batch":
+        decoded = benchmark(decoder.decode, values)
+    else:
+        decoded = benchmark(lambda: {sensor.id: sensor.getValue(values[sensor.id]) for sensor in sensors})
+    assert decoded == expected
+
+
+@pytest.mark.usefixtures("socket_enabled")
+@pytest.mark.parametrize(
+    "sensors,varset",
+    [(10, True), (100, True), (1000, True), (10, False), (100, False)],
+    ids=["10-varset", "100-varset", "1000-varset", "10-single", "100-single"],
+)
+def test_poll_cycle(benchmark, sensors, varset):
+    # benchmark only times plain callables, the cycles run on a loop of their own
+    loop = asyncio.new_event_loop()
+    controller = MockEtaController(MockEtaConfig(nodes=sensors + 10, seed=1))
+    loop.run_until_complete(controller.start())
+    host, port = controller.url[len("http://"):].split(":")
+    eta = EtaAPI(None, host, int(port))
+    try:
+        selected = list(loop.run_until_complete(eta.get_sensors()).sensors.values())[-sensors:]
+        loop.run_until_complete(eta.initializeSensors(selected))
+
+        def cycle():
+            # every cycle asks the controller, not the short lived value cache
+            eta._values.clear()
+            return loop.run_until_complete(eta.get_all_data(selected, "bench" if varset else None))
+
+        # the first cycle registers the variable set
+        cycle()
+        requests = sum(controller.stats[k] for k in ("var", "vars"))
+        values = benchmark.pedantic(cycle, rounds=3)
+        cycle_requests = (sum(controller.stats[k] for k in ("var", "vars")) - requests) / 3
+        benchmark.extra_info.update(sensors=sensors, requests_per_cycle=cycle_requests)
+        assert len(values) == sensors
+    finally:
+        loop.run_until_complete(eta.close())
+        loop.run_until_complete(controller.stop())
+        loop.close()
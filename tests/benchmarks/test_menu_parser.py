@@ -0,0 +1,61 @@
+"""Benchmark the streaming menu parser against the former xmltodict walk."""
+from pathlib import Path
+
+import pytest
+import xmltodict
+
+from custom_components.eta.api import EtaMenuParser, EtaSensorDesc, SensorDict
+
+from mocketa.menus import synthetic_menu
+
+MENU_FILENAME = Path(__file__).parent.parent / "res" / "menu.xml"
+CHUNK_SIZE = 16384
+
+
+def legacy_parse(text: str) -> SensorDict:
+    """The parse path used before the streaming parser, kept as reference."""
+    sensors = SensorDict()
+
+    def evaluate(xml_dict, parent):
+        if type(xml_dict) is list:
+            for child in xml_dict:
+                evaluate(child, parent)
+        elif "object" in xml_dict:
+            s = EtaSensorDesc(xml_dict["@uri"], xml_dict["@name"], parent)
+            sensors.add(s)
+            evaluate(xml_dict["object"], s)
+        elif "fub" in xml_dict:
+            s = EtaSensorDesc(xml_dict["@uri"], xml_dict["@name"], None)
+            sensors.add(s)
+            evaluate(xml_dict["fub"], s)
+        else:
+            sensors.add(EtaSensorDesc(xml_dict["@uri"], xml_dict["@name"], parent))
+
+    evaluate(xmltodict.parse(text)["eta"]["menu"]["fub"], None)
+    return sensors
+
+
+def chunked(text: str) -> list[bytes]:
+    """Split the menu like it arrives from the network."""
+    data = text.encode("utf-8")
+    return [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+
+
+def streaming_parse(chunks: list[bytes]) -> SensorDict:
+    parser = EtaMenuParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.finish()
+
+
+MENUS = {"menu.xml": MENU_FILENAME.read_text(), "synthetic-10k": synthetic_menu(10000)}
+
+
+@pytest.mark.parametrize("menu", list(MENUS))
+def test_xmltodict_parser(benchmark, menu):
+    benchmark.pedantic(legacy_parse, args=(MENUS[menu],), rounds=3)
+
+
+@pytest.mark.parametrize("menu", list(MENUS))
+def test_streaming_parser(benchmark, menu):
+    benchmark.pedantic(streaming_parse, args=(chunked(MENUS[menu]),), rounds=3)
@@ -0,0 +1,99 @@
+"""Memory held by the menu tree, compared with the former representation."""
+import gc
+import tracemalloc
+from xml.etree import ElementTree
+
+import pytest
+
+from custom_components.eta.api import EtaSensorDesc, SensorDict
+
+from mocketa.menus import synthetic_menu
+
+
+class LegacySensorDesc:
+    """EtaSensorDesc before slots and lazy labels, kept as reference."""
+
+    def __init__(self, id, name, parent):
+        self._id = id
+        self._name = name
+        self._parent = parent
+        self._unit = None
+        self._sensor_type = None
+        self._states = None
+        self._canonicalName = None
+
+    @property
+    def id(self):
+        return self._id
+
+    def canonicalName(self) -> str:
+        cn = ""
+        if self._parent:
+            cn = cn + self._parent.canonicalName() + " > "
+        return cn + self._name
+
+
+class LegacySensorDict:
+    def __init__(self) -> None:
+        self._sensors = {}
+        self._label_to_id = {}
+        self._id_to_label = {}
+
+    def add(self, sensor):
+        if sensor.id not in self._sensors:
+            self._sensors[sensor.id] = sensor
+            self._id_to_label[sensor.id] = sensor.canonicalName()
+            self._label_to_id[sensor.canonicalName()] = sensor.id
+
+
+class Builder:
+    """Menu parser target building either representation."""
+
+    def __init__(self, desc_cls, dict_cls):
+        self.desc_cls = desc_cls
+        self.sensors = dict_cls()
+        self.stack = []
+
+    def start(self, tag, attrib):
+        tag = tag.rpartition("}")[2]
+        if tag in ("fub", "object"):
+            parent = self.stack[-1] if tag == "object" and self.stack else None
+            sensor = self.desc_cls(attrib["uri"], attrib["name"], parent)
+            self.sensors.add(sensor)
+            self.stack.append(sensor)
+        else:
+            self.stack.append(None)
+
+    def end(self, tag):
+        self.stack.pop()
+
+
+def build(menu: str, desc_cls, dict_cls):
+    builder = Builder(desc_cls, dict_cls)
+    parser = ElementTree.XMLParser(target=builder)
+    parser.feed(menu)
+    parser.close()
+    return builder.sensors
+
+
+def retained(menu: str, desc_cls, dict_cls) -> int:
+    """Bytes still allocated once the tree is built."""
+    gc.collect()
+    tracemalloc.start()
+    sensors = build(menu, desc_cls, dict_cls)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(sensors._sensors) > 0
+    return size
+
+
+MENU = synthetic_menu(10000)
+REPRESENTATIONS = {"legacy": (LegacySensorDesc, LegacySensorDict), "compact": (EtaSensorDesc, SensorDict)}
+
+
+@pytest.mark.parametrize("representation", list(REPRESENTATIONS))
+def test_sensor_dict_memory(benchmark, representation):
+    desc_cls, dict_cls = REPRESENTATIONS[representation]
+    benchmark.pedantic(build, args=(MENU, desc_cls, dict_cls), rounds=3)
+    benchmark.extra_info["retained_memory"] = retained(MENU, desc_cls, dict_cls)
@@ -0,0 +1,46 @@
+"""Benchmark the compiled value decoder against xmltodict."""
+import pytest
+import xmltodict
+
+from custom_components.eta.api import EtaValue, decode_value, decode_values
+
+VALUE = """<?xml version="1.0" encoding="utf-8"?>
+<eta version="1.0" xmlns="http://www.eta.co.at/rest/v1">
+  <value uri="/user/var/40/10211/0/0/12015" strValue="6539" unit="kg" decPlaces="0" scaleFactor="10" advTextOffset="0">65391</value>
+</eta>"""
+
+
+def varset(size: int) -> str:
+    variables = "".join(
+        f'<variable uri="40/10021/0/0/{12000 + i}" strValue="{i / 10}" unit="°C" decPlaces="1" scaleFactor="10" advTextOffset="0">{i}</variable>\n'
+        for i in range(size)
+    )
+    return f'<?xml version="1.0" encoding="utf-8"?>\n<eta version="1.0" xmlns="http://www.eta.co.at/rest/v1"><vars uri="/user/vars/ha">{variables}</vars></eta>'
+
+
+def xmltodict_value(data) -> EtaValue:
+    return EtaValue(data["@uri"], data["@strValue"], data["@unit"], data["@scaleFactor"], data["@decPlaces"], data["#text"])
+
+
+def legacy_decode_value(text: str) -> EtaValue:
+    return xmltodict_value(xmltodict.parse(text)["eta"]["value"])
+
+
+def legacy_decode_values(text: str) -> list[EtaValue]:
+    parsed = xmltodict.parse(text, force_list=("variable",))["eta"]["vars"]
+    return [xmltodict_value(v) for v in parsed["variable"]]
+
+
+VALUE_DECODERS = {"xmltodict": legacy_decode_value, "compiled": decode_value}
+VALUES_DECODERS = {"xmltodict": legacy_decode_values, "compiled": lambda text: list(decode_values(text))}
+
+
+@pytest.mark.parametrize("decoder", list(VALUE_DECODERS))
+def test_value_decoder(benchmark, decoder):
+    benchmark(VALUE_DECODERS[decoder], VALUE)
+
+
+@pytest.mark.parametrize("size", [10, 100, 500])
+@pytest.mark.parametrize("decoder", list(VALUES_DECODERS))
+def test_varset_decoder(benchmark, decoder, size):
+    benchmark(VALUES_DECODERS[decoder], varset(size))
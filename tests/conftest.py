@@ -14,6 +14,8 @@
 #
 # See here for more info: https://docs.pytest.org/en/latest/fixture.html (note that
 # pytest includes fixtures OOB which you can use as defined on this page)
+import os
+from pathlib import Path
 from unittest.mock import patch
 
 import pytest
@@ -40,15 +42,176 @@ def skip_notifications_fixture():
         yield
 
 
-# This fixture, when used, will result in calls to async_get_data to return None. To have the call
-# return a value, we would add the `return_value=<VALUE_TO_RETURN>` parameter to the patch call.
-@pytest.fixture(name="bypass_get_data")
-def bypass_get_data_fixture():
-    """Skip calls to get data from API."""
-    with patch(
-        "custom_components.eta.sensor.EtaSensor.async_update"
-    ):
-        yield
+MENU_FILENAME = os.path.join(os.path.dirname(__file__), "res", "menu.xml")
+
+ETA_XML = """<?xml version="1.0" encoding="utf-8"?>
+<eta version="1.0" xmlns="http://www.eta.co.at/rest/v1">
+  {content}
+</eta>"""
+
+VALUE_XML = """<{tag} uri="/user/var{uri}" strValue="{str_value}" unit="{unit}" decPlaces="{dec_places}" scaleFactor="{scale_factor}" advTextOffset="0">{raw}</{tag}>"""
+
+VARINFO_XML = """<eta xmlns="http://www.eta.co.at/rest/v1" version="1.0">
+<varInfo uri="/user/varinfo{uri}">
+<variable advTextOffset="0" unit="{unit}" uri="{uri}" isWritable="{writable}" scaleFactor="{scale_factor}" name="x" fullName="x" decPlaces="{dec_places}">
+<type>{type}</type>{valid_values}
+</variable>
+</varInfo>
+</eta>"""
+
+
+class MockStreamReader:
+    def __init__(self, data: bytes):
+        self._data = data
+
+    async def iter_chunked(self, n):
+        for i in range(0, len(self._data), n):
+            yield self._data[i:i + n]
+
+
+class MockEtaResponse:
+    def __init__(self, text, status=200):
+        self.status = status
+        self._text = text
+        self.content = MockStreamReader(text.encode("utf-8"))
+
+    async def text(self):
+        return self._text
+
+
+class MockEtaSession:
+    """Minimal stand-in for an aiohttp session talking to an ETA unit.
+
+    Every variable reports a value in °C with scale factor 10; values can be
+    changed through ``values`` (uri -> raw value). Variable sets live in
+    ``varsets`` and can be dropped to simulate a controller reboot.
+    Variables in ``writable`` (uri -> raw min and max) accept POSTs, unless
+    ``ignore_writes`` is set, then the unit answers but keeps the old value.
+    The next ``busy`` variable set requests are answered with 503.
+    Variables in ``timeslots`` (uri -> raw "begin end value") are time windows.
+    Active faults are listed in ``errors`` as (fub uri, msg, priority, time);
+    ``fubs`` (uri -> name) are the function blocks of /user/errors.
+    """
+
+    def __init__(self):
+        self.requests: list[str] = []
+        self.values: dict[str, int] = {}
+        self.varsets: dict[str, list[str]] = {}
+        self.varsets_supported = True
+        self.busy = 0
+        self.writable: dict[str, tuple[int, int]] = {}
+        self.ignore_writes = False
+        self.timeslots: dict[str, str] = {}
+        self.fubs = {"/112/10021": "Kessel", "/112/10101": "HK1"}
+        self.errors: list[tuple[str, str, str, str]] = []
+        self.fail = False
+        self.menu = Path(MENU_FILENAME).read_text()
+        self.closed = False
+        # every request, including the ones failing while the unit is offline
+        self.attempts = 0
+
+    async def close(self):
+        self.closed = True
+
+    def _path(self, url):
+        path = "/" + str(url).split("/", 3)[3]
+        self.attempts += 1
+        if self.fail:
+            raise ConnectionError("ETA unit not reachable")
+        return path
+
+    def _value(self, uri, tag="value"):
+        if uri in self.timeslots:
+            raw = self.timeslots[uri]
+            begin, end, value = (int(part) for part in raw.split())
+            str_value = f"{begin // 4:02d}:{begin % 4 * 15:02d} - {end // 4:02d}:{end % 4 * 15:02d} {value // 10} °C"
+            return VALUE_XML.format(tag=tag, uri=uri, str_value=str_value, unit="°C", dec_places=0, scale_factor=10, raw=raw)
+        raw = self.values.get(uri, 215)
+        return VALUE_XML.format(tag=tag, uri=uri, str_value=raw / 10, unit="°C", dec_places=1, scale_factor=10, raw=raw)
+
+    async def post(self, url, data=None, **kwargs):
+        path = self._path(url)
+        self.requests.append(f"POST {path} {data['value']}")
+        uri = path[len("/user/var"):]
+        if uri not in self.writable:
+            return MockEtaResponse(ETA_XML.format(content="<error>not writable</error>"))
+        if not self.ignore_writes:
+            self.values[uri] = int(data["value"])
+        return MockEtaResponse(ETA_XML.format(content=f'<success uri="{path}"/>'))
+
+    def _busy(self, path):
+        if self.busy and path.startswith("/user/vars/"):
+            self.busy -= 1
+            return MockEtaResponse(ETA_XML.format(content="<error>busy</error>"), status=503)
+        return None
+
+    async def put(self, url, **kwargs):
+        path = self._path(url)
+        self.requests.append("PUT " + path)
+        if busy := self._busy(path):
+            return busy
+        if not self.varsets_supported:
+            return MockEtaResponse(ETA_XML.format(content="<error>unknown</error>"), status=404)
+        name, _, uri = path[len("/user/vars/"):].partition("/")
+        if uri:
+            self.varsets[name].append("/" + uri)
+        else:
+            self.varsets[name] = []
+        return MockEtaResponse("", status=201)
+
+    async def delete(self, url, **kwargs):
+        path = self._path(url)
+        self.requests.append("DELETE " + path)
+        name, _, uri = path[len("/user/vars/"):].partition("/")
+        if uri:
+            self.varsets.get(name, []).remove("/" + uri)
+        else:
+            self.varsets.pop(name, None)
+        return MockEtaResponse("")
 
+    async def get(self, url, **kwargs):
+        path = self._path(url)
+        self.requests.append(path)
+        if busy := self._busy(path):
+            return busy
+        if path.startswith("/user/vars/"):
+            name = path[len("/user/vars/"):]
+            if name not in self.varsets:
+                return MockEtaResponse(ETA_XML.format(content="<error>not found</error>"), status=404)
+            variables = "".join(self._value(uri, "variable") for uri in self.varsets[name])
+            return MockEtaResponse(ETA_XML.format(content=f'<vars uri="{path}">{variables}</vars>'))
+        if path.startswith("/user/menu"):
+            return MockEtaResponse(self.menu)
+        if path == "/user/errors":
+            fubs = "".join(
+                f'<fub uri="{fub}" name="{name}">'
+                + "".join(
+                    f'<error msg="{msg}" priority="{priority}" time="{time}">{msg} erkannt</error>'
+                    for uri, msg, priority, time in self.errors
+                    if uri == fub
+                )
+                + "</fub>"
+                for fub, name in self.fubs.items()
+            )
+            return MockEtaResponse(ETA_XML.format(content=f'<errors uri="/user/errors">{fubs}</errors>'))
+        if path.startswith("/user/varinfo"):
+            uri = path[len("/user/varinfo"):]
+            valid_values = ""
+            if uri in self.writable:
+                minimum, maximum = self.writable[uri]
+                valid_values = f"<validValues><min>{minimum}</min><max>{maximum}</max></validValues>"
+            return MockEtaResponse(VARINFO_XML.format(
+                uri=uri, unit="°C", scale_factor=10, dec_places=1,
+                writable=int(uri in self.writable), valid_values=valid_values,
+                type="TIMESLOTPLUSTEMPERATURE" if uri in self.timeslots else "DEFAULT",
+            ))
+        if path.startswith("/user/var"):
+            uri = path[len("/user/var"):]
+            return MockEtaResponse(ETA_XML.format(content=self._value(uri)))
+        return MockEtaResponse("", status=404)
 
 
+@pytest.fixture(name="eta_session")
+def eta_session_fixture():
+    """Provide a mock ETA session."""
+    return MockEtaSession()
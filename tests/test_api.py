@@ -1,10 +1,39 @@
 import pytest
 from unittest.mock import patch
-from custom_components.eta.api import EtaAPI
+from custom_components.eta.api import (
+    CircuitState,
+    EtaMenuParser,
+    EtaAPI,
+    EtaAPIFactory,
+    EtaCircuitBreaker,
+    EtaErrorFeed,
+    EtaRequestStats,
+    EtaSensorDesc,
+    EtaUnavailableError,
+    EtaValue,
+    EtaValueDecoder,
+    EtaRequestScheduler,
+    EtaWriteError,
+    EtaWriteInfo,
+    EtaWriteQueue,
+    RequestPriority,
+    SensorDict,
+    SensorType,
+    decode_errors,
+    decode_value,
+    decode_values,
+    diff_menus,
+)
+from .benchmarks.test_menu_parser import MENUS, chunked, legacy_parse, streaming_parse
+from .benchmarks.test_sensor_dict_memory import LegacySensorDesc, LegacySensorDict, build
+from .benchmarks.test_value_decoder import VALUE, legacy_decode_value, legacy_decode_values, varset
+from .conftest import MockEtaSession
 from pathlib import Path
 import asyncio
+import gc
+import tracemalloc
+import weakref
 import os
-import xmltodict
 
 TESTDATA_FILENAME = os.path.join(os.path.dirname(__file__), "res", "menu.xml")
 menu_txt = Path(TESTDATA_FILENAME).read_text()
@@ -12,14 +41,14 @@ menu_txt = Path(TESTDATA_FILENAME).read_text()
 
 class TestResponse:
     status = 200
-
-    def text(self):
-        value_text = """<?xml version="1.0" encoding="utf-8"?>
+    value_text = """<?xml version="1.0" encoding="utf-8"?>
 <eta version="1.0" xmlns="http://www.eta.co.at/rest/v1">
   <value uri="/user/var//40/10211/0/0/12015" strValue="6539" unit="kg" decPlaces="0" scaleFactor="10" advTextOffset="0">65391</value>
 </eta>"""
+
+    def text(self):
         future = asyncio.Future()
-        future.set_result(value_text)
+        future.set_result(self.value_text)
         return future
 
 
@@ -44,47 +73,47 @@ def mock_get_request_menu(*args, **kwargs):
 
 @pytest.mark.asyncio
 async def test_get_request(monkeypatch):
-    monkeypatch.setattr(EtaAPI, "get_request", mock_get_request)
+    monkeypatch.setattr(EtaAPI, "_get_request", mock_get_request)
     eta = EtaAPI("session", "host", "port")
 
-    resp = await eta.get_request("")
+    resp = await eta._get_request("")
     assert resp.status == 200
 
 
 @pytest.mark.asyncio
 async def test_get_data(monkeypatch):
-    monkeypatch.setattr(EtaAPI, "get_request", mock_get_request)
+    monkeypatch.setattr(EtaAPI, "_get_request", mock_get_request)
     eta = EtaAPI("session", "host", "port")
+    sensor = EtaSensorDesc("/40/10211/0/0/12015", "Vorrat", None)
+    sensor.updateUnit("kg")
 
-    value, unit = await eta.get_data("blub")
+    value = await eta.get_data(sensor)
     assert value == 6539
-    assert unit == "kg"
 
 
 @pytest.mark.asyncio
-async def test_get_raw_sensor_dict(monkeypatch):
-    monkeypatch.setattr(EtaAPI, "get_request", mock_get_request_menu)
-    eta = EtaAPI("session", "host", "port")
+async def test_get_raw_sensor_dict(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
 
-    value = await eta.get_raw_sensor_dict()
+    value = (await eta.get_sensors()).nameDict()
     assert type(value) == list  # even if it is called dict it is a list
 
 
 @pytest.mark.asyncio
-async def test_get_menu(monkeypatch):
-    monkeypatch.setattr(EtaAPI, "get_request", mock_get_request_menu)
-    eta = EtaAPI("session", "host", "port")
+async def test_get_menu(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
 
-    value = await eta.get_sensors_dict()
+    value = (await eta.get_sensors()).sensors
     assert type(value) == dict
 
 
 def test_get_all_childs():
-    eta = EtaAPI("session", "host", "port")
-    uri_dict = {}
-    eta._evaluate_xml_dict(xmltodict.parse(menu_txt)["eta"]["menu"]["fub"], uri_dict)
+    parser = EtaMenuParser()
+    parser.feed(menu_txt.encode("utf-8"))
+    uri_dict = parser.finish().sensors
     assert type(uri_dict) == dict
-    assert len(uri_dict) == 123
+    # one entry per unique uri of the menu
+    assert len(uri_dict) == 127
 
 
 def test_build_uri():
@@ -93,15 +122,634 @@ def test_build_uri():
 
 
 @pytest.mark.asyncio
-async def test_get_float_sensors(monkeypatch):
-    def mock_sensors_dict(*args, **kwargs):
-        future = asyncio.Future()
-        future.set_result({"sensor_xy": "test_uri"})
-        return future
+async def test_dedicated_session():
+    eta = EtaAPIFactory.acquire("entry", "dedicated", 8080)
+    session = eta._client()
+    assert eta._client() is session
+    assert session.connector.limit_per_host == 2
+    assert eta._url("/user/menu") is eta._url("/user/menu")
+
+    await EtaAPIFactory.release("entry", "dedicated", 8080)
+    assert session.closed
+    assert not EtaAPIFactory._instances
+
+
+@pytest.mark.asyncio
+async def test_factory_reference_counting(eta_session):
+    eta = EtaAPIFactory.acquire("entry", "Host", 8080, eta_session)
+    assert EtaAPIFactory.acquire("flow", "host", "8080") is eta
+    other = EtaAPIFactory.acquire("entry2", "other", 8080, MockEtaSession())
+    assert other is not eta
+
+    await EtaAPIFactory.release("entry", "host", 8080)
+    assert ("host", "8080") in EtaAPIFactory._instances
+    await EtaAPIFactory.release("flow", "host", 8080)
+    assert list(EtaAPIFactory._instances) == [("other", "8080")]
+    await EtaAPIFactory.release("entry2", "other", 8080)
+
+
+@pytest.mark.asyncio
+async def test_memory_flat_across_reloads(eta_session):
+    async def reload():
+        eta = EtaAPIFactory.acquire("entry", "host", 8080, eta_session)
+        sensors = await _selected_sensors(eta)
+        await eta.initializeSensors(sensors)
+        await eta.get_all_data(sensors, "ha")
+        await EtaAPIFactory.release("entry", "host", 8080)
+        return weakref.ref(eta)
+
+    await reload()
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    refs = [await reload() for _ in range(20)]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert not [ref for ref in refs if ref() is not None]
+    assert not EtaAPIFactory._instances
+    # a single menu tree alone takes several 100 KiB
+    assert current - baseline < 64 * 1024
+
 
-    monkeypatch.setattr(EtaAPI, "get_request", mock_get_request)
-    monkeypatch.setattr(EtaAPI, "get_sensors_dict", mock_sensors_dict)
+@pytest.mark.asyncio
+async def test_forced_menu_refresh(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    await eta.get_sensors()
+    eta_session.menu = eta_session.menu.replace('name="Vorrat"', 'name="Lagerstand"')
+    assert "Lagerstand" not in str((await eta.get_sensors()).nameDict())
+    assert "Lagerstand" in str((await eta.get_sensors(refresh=True)).nameDict())
+
+
+@pytest.mark.asyncio
+async def test_get_float_sensors(monkeypatch):
+    monkeypatch.setattr(EtaAPI, "_get_request", mock_get_request)
     eta = EtaAPI("session", "host", "port")
+    sensor = EtaSensorDesc("test_uri", "sensor_xy", None)
+    sensor.updateUnit("kg")
+
+    float_dict = await eta.get_all_data([sensor])
+    assert float_dict == {"test_uri": 6539.0}
+
+
+SELECTED = ["/40/10211/0/0/12015", "/40/10211/0/0/12042"]
+
+
+async def _selected_sensors(eta):
+    sensors_dict = await eta.get_sensors()
+    return [sensors_dict.byId(uri) for uri in SELECTED]
+
+
+@pytest.mark.asyncio
+async def test_get_all_data_varset(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors = await _selected_sensors(eta)
+    await eta.initializeSensors(sensors)
+    eta_session.values[SELECTED[0]] = 654
+
+    values = await eta.get_all_data(sensors, "ha")
+    assert values == {SELECTED[0]: 65.4, SELECTED[1]: 21.5}
+    assert eta_session.varsets["ha"] == SELECTED
+
+    eta_session.requests.clear()
+    await eta.get_all_data(sensors, "ha")
+    assert eta_session.requests == ["/user/vars/ha"]
+
+
+@pytest.mark.asyncio
+async def test_get_all_data_varset_recreated(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors = await _selected_sensors(eta)
+    await eta.get_all_data(sensors, "ha")
+
+    # controller reboot drops all variable sets
+    eta_session.varsets.clear()
+    values = await eta.get_all_data(sensors, "ha")
+    assert len(values) == 2
+    assert eta_session.varsets["ha"] == SELECTED
+
+
+@pytest.mark.asyncio
+async def test_get_all_data_varset_fallback(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors = await _selected_sensors(eta)
+    eta_session.varsets_supported = False
+
+    values = await eta.get_all_data(sensors, "ha")
+    assert len(values) == 2
+
+    eta_session.requests.clear()
+    eta._values.clear()
+    await eta.get_all_data(sensors, "ha")
+    assert eta_session.requests == ["/user/var" + uri for uri in SELECTED]
+
+
+@pytest.mark.asyncio
+async def test_varset_kept_after_server_errors(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors = await _selected_sensors(eta)
+    await eta.get_all_data(sensors, "ha")
+
+    # reading and recreating the set fail: this poll reads one by one
+    eta_session.busy = 2
+    eta._values.clear()
+    assert len(await eta.get_all_data(sensors, "ha")) == 2
+
+    eta_session.requests.clear()
+    eta._values.clear()
+    assert len(await eta.get_all_data(sensors, "ha")) == 2
+    assert "/user/vars/ha" in eta_session.requests
+    assert not [r for r in eta_session.requests if r.startswith("/user/var/")]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_limits_in_flight():
+    scheduler = EtaRequestScheduler(max_in_flight=2)
+    running = 0
+    peak = 0
+
+    async def request():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return True
+
+    results = await asyncio.gather(*(scheduler.run(request) for _ in range(6)))
+    assert all(results)
+    assert peak == 2
+    assert scheduler.metrics["requests"] == 6
+    assert scheduler.metrics["max_queue_depth"] == 4
+    assert scheduler.queue_depth == 0
+
+
+@pytest.mark.asyncio
+async def test_scheduler_serves_interactive_first():
+    scheduler = EtaRequestScheduler(max_in_flight=1)
+    order = []
+    gate = asyncio.Event()
+
+    def request(name):
+        async def run():
+            await gate.wait()
+            order.append(name)
+        return run
+
+    tasks = [asyncio.create_task(scheduler.run(request("first")))]
+    await asyncio.sleep(0)
+    tasks.append(asyncio.create_task(scheduler.run(request("poll"), RequestPriority.BACKGROUND)))
+    tasks.append(asyncio.create_task(scheduler.run(request("flow"), RequestPriority.INTERACTIVE)))
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*tasks)
+    assert order == ["first", "flow", "poll"]
+
+
+@pytest.mark.asyncio
+async def test_scheduler_timeout():
+    scheduler = EtaRequestScheduler(max_in_flight=1, timeout=0.01)
+
+    async def request():
+        await asyncio.sleep(1)
+
+    with pytest.raises(TimeoutError):
+        await scheduler.run(request)
+    assert scheduler.metrics["timeouts"] == 1
+    assert scheduler.metrics["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cache_round_trip(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors = await _selected_sensors(eta)
+    await eta.initializeSensors(sensors)
+    cache = eta.export_cache()
+
+    restored = EtaAPI(eta_session, "host", 8080)
+    restored.import_cache(cache)
+    eta_session.requests.clear()
+    sensors_dict = await restored.get_sensors()
+    assert eta_session.requests == []
+    assert sensors_dict.nameDict() == (await eta.get_sensors()).nameDict()
+    sensor = sensors_dict.byId(SELECTED[0])
+    assert sensor.initialized
+    assert sensor.unit == "°C"
+    assert sensor.scale == (10, 1)
+
+    assert await restored.revalidate() is None
+    eta_session.menu = eta_session.menu.replace('name="Vorrat"', 'name="Lagerstand"')
+    diff = await restored.revalidate()
+    assert diff.renamed == [SELECTED[0]]
+    # varinfo of the renamed sensor is kept
+    assert (await restored.get_sensors()).byId(SELECTED[0]).initialized
+
+
+@pytest.mark.asyncio
+async def test_initialize_sensors_deduplicates(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors = await _selected_sensors(eta)
+
+    results = await asyncio.gather(
+        eta.initializeSensor(sensors[0]), eta.initializeSensors(sensors)
+    )
+    assert results[0] is True
+    assert results[1]["requested"] == 2
+    assert results[1]["failed"] == 0
+    varinfo = [r for r in eta_session.requests if r.startswith("/user/varinfo")]
+    assert sorted(varinfo) == ["/user/varinfo" + uri for uri in SELECTED]
+
+    summary = await eta.initializeSensors(sensors)
+    assert summary["requested"] == 0
+
+
+def test_decode_value():
+    value = decode_value(TestResponse.value_text)
+    assert value.uri == "/user/var//40/10211/0/0/12015"
+    assert value.unit == "kg"
+    assert value.scale_factor == "10"
+    assert value.dec_places == "0"
+    assert value.str_value == "6539"
+    assert value.raw == "65391"
+
+    value = decode_value('<eta><value unit="&#176;C" strValue="a &amp; b" uri="/1">5</value></eta>')
+    assert value.unit == "°C"
+    assert value.str_value == "a & b"
+    assert value.scale_factor == ""
+
+    with pytest.raises(ValueError):
+        decode_value("<eta><error>Not found</error></eta>")
+
+
+@pytest.mark.asyncio
+async def test_sensor_dict_labels(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors_dict = await eta.get_sensors()
+
+    label = "Kessel > Eingänge > Wassermangel > Eingang"
+    assert sensors_dict.byName(label).id == "/40/10021/0/11031/2017"
+    assert {"value": "/40/10021/0/11031/2016", "label": label} in sensors_dict.nameDict()
+    assert len(sensors_dict.names()) < len(sensors_dict.nameDict())
+
+    sensor = sensors_dict.byId("/40/10211/0/0/12042")
+    assert sensor.canonicalName() == "Lager > Vorrat > Vorrat Warngrenze"
+    assert not hasattr(sensor, "__dict__")
+
+
+@pytest.mark.asyncio
+async def test_sensor_index_search(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors_dict = await eta.get_sensors()
+    index = sensors_dict.index()
+    assert sensors_dict.index() is index
+
+    options, total = index.search()
+    assert total == len(sensors_dict.sensors)
+
+    # prefix match on path segments and words, all terms must match
+    options, total = index.search("kess eing wasser")
+    assert total == 5
+    assert options[0] == {"value": "/40/10021/0/11031/0", "label": "Kessel > Eingänge > Wassermangel"}
+    # substring fallback
+    _, total = index.search("mangel")
+    assert total == 5
+
+    options, total = index.search("lager", offset=2, limit=3)
+    assert len(options) == 3
+    assert total > 5
+    assert options == index.search("lager")[0][2:5]
+
+    # type facet only covers sensors with known varinfo, loaded for the matches first
+    assert index.search("vorrat", SensorType.NUMERIC)[1] == 0
+    matching = index.matching("vorrat")
+    assert [sensor.id for sensor in matching] == [option["value"] for option in index.search("vorrat")[0]]
+    await eta.initializeSensors(matching)
+    assert sensors_dict.index().search("vorrat", SensorType.NUMERIC)[1] == len(matching) == 2
+    assert index.search("vorrat", SensorType.TEXT)[1] == 0
+
+
+def test_circuit_breaker_backoff():
+    now = [0.0]
+    breaker = EtaCircuitBreaker(threshold=2, backoff_min=10, backoff_max=30, clock=lambda: now[0])
+    assert breaker.acquire() is False
+    breaker.failure()
+    assert breaker.state is CircuitState.CLOSED
+    breaker.failure()
+    assert breaker.state is CircuitState.OPEN
+    with pytest.raises(EtaUnavailableError):
+        breaker.acquire()
+
+    # one probe after the jittered backoff, concurrent requests stay blocked
+    now[0] = 10
+    assert breaker.acquire() is True
+    with pytest.raises(EtaUnavailableError):
+        breaker.acquire()
+    breaker.failure()
+    assert 5 <= breaker.metrics["retry_in"] <= 20
+
+    now[0] = 30
+    assert breaker.acquire() is True
+    breaker.failure()
+    assert breaker.metrics["retry_in"] <= 30
+
+    now[0] = 60
+    assert breaker.acquire() is True
+    breaker.success()
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.metrics["circuit_trips"] == 1
+
+
+@pytest.mark.asyncio
+async def test_offline_unit_short_circuits(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors = await _selected_sensors(eta)
+    eta_session.fail = True
+    eta_session.attempts = 0
+
+    for _ in range(5):
+        with pytest.raises((ConnectionError, EtaUnavailableError)):
+            await eta.get_all_data(sensors, "ha")
+    assert eta_session.attempts == 3
+    assert not eta.available
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reads_coalesced(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors = await _selected_sensors(eta)
+    await eta.initializeSensors(sensors)
+    eta_session.requests.clear()
+
+    values = await asyncio.gather(*(eta.get_data(sensors[0]) for _ in range(3)))
+    assert values == [21.5] * 3
+    assert eta_session.requests == ["/user/var" + SELECTED[0]]
+    assert eta.request_metrics["coalesced_requests"] == 2
+
+    # served from the value cache until it expires
+    eta_session.values[SELECTED[0]] = 654
+    assert await eta.get_data(sensors[0]) == 21.5
+    assert eta.request_metrics["value_cache_hits"] == 1
+    eta._values.clear()
+    assert await eta.get_data(sensors[0]) == 65.4
+    assert len(eta_session.requests) == 2
+
+
+def test_request_stats_percentiles():
+    stats = EtaRequestStats(samples=100)
+    for ms in range(1, 101):
+        stats.record("get", f"/user/var/40/{ms}", ms / 1000, failed=ms > 90)
+    stats.record("put", "/user/vars/ha", 0.5, failed=False)
+
+    var = stats.endpoints["GET /user/var"]
+    assert var["requests"] == 100
+    assert var["errors"] == 10
+    assert var["latency_p50"] == 0.05
+    assert var["latency_p95"] == 0.095
+    assert var["latency_max"] == 0.1
+    assert stats.endpoints["PUT /user/vars"]["requests"] == 1
+    assert stats.totals == {"request_errors": 10, "error_rate": 10 / 101}
+    assert list(stats.slowest(2)) == ["/user/vars/ha", "/user/var/40/100"]
+
+
+@pytest.mark.asyncio
+async def test_requests_recorded(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors = await _selected_sensors(eta)
+    await eta.get_all_data(sensors, "ha")
+
+    endpoints = eta.request_stats.endpoints
+    assert endpoints["GET /user/menu"]["requests"] == 1
+    assert endpoints["GET /user/vars"]["requests"] == 1
+    assert endpoints["PUT /user/vars"]["requests"] == len(sensors) + 1
+    assert eta.request_metrics["request_errors"] == 0
+
+    eta_session.fail = True
+    eta._values.clear()
+    with pytest.raises(ConnectionError):
+        await eta.get_data(sensors[0])
+    assert eta.request_stats.endpoints["GET /user/var"]["errors"] == 1
+
+
+async def _writable_sensor(eta, eta_session):
+    eta_session.writable[SELECTED[1]] = (50, 300)
+    eta._writes._delay = 0.01
+    sensors = await _selected_sensors(eta)
+    await eta.initializeSensors(sensors)
+    eta_session.requests.clear()
+    return sensors[1]
+
+
+@pytest.mark.asyncio
+async def test_write_value_read_back(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensor = await _writable_sensor(eta, eta_session)
+    assert sensor.write_info == EtaWriteInfo(10, 1, 5.0, 30.0)
+    assert not (await _selected_sensors(eta))[0].writable
+
+    assert await eta.write_value(sensor, 22.5) == 22.5
+    assert eta_session.requests == ["POST /user/var" + SELECTED[1] + " 225", "/user/var" + SELECTED[1]]
+    # the value read back is served from the cache
+    assert await eta.get_data(sensor) == 22.5
+    assert eta.request_stats.endpoints["POST /user/var"]["requests"] == 1
+
+    with pytest.raises(ValueError):
+        await eta.write_value(sensor, 35)
+    eta_session.ignore_writes = True
+    with pytest.raises(EtaWriteError):
+        await eta.write_value(sensor, 20)
+
+
+@pytest.mark.asyncio
+async def test_writes_coalesced(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensor = await _writable_sensor(eta, eta_session)
+
+    # a slider dragged over three values ends in one write
+    results = await asyncio.gather(*(eta.write_value(sensor, value) for value in (21, 22, 23)))
+    assert results == [23.0] * 3
+    assert [r for r in eta_session.requests if r.startswith("POST")] == ["POST /user/var" + SELECTED[1] + " 230"]
+    assert eta.request_metrics["coalesced_writes"] == 2
+
+
+@pytest.mark.asyncio
+async def test_write_in_flight_cancelled_on_close():
+    sending = asyncio.Event()
+
+    async def send(sensor, raw):
+        sending.set()
+        await asyncio.sleep(10)
+
+    queue = EtaWriteQueue(send, delay=0)
+    write = asyncio.ensure_future(queue.write(EtaSensorDesc(SELECTED[1], "Soll", None), "225"))
+    await sending.wait()
+    queue.close()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(write, 1)
+
+
+@pytest.mark.asyncio
+async def test_write_info_cached(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    await _writable_sensor(eta, eta_session)
+
+    restored = EtaAPI(eta_session, "host", 8080)
+    restored.import_cache(eta.export_cache())
+    assert (await restored.get_sensors()).byId(SELECTED[1]).write_info == EtaWriteInfo(10, 1, 5.0, 30.0)
+
+
+def test_encode_value():
+    sensor = EtaSensorDesc("/40/10021/0/0/19402", "Kessel", None)
+    sensor.updateStates({"4000": "Aus", "4001": "Ein"})
+    with pytest.raises(ValueError):
+        sensor.encodeValue("Ein")
+    sensor.updateWritable(EtaWriteInfo(1, 0))
+    assert sensor.encodeValue("Ein") == "4001"
+    with pytest.raises(ValueError):
+        sensor.encodeValue("Heizen")
+
+    sensor = EtaSensorDesc("/40/10211/0/0/12042", "Soll", None)
+    sensor.updateUnit("°C")
+    sensor.updateWritable(EtaWriteInfo(10, 1))
+    assert sensor.encodeValue(21.46) == "215"
+
+
+def _parse(menu: str):
+    parser = EtaMenuParser()
+    parser.feed(menu.encode("utf-8"))
+    return parser.finish()
+
+
+def test_diff_menus():
+    menu = (Path(__file__).parent / "res" / "menu.xml").read_text()
+    old = _parse(menu)
+    removed = old.byId(SELECTED[1])
+    changed = menu.replace('name="Vorrat"', 'name="Lagerstand"').replace(
+        f'uri="{SELECTED[1]}"', 'uri="/40/10211/0/0/99999"'
+    )
+    diff = diff_menus(old, _parse(changed))
+
+    assert diff.renamed == [SELECTED[0]]
+    assert SELECTED[1] in diff.removed
+    assert "/40/10211/0/0/99999" in diff.added
+    assert len(diff.removed) == len(diff.added) == 1 + len(
+        [s for s in old.sensors.values() if s.parent is removed]
+    )
+    assert diff_menus(old, _parse(menu)) == ([], [], [])
+
+
+def test_decode_errors():
+    text = """<eta version="1.0" xmlns="http://www.eta.co.at/rest/v1">
+<errors uri="/user/errors">
+<fub uri="/112/10021" name="Kessel">
+<error msg="Abgasfühler unterbrochen" priority="Error" time="2011-06-29 12:47:50">Fühler oder Kabel defekt</error>
+</fub>
+<fub uri="/112/10101" name="HK1"/>
+</errors>
+</eta>"""
+    fubs, errors = decode_errors(text)
+    assert fubs == {"/112/10021": "Kessel", "/112/10101": "HK1"}
+    assert errors[0].fub_name == "Kessel"
+    assert errors[0].msg == "Abgasfühler unterbrochen"
+    assert errors[0].text == "Fühler oder Kabel defekt"
+    assert errors[0].key == decode_errors(text)[1][0].key
+
+
+@pytest.mark.asyncio
+async def test_error_feed_delta(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    feed = EtaErrorFeed()
+    assert await eta.poll_errors(feed) is None
+    assert feed.fubs == {"/112/10021": "Kessel", "/112/10101": "HK1"}
+
+    eta_session.errors.append(("/112/10021", "Zündung fehlgeschlagen", "Error", "2024-01-01 06:00:00"))
+    diff = await eta.poll_errors(feed)
+    assert [error.msg for error in diff.raised] == ["Zündung fehlgeschlagen"]
+    assert diff.cleared == []
+
+    # an unchanged list is not decoded again
+    with patch("custom_components.eta.api.decode_errors") as decode:
+        assert await eta.poll_errors(feed) is None
+        decode.assert_not_called()
+
+    # each feed diffs on its own
+    other = EtaErrorFeed()
+    assert len((await eta.poll_errors(other)).raised) == 1
+
+    eta_session.errors.clear()
+    diff = await eta.poll_errors(feed)
+    assert diff.raised == []
+    assert [error.fub for error in diff.cleared] == ["/112/10021"]
+    assert feed.errors == {}
+
+
+def test_batch_decoder_matches_get_value():
+    sensors = []
+    for i in range(4):
+        sensor = EtaSensorDesc(f"/40/10021/0/0/{i}", "Sensor", None)
+        sensor.updateUnit("kg")
+        sensor.updateScale(10, 0)
+        sensor.markInitialized()
+        sensors.append(sensor)
+    text = EtaSensorDesc("/40/10021/0/0/19402", "Kessel", None)
+    text.updateStates({"4011": "Heizen"})
+    text.markInitialized()
+    # numeric without varinfo scale, e.g. from an old cache
+    legacy = EtaSensorDesc("/40/10021/0/0/99", "Alt", None)
+    legacy.updateUnit("°C")
+    sensors += [text, legacy]
+    values = {
+        **{s.id: EtaValue(s.id, "", "kg", "10", "0", str(6539 + i)) for i, s in enumerate(sensors[:4])},
+        text.id: EtaValue(text.id, "Heizen", "", "1", "0", "4011"),
+        legacy.id: EtaValue(legacy.id, "21,5", "°C", "10", "1", "215"),
+    }
+    decoder = EtaValueDecoder(sensors)
+    expected = {s.id: s.getValue(values[s.id]) for s in sensors}
+    assert decoder.decode(values) == expected
+    assert expected[sensors[0].id] == 654.0
+
+    # a missing value, another unit and a broken raw value fall back to one by one
+    del values[sensors[1].id]
+    values[sensors[2].id] = EtaValue(sensors[2].id, "6,5 t", "t", "10", "0", "65")
+    values[sensors[3].id] = EtaValue(sensors[3].id, "-", "kg", "10", "0", "-")
+    decoded = decoder.decode(values)
+    assert sensors[1].id not in decoded
+    assert decoded[sensors[2].id] == "6,5 t"
+    assert sensors[3].id not in decoded
+    assert decoded[sensors[0].id] == 654.0
+
+    assert decoder.matches(list(sensors))
+    assert not decoder.matches(sensors[:-1])
+    legacy.markInitialized()
+    assert not decoder.matches(sensors)
+
+
+@pytest.mark.asyncio
+async def test_varset_decoder_reused(eta_session):
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors = await _selected_sensors(eta)
+    await eta.initializeSensors(sensors)
+    first = await eta.get_all_data(sensors, "ha")
+    decoder = eta._decoders["ha"]
+    eta_session.values[SELECTED[0]] = 654
+    eta._values.clear()
+    assert await eta.get_all_data(list(sensors), "ha") == {**first, SELECTED[0]: 65.4}
+    assert eta._decoders["ha"] is decoder
+
+
+# the optimized paths must match the reference implementations the benchmarks time them against
+@pytest.mark.parametrize("menu", list(MENUS))
+def test_streaming_parser_matches_xmltodict(menu):
+    assert streaming_parse(chunked(MENUS[menu])).nameDict() == legacy_parse(MENUS[menu]).nameDict()
+
+
+def test_representations_hold_the_same_tree():
+    menu = MENUS["synthetic-10k"]
+    assert build(menu, EtaSensorDesc, SensorDict)._sensors.keys() == build(menu, LegacySensorDesc, LegacySensorDict)._sensors.keys()
+
 
-    float_dict = await eta.get_float_sensors()
-    assert float_dict == {"sensor_xy": ("test_uri", 6539.0, "kg")}
+def test_compiled_decoder_matches_xmltodict():
+    assert decode_value(VALUE) == legacy_decode_value(VALUE)
+    for size in (1, 10, 500):
+        text = varset(size)
+        assert list(decode_values(text)) == legacy_decode_values(text)
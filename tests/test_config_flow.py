@@ -1,177 +1,212 @@
-"""Test integration_blueprint config flow."""
-from unittest.mock import patch, AsyncMock
+"""Test the ETA config and options flows."""
+from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 from homeassistant import config_entries, data_entry_flow
-from homeassistant.const import CONF_HOST, CONF_PORT
+from homeassistant.const import CONF_HOST
+from homeassistant.helpers import entity_registry as er
 from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.eta.api import EtaAPIFactory
 from custom_components.eta.const import (
-    DOMAIN, CHOOSEN_ENTITIES, FLOAT_DICT
+    CHOOSEN_ENTITIES,
+    CONF_DEADBANDS,
+    CONF_PAGE,
+    CONF_POLL_INTERVALS,
+    CONF_PROGRAMS,
+    CONF_SEARCH,
+    CONF_SENSOR_TYPE,
+    DOMAIN,
 )
-from .const import MOCK_CONFIG, FLOAT_DICT_CONFIG
+from .const import MOCK_CONFIG
+
+VORRAT = "/40/10211/0/0/12015"
+WARNGRENZE = "/40/10211/0/0/12042"
+HEATING_TIMES = "/120/10101/12113/0/0"
+ETA_PC_MENU = Path(__file__).parents[1] / "eta-pc.xml"
 
 
 # This fixture bypasses the actual setup of the integration
 # since we only want to test the config flow. We test the
 # actual functionality of the integration in other test modules.
 @pytest.fixture(autouse=True)
-def bypass_setup_fixture():
-    """Prevent setup."""
-    with patch("custom_components.eta.async_setup", return_value=True, ), patch(
-            "custom_components.eta.async_setup_entry",
-            return_value=True,
-    ), patch(
-        "custom_components.eta.config_flow.EtaFlowHandler._get_possible_endpoints",
-        return_value=FLOAT_DICT_CONFIG):
+def bypass_setup_fixture(eta_session):
+    """Prevent setup and talk to the mock unit."""
+    EtaAPIFactory._instances.clear()
+    EtaAPIFactory._owners.clear()
+    with patch("custom_components.eta.async_setup_entry", return_value=True), patch(
+        "custom_components.eta.async_unload_entry", return_value=True
+    ), patch("custom_components.eta.api.create_client_session", return_value=eta_session):
         yield
 
 
-@pytest.fixture()
-def bypass_test_url_fixture():
-    with patch(
-            "custom_components.eta.config_flow.EtaFlowHandler._test_url",
-            return_value=True,
-    ):
-        yield
+def _options(result, key):
+    """Values offered by the selector of ``key`` in the form of ``result``."""
+    for marker, value in result["data_schema"].schema.items():
+        if marker == key:
+            return [option["value"] for option in value.config["options"]]
+    raise KeyError(key)
 
 
-@pytest.fixture()
-def throw_error_test_url_fixture():
-    with patch(
-        "custom_components.eta.config_flow.EtaFlowHandler._test_url",
-        return_value=False,
-    ):
-        yield
-# Here we simiulate a successful config flow from the backend.
-# Note that we use the `bypass_get_data` fixture here because
-# we want the config flow validation to succeed during the test.
+def _filter(search="", sensor_type="all", page=1, **user_input):
+    return {CONF_SEARCH: search, CONF_SENSOR_TYPE: sensor_type, CONF_PAGE: page, **user_input}
 
 
 @pytest.mark.asyncio
-async def test_successful_config_flow(hass, bypass_test_url_fixture):
-    """Test a successful config flow."""
-    # Initialize a config flow
+async def test_config_flow_filter_then_save(hass, hass_storage):
+    """Test a changed filter shows the matches, an unchanged one creates the entry."""
     result = await hass.config_entries.flow.async_init(
         DOMAIN, context={"source": config_entries.SOURCE_USER}
     )
-
-    # Check that the config flow shows the user form as the first step
     assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
     assert result["step_id"] == "user"
 
-    # If a user were to enter `host` for host and `port`
-    # for port, it would result in this function call
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], user_input=MOCK_CONFIG)
+    assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
+    assert result["step_id"] == "select_sensors"
+
+    # the type filter loads the varinfo of the matches and caches it
     result = await hass.config_entries.flow.async_configure(
-        result["flow_id"], user_input=MOCK_CONFIG
+        result["flow_id"], user_input=_filter("vorrat", "numeric")
     )
-    # Check that the config flow shows the select_entities form as the second step
     assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
-    assert result["step_id"] == "select_entities"
+    assert result["errors"] == {}
+    assert _options(result, CHOOSEN_ENTITIES) == [VORRAT, WARNGRENZE]
+    assert "eta.host_8080" in hass_storage
 
     result = await hass.config_entries.flow.async_configure(
-        result["flow_id"], user_input={CHOOSEN_ENTITIES: ["sensor1", "sensor3"]}
+        result["flow_id"], user_input=_filter("vorrat", "numeric", **{CHOOSEN_ENTITIES: [VORRAT]})
     )
-    # Check that the config flow is complete and a new entry is created with
-    # the input data
     assert result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
-    assert result["title"] == "ETA at 192.168.178.68"
-    print(result["data"])
-    result_data_dict = MOCK_CONFIG
-    result_data_dict[FLOAT_DICT] = FLOAT_DICT_CONFIG
-    result_data_dict[CHOOSEN_ENTITIES] = ["sensor1", "sensor3"]
-
-    assert result["data"] == result_data_dict
-    assert result["result"]
+    assert result["title"] == "ETA Device (host)"
+    assert result["data"] == {**MOCK_CONFIG, CHOOSEN_ENTITIES: [VORRAT]}
+    await hass.async_block_till_done()
+    assert not EtaAPIFactory._owners
+    assert await hass.config_entries.async_unload(result["result"].entry_id)
 
 
-# In this case, we want to simulate a failure during the config flow.
 @pytest.mark.asyncio
-async def test_failed_config_flow(hass, throw_error_test_url_fixture):
-    """Test a failed config flow due to credential validation failure."""
+async def test_config_flow_too_many_to_filter(hass):
+    """Test the type filter is dropped when too many sensors match."""
     result = await hass.config_entries.flow.async_init(
         DOMAIN, context={"source": config_entries.SOURCE_USER}
     )
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], user_input=MOCK_CONFIG)
+    with patch("custom_components.eta.config_flow.SENSOR_TYPE_LOAD_LIMIT", 1):
+        result = await hass.config_entries.flow.async_configure(
+            result["flow_id"], user_input=_filter("vorrat", "numeric")
+        )
+    assert result["errors"] == {CONF_SEARCH: "too_many_to_filter"}
+    assert _options(result, CHOOSEN_ENTITIES) == [VORRAT, WARNGRENZE]
 
-    assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
-    assert result["step_id"] == "user"
 
+@pytest.mark.asyncio
+async def test_config_flow_search_narrowed_on_later_page(hass):
+    """Test a new search starts on its first page and pages beyond the matches show the last one."""
+    result = await hass.config_entries.flow.async_init(
+        DOMAIN, context={"source": config_entries.SOURCE_USER}
+    )
+    result = await hass.config_entries.flow.async_configure(result["flow_id"], user_input=MOCK_CONFIG)
+    with patch("custom_components.eta.config_flow.SENSOR_PAGE_SIZE", 1):
+        result = await hass.config_entries.flow.async_configure(result["flow_id"], user_input=_filter(page=3))
+        assert result["description_placeholders"]["page"] == "3"
+
+        result = await hass.config_entries.flow.async_configure(
+            result["flow_id"], user_input=_filter("vorrat", page=3)
+        )
+        assert result["description_placeholders"] == {"total": "2", "page": "1", "pages": "2"}
+        assert _options(result, CHOOSEN_ENTITIES) == [VORRAT]
+
+        result = await hass.config_entries.flow.async_configure(
+            result["flow_id"], user_input=_filter("vorrat", page=5)
+        )
+        assert result["description_placeholders"]["page"] == "2"
+        assert _options(result, CHOOSEN_ENTITIES) == [WARNGRENZE]
+
+    # the shown page is the current one, submitting it unchanged saves
     result = await hass.config_entries.flow.async_configure(
-        result["flow_id"], user_input={CONF_HOST: "host", CONF_PORT: "port"}
+        result["flow_id"], user_input=_filter("vorrat", page=2, **{CHOOSEN_ENTITIES: [WARNGRENZE]})
     )
+    assert result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
+    await hass.async_block_till_done()
+    assert await hass.config_entries.async_unload(result["result"].entry_id)
 
-    assert result["type"] == data_entry_flow.RESULT_TYPE_FORM
-    assert result["errors"] == {"base": "url_broken"}
+
+@pytest.mark.asyncio
+async def test_options_flow_search_narrowed_on_later_page(hass):
+    """Test the options flow starts a new search on its first page, too."""
+    config_entry = MockConfigEntry(domain=DOMAIN, data={**MOCK_CONFIG, CHOOSEN_ENTITIES: []})
+    config_entry.add_to_hass(hass)
+
+    result = await hass.config_entries.options.async_init(config_entry.entry_id)
+    with patch("custom_components.eta.config_flow.SENSOR_PAGE_SIZE", 1):
+        result = await hass.config_entries.options.async_configure(result["flow_id"], user_input=_filter(page=3))
+        result = await hass.config_entries.options.async_configure(
+            result["flow_id"], user_input=_filter("warngrenze", page=3)
+        )
+    assert result["step_id"] == "select_sensors"
+    assert result["description_placeholders"] == {"total": "1", "page": "1", "pages": "1"}
+    assert _options(result, CHOOSEN_ENTITIES) == [WARNGRENZE]
 
 
 @pytest.mark.asyncio
-async def test_options_flow_remove_sensor(bypass_test_url_fixture, hass):
-    """Test config flow options."""
-    m_instance = AsyncMock()
-    m_instance.getitem = AsyncMock()
-
-
-    config_entry = MockConfigEntry(
-        domain=DOMAIN,
-        unique_id="kodi_recently_added_media",
-        data={
-            CONF_HOST: "1.1.1.1",
-            CONF_PORT: "0",
-            FLOAT_DICT: FLOAT_DICT_CONFIG,
-            CHOOSEN_ENTITIES: ["sensor_old", "sensor_2"]
-        },
-    )
+async def test_options_flow_polling_deadbands_and_removal(hass, eta_session):
+    """Test the options flow saves intervals and deadbands and drops deselected entities."""
+    config_entry = MockConfigEntry(domain=DOMAIN, data={**MOCK_CONFIG, CHOOSEN_ENTITIES: [VORRAT, WARNGRENZE]})
     config_entry.add_to_hass(hass)
-    assert await hass.config_entries.async_setup(config_entry.entry_id)
-    await hass.async_block_till_done()
+    # the running entry has loaded the varinfo of its sensors
+    eta_api = EtaAPIFactory.acquire(config_entry.entry_id, "host", 8080)
+    await eta_api.initializeSensors([(await eta_api.get_sensors()).byId(uri) for uri in (VORRAT, WARNGRENZE)])
+
+    registry = er.async_get(hass)
+    kept = registry.async_get_or_create("sensor", DOMAIN, f"eta_host_8080_{VORRAT}", config_entry=config_entry)
+    dropped = registry.async_get_or_create("sensor", DOMAIN, f"eta_host_8080_{WARNGRENZE}", config_entry=config_entry)
+    calendar = registry.async_get_or_create(
+        "calendar", DOMAIN, f"eta_{config_entry.entry_id}_schedule_{HEATING_TIMES}", config_entry=config_entry
+    )
 
-    # show initial form
     result = await hass.config_entries.options.async_init(config_entry.entry_id)
-    # submit form with options
+    assert result["step_id"] == "select_sensors"
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], user_input=_filter(**{CHOOSEN_ENTITIES: [VORRAT]})
+    )
+    # the menu has no weekly programs, so the programs step is skipped
+    assert result["step_id"] == "polling"
+    assert list(result["data_schema"].schema) == ["Lager > Vorrat"]
     result = await hass.config_entries.options.async_configure(
-        result["flow_id"], user_input={CHOOSEN_ENTITIES: []}
+        result["flow_id"], user_input={"Lager > Vorrat": 120}
     )
-    assert "create_entry" == result["type"]
-    assert "" == result["title"]
-    assert result["result"] is True
-    assert {CHOOSEN_ENTITIES: [],
-            CONF_HOST: "1.1.1.1",
-            CONF_PORT: "0",
-            FLOAT_DICT: FLOAT_DICT_CONFIG} == result["data"]
+    assert result["step_id"] == "deadbands"
+    assert list(result["data_schema"].schema) == ["°C"]
+    result = await hass.config_entries.options.async_configure(result["flow_id"], user_input={"°C": 0.5})
 
+    assert result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
+    assert config_entry.data[CHOOSEN_ENTITIES] == [VORRAT]
+    assert config_entry.data[CONF_POLL_INTERVALS] == {VORRAT: 120}
+    assert config_entry.data[CONF_DEADBANDS] == {"°C": 0.5}
+    assert config_entry.data[CONF_HOST] == "host"
+    assert registry.async_get(kept.entity_id) is not None
+    assert registry.async_get(dropped.entity_id) is None
+    assert registry.async_get(calendar.entity_id) is None
 
 
 @pytest.mark.asyncio
-async def test_options_flow_add_repo(bypass_test_url_fixture, hass):
-    """Test config flow options."""
-    m_instance = AsyncMock()
-    m_instance.getitem = AsyncMock()
-
-    config_entry = MockConfigEntry(
-        domain=DOMAIN,
-        unique_id="kodi_recently_added_media",
-        data={
-            CONF_HOST: "1.1.1.1",
-            CONF_PORT: "0",
-            FLOAT_DICT: FLOAT_DICT_CONFIG,
-            CHOOSEN_ENTITIES: ["2", "sensor3"]
-        },
-    )
+async def test_options_flow_programs(hass, eta_session):
+    """Test weekly programs are offered and saved when the menu has some."""
+    eta_session.menu = ETA_PC_MENU.read_text()
+    config_entry = MockConfigEntry(domain=DOMAIN, data={**MOCK_CONFIG, CHOOSEN_ENTITIES: []})
     config_entry.add_to_hass(hass)
-    assert await hass.config_entries.async_setup(config_entry.entry_id)
-    await hass.async_block_till_done()
 
-    # show initial form
     result = await hass.config_entries.options.async_init(config_entry.entry_id)
-    # submit form with options
+    result = await hass.config_entries.options.async_configure(result["flow_id"], user_input=_filter())
+    assert result["step_id"] == "programs"
+    assert HEATING_TIMES in _options(result, CONF_PROGRAMS)
     result = await hass.config_entries.options.async_configure(
-        result["flow_id"],
-        user_input={CHOOSEN_ENTITIES: ["sensor3", "sensor1"]}
+        result["flow_id"], user_input={CONF_PROGRAMS: [HEATING_TIMES]}
     )
-    assert "create_entry" == result["type"]
-    assert "" == result["title"]
-    assert result["result"] is True
-    expected_data = {CHOOSEN_ENTITIES: ["sensor3", "sensor1"],
-     CONF_HOST: "1.1.1.1",
-     CONF_PORT: "0",
-     FLOAT_DICT: FLOAT_DICT_CONFIG}
-    assert expected_data == result["data"]
\ No newline at end of file
+    assert result["step_id"] == "polling"
+    result = await hass.config_entries.options.async_configure(result["flow_id"], user_input={})
+
+    assert result["type"] == data_entry_flow.RESULT_TYPE_CREATE_ENTRY
+    assert config_entry.data[CONF_PROGRAMS] == [HEATING_TIMES]
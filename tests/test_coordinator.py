@@ -0,0 +1,363 @@
+"""Test the ETA data update coordinator."""
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from homeassistant.const import CONF_HOST, CONF_PORT
+from homeassistant.core import callback
+from homeassistant.helpers import issue_registry as ir
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.helpers.update_coordinator import UpdateFailed
+from pytest_homeassistant_custom_component.common import MockConfigEntry, async_capture_events
+
+from custom_components.eta import options_update_listener
+from custom_components.eta.api import EtaAPI, EtaSensorDesc
+from custom_components.eta.const import (
+    ADAPTIVE_DEFAULT_LEVEL,
+    ADAPTIVE_MAX_LEVEL,
+    CHOOSEN_ENTITIES,
+    CONF_DEADBANDS,
+    CONF_POLL_INTERVALS,
+    CONF_PROGRAMS,
+    DOMAIN,
+    EVENT_ERROR_CLEARED,
+    EVENT_ERROR_RAISED,
+)
+from custom_components.eta.coordinator import (
+    AdaptivePollSchedule,
+    ChangeFilter,
+    EtaDataUpdateCoordinator,
+    EtaErrorCoordinator,
+    SIGNAL_POLLED,
+    entry_varsets,
+)
+
+SELECTED = ["/40/10211/0/0/12015", "/40/10211/0/0/12042"]
+
+
+@pytest.fixture
+def expected_lingering_timers() -> bool:
+    # the menu check timer ends with the config entry, which is never unloaded here
+    return True
+
+
+def _config_entry(hass, **data):
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={CONF_HOST: "host", CONF_PORT: 8080, CHOOSEN_ENTITIES: SELECTED, **data},
+    )
+    config_entry.add_to_hass(hass)
+    return config_entry
+
+
+@pytest.mark.asyncio
+async def test_one_pass_for_all_sensors(hass, eta_session):
+    eta_api = EtaAPI(eta_session, "host", 8080)
+    coordinator = EtaDataUpdateCoordinator(hass, _config_entry(hass), eta_api)
+    eta_session.values["/40/10211/0/0/12015"] = 654
+
+    await coordinator._async_setup()
+    await coordinator.async_refresh()
+
+    assert [s.id for s in coordinator.sensors] == SELECTED
+    assert coordinator.data == {"/40/10211/0/0/12015": 65.4, "/40/10211/0/0/12042": 21.5}
+    polls = [r for r in eta_session.requests if r.startswith(("/user/var/", "/user/vars/"))]
+    assert polls == [f"/user/vars/ha_{coordinator.config_entry.entry_id}_2"]
+    assert coordinator.poll_metrics["polls"] == 1
+    assert coordinator.poll_metrics["polled_sensors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_update_failed_when_unit_offline(hass, eta_session):
+    eta_api = EtaAPI(eta_session, "host", 8080)
+    coordinator = EtaDataUpdateCoordinator(hass, _config_entry(hass), eta_api)
+    await coordinator._async_setup()
+
+    eta_session.fail = True
+    with pytest.raises(UpdateFailed):
+        await coordinator._async_update_data()
+    assert coordinator.poll_metrics["poll_failures"] == 1
+
+
+def test_schedule_backs_off_stable_sensors():
+    schedule = AdaptivePollSchedule()
+    uri = SELECTED[0]
+    assert schedule.ticks(uri) == 2 ** ADAPTIVE_DEFAULT_LEVEL
+    for _ in range(ADAPTIVE_MAX_LEVEL + 3):
+        schedule.observe(uri, 21.5)
+    assert schedule.ticks(uri) == 2 ** ADAPTIVE_MAX_LEVEL
+
+    # small changes keep the interval, large ones poll at the base tick again
+    schedule.observe(uri, 21.6)
+    assert schedule.ticks(uri) == 2 ** ADAPTIVE_MAX_LEVEL
+    schedule.observe(uri, 40.0)
+    assert schedule.ticks(uri) == 1
+
+    schedule.observe("text", "Heizen")
+    schedule.observe("text", "Bereit")
+    assert schedule.ticks("text") == 2 ** (ADAPTIVE_DEFAULT_LEVEL - 1)
+
+
+def test_schedule_fixed_intervals():
+    schedule = AdaptivePollSchedule({SELECTED[1]: 4})
+    for _ in range(3):
+        schedule.observe(SELECTED[1], 1.0)
+    assert schedule.ticks(SELECTED[1]) == 4
+
+
+def test_change_filter_deadband():
+    temperature = EtaSensorDesc(SELECTED[0], "Temperature", None)
+    temperature.updateUnit("°C")
+    state = EtaSensorDesc(SELECTED[1], "State", None)
+    state.updateStates({"4011": "Heizen"})
+    change_filter = ChangeFilter({"°C": 0.5})
+    sensors = [temperature, state]
+
+    published = change_filter.changes(sensors, {}, {SELECTED[0]: 20.0, SELECTED[1]: "Aus"})
+    assert published == {SELECTED[0]: 20.0, SELECTED[1]: "Aus"}
+    assert change_filter.changes(sensors, published, {SELECTED[0]: 20.0, SELECTED[1]: "Aus"}) == {}
+    # small steps are held back until they add up against the published value
+    assert change_filter.changes(sensors, published, {SELECTED[0]: 20.3, SELECTED[1]: "Heizen"}) == {
+        SELECTED[1]: "Heizen"
+    }
+    assert change_filter.changes(sensors, published, {SELECTED[0]: 20.6}) == {SELECTED[0]: 20.6}
+
+    change_filter.update_deadbands({})
+    assert change_filter.changes(sensors, published, {SELECTED[0]: 20.1}) == {SELECTED[0]: 20.1}
+
+
+@pytest.mark.asyncio
+async def test_only_changed_values_notified(hass, eta_session):
+    eta_api = EtaAPI(eta_session, "host", 8080)
+    coordinator = EtaDataUpdateCoordinator(hass, _config_entry(hass, **{CONF_DEADBANDS: {"°C": 1.0}}), eta_api)
+    await coordinator._async_setup()
+    await coordinator.async_refresh()
+    assert coordinator.changed == set(SELECTED)
+
+    updates = []
+    polls = []
+    coordinator.async_add_listener(lambda: updates.append(set(coordinator.changed)))
+    # a plain function would run in the executor, after the assertions
+    async_dispatcher_connect(
+        hass, SIGNAL_POLLED.format(coordinator.config_entry.entry_id), callback(lambda: polls.append(1))
+    )
+    for _ in range(2):
+        eta_api._values.clear()
+        coordinator._tick = 0
+        await coordinator.async_refresh()
+    assert updates == []
+    # the statistics of the polls are still announced
+    assert len(polls) == 2
+
+    eta_session.values[SELECTED[0]] = 654
+    eta_api._values.clear()
+    coordinator._tick = 0
+    await coordinator.async_refresh()
+    assert updates == [{SELECTED[0]}]
+    assert coordinator.data[SELECTED[0]] == 65.4
+
+
+@pytest.mark.asyncio
+async def test_poll_only_due_sensors(hass, eta_session):
+    eta_api = EtaAPI(eta_session, "host", 8080)
+    entry = _config_entry(hass, **{CONF_POLL_INTERVALS: {SELECTED[1]: 120}})
+    coordinator = EtaDataUpdateCoordinator(hass, entry, eta_api)
+    await coordinator._async_setup()
+
+    # the first tick reads everything, the second only the adaptive sensor
+    await coordinator.async_refresh()
+    eta_session.requests.clear()
+    await coordinator.async_refresh()
+    await coordinator.async_refresh()
+
+    polls = [r for r in eta_session.requests if r.startswith("/user/vars/")]
+    assert polls == [f"/user/vars/ha_{entry.entry_id}_2"]
+    assert set(coordinator.data) == set(SELECTED)
+
+
+@pytest.mark.asyncio
+async def test_update_selection_without_reload(hass, eta_session):
+    eta_api = EtaAPI(eta_session, "host", 8080)
+    entry = _config_entry(hass)
+    coordinator = EtaDataUpdateCoordinator(hass, entry, eta_api)
+    await coordinator._async_setup()
+    await coordinator.async_refresh()
+    kept = coordinator.sensors[0]
+
+    added_uri = "/40/10021/0/0/10990"
+    eta_session.requests.clear()
+    hass.config_entries.async_update_entry(
+        entry, data={**entry.data, CHOOSEN_ENTITIES: [SELECTED[0], added_uri]}
+    )
+    added = await coordinator.async_update_selection()
+
+    assert [s.id for s in added] == [added_uri]
+    assert coordinator.sensors[0] is kept
+    assert set(coordinator.data) == {SELECTED[0], added_uri}
+    assert [r for r in eta_session.requests if r.startswith("/user/varinfo")] == ["/user/varinfo" + added_uri]
+
+
+@pytest.mark.asyncio
+async def test_options_update_applied_live(hass, eta_session):
+    entry = _config_entry(hass)
+    coordinator = EtaDataUpdateCoordinator(hass, entry, EtaAPI(eta_session, "host", 8080))
+    await coordinator._async_setup()
+    await coordinator.async_refresh()
+    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = {**entry.data, "coordinator": coordinator}
+
+    # the options flow always writes the programs, entries from the config flow lack them
+    hass.config_entries.async_update_entry(entry, data={**entry.data, CHOOSEN_ENTITIES: SELECTED[:1], CONF_PROGRAMS: []})
+    with patch.object(hass.config_entries, "async_reload") as reload:
+        await options_update_listener(hass, entry)
+    assert not reload.called
+    assert [sensor.id for sensor in coordinator.sensors] == SELECTED[:1]
+
+    hass.config_entries.async_update_entry(entry, data={**entry.data, CONF_PROGRAMS: ["/120/10101/12113/0/0"]})
+    with patch.object(hass.config_entries, "async_reload") as reload:
+        await options_update_listener(hass, entry)
+    assert reload.called
+
+
+@pytest.mark.asyncio
+async def test_removed_sensor_raises_issue(hass, eta_session):
+    eta_api = EtaAPI(eta_session, "host", 8080)
+    entry = _config_entry(hass)
+    coordinator = EtaDataUpdateCoordinator(hass, entry, eta_api)
+    await coordinator._async_setup()
+    await coordinator.async_refresh()
+
+    eta_session.menu = eta_session.menu.replace(f'uri="{SELECTED[1]}"', 'uri="/40/10211/0/0/99999"')
+    eta_session.requests.clear()
+    diff = await coordinator.async_check_menu()
+
+    assert SELECTED[1] in diff.removed
+    assert [s.id for s in coordinator.sensors] == [SELECTED[0]]
+    assert set(coordinator.data) == {SELECTED[0]}
+    assert ir.async_get(hass).async_get_issue(DOMAIN, f"removed_sensors_{entry.entry_id}")
+    # the remaining sensor keeps its varinfo
+    assert not [r for r in eta_session.requests if r.startswith("/user/varinfo")]
+
+    # a later, unrelated change keeps the issue while the sensor is still selected
+    issue_registry = ir.async_get(hass)
+    eta_session.menu = eta_session.menu.replace('name="Vorrat"', 'name="Lagerstand"')
+    assert await coordinator.async_check_menu()
+    issue = issue_registry.async_get_issue(DOMAIN, f"removed_sensors_{entry.entry_id}")
+    assert issue.translation_placeholders["sensors"] == SELECTED[1]
+
+
+@pytest.mark.asyncio
+async def test_menu_change_followed_by_every_entry_of_the_unit(hass, eta_session):
+    eta_api = EtaAPI(eta_session, "host", 8080)
+    first = EtaDataUpdateCoordinator(hass, _config_entry(hass), eta_api)
+    second_entry = _config_entry(hass)
+    second = EtaDataUpdateCoordinator(hass, second_entry, eta_api)
+    for coordinator in (first, second):
+        await coordinator._async_setup()
+        await coordinator.async_refresh()
+
+    eta_session.menu = eta_session.menu.replace(f'uri="{SELECTED[1]}"', 'uri="/40/10211/0/0/99999"')
+    assert SELECTED[1] in (await first.async_check_menu()).removed
+
+    # the shared API already has the new menu, the second entry diffs against its own
+    diff = await second.async_check_menu()
+    assert SELECTED[1] in diff.removed
+    assert [s.id for s in second.sensors] == [SELECTED[0]]
+    assert set(second.data) == {SELECTED[0]}
+    assert ir.async_get(hass).async_get_issue(DOMAIN, f"removed_sensors_{second_entry.entry_id}")
+
+    # polling alone follows a menu loaded through another entry, too
+    eta_session.menu = eta_session.menu.replace('uri="/40/10211/0/0/99999"', f'uri="{SELECTED[1]}"')
+    await first.async_check_menu()
+    eta_session.menu = eta_session.menu.replace(f'uri="{SELECTED[0]}"', 'uri="/40/10211/0/0/99998"')
+    await first.async_check_menu()
+    second._tick = 0
+    await second.async_refresh()
+    assert second.sensors == []
+    assert second.data == {}
+    assert SELECTED[0] in second.changed
+
+
+@pytest.mark.asyncio
+async def test_write_publishes_value_read_back(hass, eta_session):
+    eta_session.writable[SELECTED[1]] = (50, 300)
+    eta_api = EtaAPI(eta_session, "host", 8080)
+    eta_api._writes._delay = 0
+    coordinator = EtaDataUpdateCoordinator(hass, _config_entry(hass), eta_api)
+    await coordinator._async_setup()
+    await coordinator.async_refresh()
+
+    await coordinator.async_write(coordinator.sensors[1], 24)
+    assert coordinator.data[SELECTED[1]] == 24.0
+    assert coordinator.changed == {SELECTED[1]}
+
+
+@pytest.mark.asyncio
+async def test_error_events_on_change(hass, eta_session):
+    eta_session.errors.append(("/112/10021", "Kesseltür offen", "Warning", "2024-01-01 06:00:00"))
+    coordinator = EtaErrorCoordinator(hass, _config_entry(hass), EtaAPI(eta_session, "host", 8080))
+    raised = async_capture_events(hass, EVENT_ERROR_RAISED)
+    cleared = async_capture_events(hass, EVENT_ERROR_CLEARED)
+    updates = []
+    coordinator.async_add_listener(lambda: updates.append(dict(coordinator.data)))
+
+    # faults active at startup are state, not events
+    await coordinator.async_refresh()
+    assert len(coordinator.data) == 1
+    assert coordinator.fubs["/112/10021"] == "Kessel"
+
+    await coordinator.async_refresh()
+    eta_session.errors.append(("/112/10101", "Vorlauffühler defekt", "Error", "2024-01-01 07:00:00"))
+    await coordinator.async_refresh()
+    eta_session.errors.pop(0)
+    await coordinator.async_refresh()
+    await hass.async_block_till_done()
+
+    assert [event.data["msg"] for event in raised] == ["Vorlauffühler defekt"]
+    assert raised[0].data["fub_name"] == "HK1"
+    assert [event.data["msg"] for event in cleared] == ["Kesseltür offen"]
+    # the unchanged second read did not notify
+    assert len(updates) == 3
+
+
+@pytest.mark.asyncio
+async def test_gap_after_hour_without_read(hass, eta_session, freezer):
+    eta_api = EtaAPI(eta_session, "host", 8080)
+    coordinator = EtaDataUpdateCoordinator(hass, _config_entry(hass), eta_api)
+    await coordinator._async_setup()
+    freezer.move_to("2024-01-01 09:30:00+00:00")
+    await coordinator.async_refresh()
+    assert coordinator.gaps == {}
+
+    # within the same and the next hour: no whole hour missed
+    freezer.move_to("2024-01-01 10:20:00+00:00")
+    eta_api._values.clear()
+    coordinator._tick = 0
+    await coordinator.async_refresh()
+    assert coordinator.gaps == {}
+
+    freezer.tick(timedelta(hours=2))
+    eta_api._values.clear()
+    coordinator._tick = 0
+    await coordinator.async_refresh()
+    assert set(coordinator.gaps) == set(SELECTED)
+    assert coordinator.gaps[SELECTED[0]].hour == 10
+
+
+@pytest.mark.asyncio
+async def test_unused_varsets_deleted(hass, eta_session):
+    eta_api = EtaAPI(eta_session, "host", 8080)
+    entry = _config_entry(hass)
+    coordinator = EtaDataUpdateCoordinator(hass, entry, eta_api)
+    await coordinator._async_setup()
+    await coordinator.async_refresh()
+    assert list(eta_session.varsets) == [f"ha_{entry.entry_id}_2"]
+
+    coordinator.schedule.update_fixed({uri: 1 for uri in SELECTED})
+    coordinator._tick = 0
+    eta_api._values.clear()
+    await coordinator.async_refresh()
+    assert list(eta_session.varsets) == [f"ha_{entry.entry_id}_1"]
+
+    await coordinator.async_delete_varsets()
+    assert eta_session.varsets == {}
+    assert f"ha_{entry.entry_id}_1" in entry_varsets(entry)
@@ -0,0 +1,41 @@
+"""Test the ETA diagnostics."""
+import pytest
+from homeassistant.components.diagnostics import REDACTED
+from homeassistant.const import CONF_HOST, CONF_PORT
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.eta.api import EtaAPI
+from custom_components.eta.const import CHOOSEN_ENTITIES, DOMAIN
+from custom_components.eta.coordinator import EtaDataUpdateCoordinator
+from custom_components.eta.diagnostics import async_get_config_entry_diagnostics
+
+SELECTED = ["/40/10211/0/0/12015", "/40/10211/0/0/12042"]
+
+
+@pytest.fixture
+def expected_lingering_timers() -> bool:
+    # the menu check timer ends with the config entry, which is never unloaded here
+    return True
+
+
+@pytest.mark.asyncio
+async def test_entry_diagnostics(hass, eta_session):
+    config_entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="ETA Device (host)",
+        data={CONF_HOST: "host", CONF_PORT: 8080, CHOOSEN_ENTITIES: SELECTED},
+    )
+    config_entry.add_to_hass(hass)
+    coordinator = EtaDataUpdateCoordinator(hass, config_entry, EtaAPI(eta_session, "host", 8080))
+    await coordinator._async_setup()
+    await coordinator.async_refresh()
+    hass.data.setdefault(DOMAIN, {})[config_entry.entry_id] = {"coordinator": coordinator}
+
+    diagnostics = await async_get_config_entry_diagnostics(hass, config_entry)
+
+    assert diagnostics["entry"]["title"] == REDACTED
+    assert diagnostics["entry"]["data"][CONF_HOST] == REDACTED
+    assert diagnostics["sensors"] == {"selected": 2, "initialized": 2, "with_value": 2}
+    assert diagnostics["polling"]["polls"] == 1
+    assert diagnostics["requests"]["request_errors"] == 0
+    assert "GET /user/vars" in diagnostics["endpoints"]
@@ -0,0 +1,110 @@
+"""Test ETA setup and unload."""
+from unittest.mock import patch
+
+import pytest
+from homeassistant.const import CONF_HOST, CONF_PORT, CONF_NAME, CONF_MODEL, EVENT_HOMEASSISTANT_STOP
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.eta.api import EtaAPIFactory
+from custom_components.eta.const import DOMAIN, CHOOSEN_ENTITIES
+
+MOCK_ENTRY_DATA = {
+    CONF_HOST: "host",
+    CONF_PORT: 8080,
+    CONF_NAME: "ETA",
+    CONF_MODEL: "PU",
+    CHOOSEN_ENTITIES: ["/40/10211/0/0/12015", "/40/10021/0/0/10990"],
+}
+
+
+@pytest.mark.asyncio
+async def test_setup_and_unload_entry(hass, eta_session):
+    """Test entities are created from one coordinator and removed on unload."""
+    EtaAPIFactory._instances.clear()
+    EtaAPIFactory._owners.clear()
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_ENTRY_DATA)
+    config_entry.add_to_hass(hass)
+
+    with patch("custom_components.eta.api.create_client_session", return_value=eta_session):
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+
+    states = hass.states.async_all("sensor")
+    assert len(states) == 2
+    assert hass.states.get("sensor.eta_lager_vorrat").state == "21.5"
+    assert "coordinator" in hass.data[DOMAIN][config_entry.entry_id]
+
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+    assert config_entry.entry_id not in hass.data[DOMAIN]
+    assert eta_session.closed
+    assert not EtaAPIFactory._instances
+    assert not EtaAPIFactory._owners
+
+
+@pytest.mark.asyncio
+async def test_session_closed_on_stop(hass, eta_session):
+    """Test the dedicated session does not outlive Home Assistant."""
+    EtaAPIFactory._instances.clear()
+    EtaAPIFactory._owners.clear()
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_ENTRY_DATA)
+    config_entry.add_to_hass(hass)
+
+    with patch("custom_components.eta.api.create_client_session", return_value=eta_session):
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+
+    hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+    await hass.async_block_till_done()
+    assert eta_session.closed
+    assert not EtaAPIFactory._instances
+    assert await hass.config_entries.async_unload(config_entry.entry_id)
+
+
+@pytest.mark.asyncio
+async def test_setup_from_cached_metadata(hass, hass_storage, eta_session):
+    """Test a second start takes menu and varinfo from the store."""
+    EtaAPIFactory._instances.clear()
+    EtaAPIFactory._owners.clear()
+    config_entry = MockConfigEntry(domain=DOMAIN, data=MOCK_ENTRY_DATA)
+    config_entry.add_to_hass(hass)
+
+    with patch("custom_components.eta.api.create_client_session", return_value=eta_session):
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+        assert await hass.config_entries.async_unload(config_entry.entry_id)
+    assert "eta.host_8080" in hass_storage
+
+    # restart: no menu or varinfo requests before entities are set up
+    EtaAPIFactory._instances.clear()
+    EtaAPIFactory._owners.clear()
+    eta_session.requests.clear()
+    with patch("custom_components.eta.api.create_client_session", return_value=eta_session), patch(
+        "custom_components.eta.api.EtaAPI.revalidate", return_value=False
+    ) as revalidate:
+        assert await hass.config_entries.async_setup(config_entry.entry_id)
+        await hass.async_block_till_done()
+
+    assert not [r for r in eta_session.requests if r.startswith(("/user/menu", "/user/varinfo"))]
+    assert hass.states.get("sensor.eta_lager_vorrat").attributes["unit_of_measurement"] == "°C"
+    assert revalidate.called
+
+
+@pytest.mark.asyncio
+async def test_cache_kept_while_unit_in_use(hass, hass_storage, eta_session):
+    """Test the cache of a unit is only removed with its last entry."""
+    EtaAPIFactory._instances.clear()
+    EtaAPIFactory._owners.clear()
+    first = MockConfigEntry(domain=DOMAIN, data=MOCK_ENTRY_DATA)
+    first.add_to_hass(hass)
+    second = MockConfigEntry(domain=DOMAIN, data={**MOCK_ENTRY_DATA, CONF_HOST: " Host "})
+    second.add_to_hass(hass)
+    hass_storage["eta.host_8080"] = {"version": 1, "key": "eta.host_8080", "data": {}}
+
+    with patch("custom_components.eta.api.create_client_session", return_value=eta_session):
+        await hass.config_entries.async_remove(first.entry_id)
+        await hass.async_block_till_done()
+        assert "eta.host_8080" in hass_storage
+
+        await hass.config_entries.async_remove(second.entry_id)
+        await hass.async_block_till_done()
+    assert "eta.host_8080" not in hass_storage
@@ -0,0 +1,92 @@
+"""Test EtaAPI against the mock ETA controller over real connections."""
+import aiohttp
+import pytest
+
+from custom_components.eta.api import EtaAPI, EtaErrorFeed, EtaUnavailableError
+from custom_components.eta.const import CIRCUIT_FAILURE_THRESHOLD
+from mocketa.server import MockEtaConfig, MockEtaController
+
+# the mock listens on localhost
+pytestmark = pytest.mark.usefixtures("socket_enabled")
+
+
+@pytest.fixture
+async def controller(request):
+    controller = MockEtaController(getattr(request, "param", MockEtaConfig(nodes=300, seed=1)))
+    await controller.start()
+    yield controller
+    await controller.stop()
+
+
+@pytest.fixture
+async def eta(controller):
+    host, port = controller.url[len("http://"):].split(":")
+    eta = EtaAPI(None, host, int(port))
+    yield eta
+    await eta.close()
+
+
+@pytest.mark.asyncio
+async def test_synthetic_controller(controller, eta):
+    sensors_dict = await eta.get_sensors()
+    assert len(sensors_dict.sensors) == 300
+
+    sensors = list(sensors_dict.sensors.values())[:50]
+    summary = await eta.initializeSensors(sensors)
+    assert summary["failed"] == 0
+    values = await eta.get_all_data(sensors, "ha")
+    assert set(values) == {sensor.id for sensor in sensors}
+    assert controller.varsets["ha"] == [sensor.id for sensor in sensors]
+    assert controller.stats["varinfo"] == 50
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "controller", [MockEtaConfig(nodes=20, drop_rate=1.0)], indirect=True
+)
+async def test_dropped_connections_open_circuit(controller, eta):
+    # the client may retry a dropped GET, so the number reaching the mock varies
+    for _ in range(CIRCUIT_FAILURE_THRESHOLD):
+        with pytest.raises(aiohttp.ClientError):
+            await eta.get_sensors()
+    assert not eta.available
+    dropped = controller.stats["dropped"]
+    for _ in range(3):
+        with pytest.raises(EtaUnavailableError):
+            await eta.get_sensors()
+    assert controller.stats["dropped"] == dropped
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "controller", [MockEtaConfig(nodes=20, latency=0.05, max_connections=1)], indirect=True
+)
+async def test_connection_limit(controller, eta):
+    sensors = list((await eta.get_sensors()).sensors.values())
+    await eta.initializeSensors(sensors)
+    assert controller.stats["max_concurrent"] == 1
+    assert controller.stats["queued"] > 0
+
+
+@pytest.mark.asyncio
+async def test_write_through_controller(controller, eta):
+    sensors = list((await eta.get_sensors()).sensors.values())
+    await eta.initializeSensors(sensors)
+    writable = [s for s in sensors if s.writable and s.unit]
+    assert writable
+
+    eta._writes._delay = 0
+    assert await eta.write_value(writable[0], 42.5) == 42.5
+    assert controller.written[writable[0].id] == 425
+    assert controller.stats["writes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_through_controller(controller, eta):
+    feed = EtaErrorFeed()
+    assert await eta.poll_errors(feed) is None
+    fub = next(iter((await eta.get_sensors()).sensors))
+    controller.errors[fub] = [("Störung", "Error", "2024-01-01 06:00:00", "Fühler defekt")]
+    diff = await eta.poll_errors(feed)
+    assert [(error.fub, error.text) for error in diff.raised] == [(fub, "Fühler defekt")]
+    assert controller.stats["errors_feed"] == 2
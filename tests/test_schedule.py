@@ -0,0 +1,138 @@
+"""Test decoding and caching of the weekly programs."""
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from homeassistant.const import CONF_HOST, CONF_PORT
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+
+from custom_components.eta.api import EtaAPI, EtaValue, SensorType
+from custom_components.eta.const import CHOOSEN_ENTITIES, CONF_PROGRAMS, DOMAIN
+from custom_components.eta.coordinator import EtaDataUpdateCoordinator, entry_varsets, program_varset
+from custom_components.eta.schedule import (
+    EtaSchedule,
+    EtaTimeSlot,
+    EtaWeeklySchedule,
+    decode_timeslot,
+    discover_schedules,
+)
+
+ETA_PC_MENU = Path(__file__).parents[1] / "eta-pc.xml"
+HEATING_TIMES = "/120/10101/12113/0/0"
+MONDAY_WINDOW = "/120/10101/12113/0/1082"
+MONDAY_OUTSIDE = "/120/10101/12113/0/1111"
+SUNDAY_WINDOW = "/120/10101/12113/0/1106"
+
+
+@pytest.fixture
+def expected_lingering_timers() -> bool:
+    # the menu check timer ends with the config entry, which is never unloaded here
+    return True
+
+
+def _value(raw, str_value=""):
+    return EtaValue("/user/var/1", str_value, "°C", "10", "0", raw)
+
+
+def test_decode_timeslot():
+    assert decode_timeslot(_value("24 88 200")) == EtaTimeSlot(360, 1320, 20.0)
+    assert decode_timeslot(_value("0 96")) == EtaTimeSlot(0, 1440, None)
+    # unused windows start and end at the same time
+    assert decode_timeslot(_value("0 0 200")) is None
+    assert decode_timeslot(_value("", "06:30 - 08:00 21,5 °C")) == EtaTimeSlot(390, 480, 21.5)
+    with pytest.raises(ValueError):
+        decode_timeslot(_value("", "Aus"))
+
+
+def test_weekly_schedule():
+    monday = [EtaTimeSlot(1080, 1320, 21.0), EtaTimeSlot(360, 480, 20.0)]
+    schedule = EtaWeeklySchedule([monday] + [[] for _ in range(6)], [16.0] * 7)
+    tz = timezone(timedelta(hours=1))
+
+    assert schedule.day(0) == tuple(sorted(monday))
+    assert schedule.active(datetime(2024, 1, 1, 7, 0, tzinfo=tz)) == EtaTimeSlot(360, 480, 20.0)
+    assert schedule.active(datetime(2024, 1, 1, 12, 0, tzinfo=tz)) is None
+
+    occurrences = list(schedule.occurrences(datetime(2024, 1, 1, 7, 0, tzinfo=tz), datetime(2024, 1, 9, tzinfo=tz)))
+    assert [(start.day, start.hour) for start, _, _ in occurrences] == [(1, 6), (1, 18), (8, 6), (8, 18)]
+    assert schedule.as_dict()["monday"] == {
+        "windows": [
+            {"start": "06:00", "end": "08:00", "value": 20.0},
+            {"start": "18:00", "end": "22:00", "value": 21.0},
+        ],
+        "outside": 16.0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_discover_schedules_in_menu(eta_session):
+    eta_session.menu = ETA_PC_MENU.read_text()
+    eta = EtaAPI(eta_session, "host", 8080)
+    schedules = discover_schedules(await eta.get_sensors())
+
+    assert HEATING_TIMES in schedules
+    assert len(schedules) == 5
+    variables = schedules[HEATING_TIMES]
+    assert len(variables) == 28
+    assert variables[MONDAY_WINDOW] == 0
+    assert variables[SUNDAY_WINDOW] == 6
+    assert eta_session.requests == ["/user/menu/"]
+
+
+@pytest.mark.asyncio
+async def test_schedule_read_in_one_batch(eta_session):
+    eta_session.menu = ETA_PC_MENU.read_text()
+    eta = EtaAPI(eta_session, "host", 8080)
+    sensors_dict = await eta.get_sensors()
+    variables = discover_schedules(sensors_dict)[HEATING_TIMES]
+    for uri in variables:
+        if sensors_dict.byId(uri).name.startswith("Zeitfenster"):
+            eta_session.timeslots[uri] = "0 0 200"
+    eta_session.timeslots[MONDAY_WINDOW] = "24 88 210"
+    eta_session.values[MONDAY_OUTSIDE] = 160
+
+    schedule = EtaSchedule(eta, sensors_dict.byId(HEATING_TIMES), variables, "ha_schedule")
+    assert await schedule.refresh()
+    assert sensors_dict.byId(MONDAY_WINDOW).sensor_type is SensorType.TIMESLOT
+    assert schedule.unit == "°C"
+    assert schedule.schedule.day(0) == (EtaTimeSlot(360, 1320, 21.0),)
+    assert schedule.schedule.day(6) == ()
+    assert schedule.schedule.as_dict()["monday"]["outside"] == 16.0
+
+    # unchanged: one request, the model is kept
+    model = schedule.schedule
+    eta_session.requests.clear()
+    assert not await schedule.refresh()
+    assert eta_session.requests == ["/user/vars/ha_schedule"]
+    assert schedule.schedule is model
+
+    eta_session.timeslots[SUNDAY_WINDOW] = "32 40 180"
+    assert await schedule.refresh()
+    assert schedule.schedule.day(6) == (EtaTimeSlot(480, 600, 18.0),)
+
+
+@pytest.mark.asyncio
+async def test_selected_programs_read_by_coordinator(hass, hass_storage, eta_session):
+    eta_session.menu = ETA_PC_MENU.read_text()
+    eta_session.timeslots[MONDAY_WINDOW] = "24 88 210"
+    entry = MockConfigEntry(
+        domain=DOMAIN,
+        data={CONF_HOST: "host", CONF_PORT: 8080, CHOOSEN_ENTITIES: [], CONF_PROGRAMS: [HEATING_TIMES]},
+    )
+    entry.add_to_hass(hass)
+    coordinator = EtaDataUpdateCoordinator(hass, entry, EtaAPI(eta_session, "host", 8080))
+    await coordinator._async_setup()
+    # only the selected program, its varinfo is cached for the next start
+    assert list(coordinator.programs) == [HEATING_TIMES]
+    assert MONDAY_WINDOW in str(hass_storage["eta.host_8080"]["data"])
+
+    await coordinator.async_refresh()
+    assert coordinator.changed == {HEATING_TIMES}
+    assert coordinator.data[HEATING_TIMES].day(0) == (EtaTimeSlot(360, 1320, 21.0),)
+    assert eta_session.requests[-1] == f"/user/vars/{program_varset(entry, HEATING_TIMES)}"
+    assert program_varset(entry, HEATING_TIMES) in entry_varsets(entry)
+
+    # programs are read every PROGRAM_TICKS polls only
+    eta_session.requests.clear()
+    await coordinator.async_refresh()
+    assert not any(HEATING_TIMES.strip("/").replace("/", "_") in request for request in eta_session.requests)
@@ -0,0 +1,21 @@
+"""Test the backfill of hourly statistics."""
+from datetime import datetime, timezone
+
+from custom_components.eta.statistics import interpolate_hours
+
+
+def test_interpolate_hours():
+    last_end = datetime(2024, 1, 1, 8, tzinfo=timezone.utc)
+    now = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+    rows = interpolate_hours(last_end, 100.0, 40.0, now, 140.0)
+
+    # 8 to 12, the hour of now is left to the recorder
+    assert [row["start"].hour for row in rows] == [8, 9, 10, 11]
+    assert [row["state"] for row in rows] == [110.0, 120.0, 130.0, 140.0]
+    assert [row["sum"] for row in rows] == [50.0, 60.0, 70.0, 80.0]
+
+
+def test_interpolate_within_hour():
+    last_end = datetime(2024, 1, 1, 8, tzinfo=timezone.utc)
+    now = datetime(2024, 1, 1, 8, 50, tzinfo=timezone.utc)
+    assert interpolate_hours(last_end, 100.0, 0.0, now, 140.0) == []